@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the size and decoding time of JSON and array codec fields.
+
+Usage:
+    python benchmarks/arraycodec_benchmark.py [npoints] [nmeasurements]
+"""
+
+import os as _os
+import sys as _sys
+import json as _json
+import time as _time
+import numpy as _np
+
+_sys.path.insert(
+    0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from movingwire.data import arraycodec as _arraycodec
+
+
+def synthetic_sweeps(npoints=1800, nmeasurements=10, seed=0):
+    """Returns voltage sweeps similar to stretched wire measurements."""
+    _rng = _np.random.default_rng(seed)
+    _t = _np.linspace(0, 1, npoints)[:, None]
+    return (1e-4*_np.sin(2*_np.pi*_t) +
+            1e-6*_rng.standard_normal((npoints, nmeasurements)))
+
+
+def _timeit(function, value, repeat=20):
+    _t0 = _time.perf_counter()
+    for _ in range(repeat):
+        function(value)
+    return (_time.perf_counter() - _t0)/repeat
+
+
+def compare(npoints=1800, nmeasurements=10):
+    """Prints the stored size and decoding time of each format."""
+    _array = synthetic_sweeps(npoints, nmeasurements)
+    _formats = [
+        ('json', _json.dumps(_array.tolist()),
+         lambda value: _np.array(_json.loads(value))),
+        ('codec', _json.dumps(_arraycodec.encode(_array)),
+         _arraycodec.decode),
+        ('codec zlib', _json.dumps(_arraycodec.encode(_array, True)),
+         _arraycodec.decode),
+        ]
+    print('samples={0}, repetitions={1}'.format(npoints, nmeasurements))
+    for name, value, decode in _formats:
+        assert _np.array_equal(decode(value), _array)
+        print('  {0:>10}: {1:9d} bytes, decode {2:8.3f} ms'.format(
+            name, len(value), _timeit(decode, value)*1e3))
+
+
+if __name__ == '__main__':
+    _args = [int(arg) for arg in _sys.argv[1:3]]
+    compare(*_args)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the vectorized stretched wire and flip coil integral calculus
+with the legacy prefix trapz loops from AnalysisWidget.
+
+Usage:
+    python benchmarks/integrals_benchmark.py [npoints] [nmeasurements]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import types as _types
+import numpy as _np
+
+_sys.path.insert(
+    0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from movingwire.analysis import integrals as _integrals
+
+
+_trapz = getattr(_np, 'trapz', None) or _np.trapezoid
+
+
+def legacy_integral_calculus_sw(meas, I2=False):
+    """Legacy stretched wire integral calculus (O(N^2) per repetition)."""
+    _step = meas.step*1e-3  # [m]
+    _dt = meas.nplc/60  # [s]
+    _idx_0, _idx_f = _integrals.sw_integral_indexes(meas)
+    if not I2:
+        _coef = 1 / (meas.gain * meas.turns * _step)
+    else:
+        _coef = meas.length / (meas.gain * meas.turns * _step)
+
+    shape = meas.data_frw.shape
+    for j in range(shape[1]):
+        _f_f = _np.array([])
+        _f_b = _np.array([])
+        for idx in range(shape[0]):
+            _f_f = _np.append(_f_f, _trapz(meas.data_frw[:idx, j], dx=_dt))
+            _f_b = _np.append(_f_b, _trapz(meas.data_bck[:idx, j], dx=_dt))
+        if j == 0:
+            flx_f = _f_f
+            flx_b = _f_b
+        else:
+            flx_f = _np.vstack([flx_f, _f_f])
+            flx_b = _np.vstack([flx_b, _f_b])
+    meas.flx_f = flx_f.transpose()
+    meas.flx_b = flx_b.transpose()
+
+    meas.I_f = meas.flx_f * _coef
+    meas.I_b = meas.flx_b * _coef
+    meas.I = (meas.I_f - meas.I_b) / 2
+    meas.If = meas.I_f[_idx_f, :] - meas.I_f[_idx_0, :]
+    meas.Ib = meas.I_b[_idx_f, :] - meas.I_b[_idx_0, :]
+    integrals = meas.I[_idx_f, :] - meas.I[_idx_0, :]
+    if not I2:
+        meas.I1_mean = integrals.mean()
+        meas.I1_std = integrals.std(ddof=1)
+    else:
+        meas.I2_mean = integrals.mean()
+        meas.I2_std = integrals.std(ddof=1)
+    return meas
+
+
+def legacy_integral_calculus_fc(cfg, meas):
+    """Legacy flip coil integral calculus (O(N^2) per repetition)."""
+    _dt = cfg.nplc/60
+    for i in range(meas.data_frw.shape[1]):
+        _offset_f = meas.data_frw[:40, i].mean()
+        _offset_b = meas.data_bck[:40, i].mean()
+        _f_f = _np.array([0])
+        _f_b = _np.array([0])
+        for idx in range(meas.data_frw[:, i].shape[0]-1):
+            _f_f_part = meas.data_frw[:idx, i] - _offset_f
+            _f_b_part = meas.data_bck[:idx, i] - _offset_b
+            _f_f = _np.append(_f_f, _trapz(_f_f_part, dx=_dt))
+            _f_b = _np.append(_f_b, _trapz(_f_b_part, dx=_dt))
+        if i == 0:
+            meas.flx_f = _f_f
+            meas.flx_b = _f_b
+        else:
+            meas.flx_f = _np.vstack([meas.flx_f, _f_f])
+            meas.flx_b = _np.vstack([meas.flx_b, _f_b])
+    meas.flx_f = meas.flx_f.transpose()
+    meas.flx_b = meas.flx_b.transpose()
+
+    meas.I_f = meas.flx_f * 1/(2*cfg.turns*cfg.width)
+    meas.I_b = meas.flx_b * 1/(2*cfg.turns*cfg.width)
+    meas.If = meas.I_f[61, :] - meas.I_f[40, :]
+    meas.Ib = meas.I_b[61, :] - meas.I_b[40, :]
+    meas.I_mean = (meas.If.mean() - meas.Ib.mean())/2
+    return meas
+
+
+def synthetic_measurement(npoints=1800, nmeasurements=10, nplc=1, seed=0):
+    """Returns a stretched wire measurement-like object with random data."""
+    _rng = _np.random.default_rng(seed)
+    _dt = nplc/60
+    _t = _np.arange(npoints)*_dt
+    _pulse = 1e-4*_np.exp(-((_t - _t.mean())/(0.1*_t[-1] + _dt))**2)
+    meas = _types.SimpleNamespace()
+    meas.step = 2
+    meas.turns = 1
+    meas.gain = 100
+    meas.length = 3
+    meas.nplc = nplc
+    meas.duration = npoints*_dt
+    meas.acq_init_interval = 0.1*meas.duration
+    meas.acq_final_interval = 0.1*meas.duration
+    meas.data_frw = (_pulse[:, None] +
+                     1e-6*_rng.standard_normal((npoints, nmeasurements)))
+    meas.data_bck = (-1*_pulse[:, None] +
+                     1e-6*_rng.standard_normal((npoints, nmeasurements)))
+    return meas
+
+
+def _print_results(name, legacy, new, t_legacy, t_new, attrs):
+    print('{0}:'.format(name))
+    print('  legacy:     {0:10.4f} s'.format(t_legacy))
+    print('  vectorized: {0:10.4f} s ({1:.0f}x)'.format(
+        t_new, t_legacy/max(t_new, 1e-12)))
+    for attr in attrs:
+        _diff = _np.max(_np.abs(_np.asarray(getattr(legacy, attr)) -
+                                _np.asarray(getattr(new, attr))))
+        _scale = _np.max(_np.abs(getattr(legacy, attr)))
+        print('  {0:>8}: max abs diff = {1:.3e} (scale {2:.3e})'.format(
+            attr, _diff, _scale))
+
+
+def compare(npoints=1800, nmeasurements=10):
+    """Runs both implementations and prints timings and differences."""
+    _legacy = synthetic_measurement(npoints, nmeasurements)
+    _new = synthetic_measurement(npoints, nmeasurements)
+
+    _t0 = _time.perf_counter()
+    legacy_integral_calculus_sw(_legacy)
+    _t_legacy = _time.perf_counter() - _t0
+
+    _t0 = _time.perf_counter()
+    _integrals.integral_calculus_sw(_new)
+    _t_new = _time.perf_counter() - _t0
+
+    print('samples={0}, repetitions={1}'.format(npoints, nmeasurements))
+    _print_results('stretched wire', _legacy, _new, _t_legacy, _t_new,
+                   ['flx_f', 'flx_b', 'I', 'If', 'Ib', 'I1_mean', 'I1_std'])
+
+    _cfg = _types.SimpleNamespace(width=12.5e-3, turns=10, nplc=1)
+    _legacy = synthetic_measurement(npoints, nmeasurements)
+    _new = synthetic_measurement(npoints, nmeasurements)
+
+    _t0 = _time.perf_counter()
+    legacy_integral_calculus_fc(_cfg, _legacy)
+    _t_legacy = _time.perf_counter() - _t0
+
+    _t0 = _time.perf_counter()
+    _integrals.integral_calculus_fc(_cfg, _new)
+    _t_new = _time.perf_counter() - _t0
+
+    _print_results('flip coil', _legacy, _new, _t_legacy, _t_new,
+                   ['flx_f', 'flx_b', 'If', 'Ib', 'I_mean'])
+
+if __name__ == '__main__':
+    _args = [int(arg) for arg in _sys.argv[1:3]]
+    compare(*_args)
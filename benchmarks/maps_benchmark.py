@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the vectorized integral map assembly with the legacy per cell
+loop from AnalysisWidget.update_map_arrays.
+
+Usage:
+    python benchmarks/maps_benchmark.py [nx] [ny] [repetitions]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import types as _types
+import numpy as _np
+import pandas as _pd
+
+_sys.path.insert(
+    0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from movingwire.analysis import maps as _maps
+
+
+def legacy_update_map_arrays(map_data, _meas_I1, _meas_I2):
+    """Legacy map assembly (filters the tables once per map cell)."""
+
+    _map = map_data
+
+    _I1x_mean = _np.array([])
+    _I1x_std = _np.array([])
+    _I1y_mean = _np.array([])
+    _I1y_std = _np.array([])
+    _I2x_mean = _np.array([])
+    _I2x_std = _np.array([])
+    _I2y_mean = _np.array([])
+    _I2y_std = _np.array([])
+
+    _I1_id0 = _map.I1_start_id - 1
+    _I1_idf = _map.I1_end_id
+    _I2_id0 = _map.I2_start_id - 1
+    _I2_idf = _map.I2_end_id
+
+    if _I1_idf != 0:
+        _I1 = _meas_I1.iloc[_I1_id0:_I1_idf]
+        _I1x = _I1.loc[_I1['motion_axis'] == 'Y']
+        if len(_I1x) == 0:
+            _I1x = None
+        _I1y = _I1.loc[_I1['motion_axis'] == 'X']
+        if len(_I1y) == 0:
+            _I1y = None
+    else:
+        _I1 = None
+        _I1x = None
+        _I1y = None
+
+    if _I2_idf != 0:
+        _I2 = _meas_I2.iloc[_I2_id0:_I2_idf]
+        _I2x = _I2.loc[_I2['motion_axis'] == 'Y']
+        if len(_I2x) == 0:
+            _I2x = None
+        _I2y = _I2.loc[_I2['motion_axis'] == 'X']
+        if len(_I2y) == 0:
+            _I2y = None
+    else:
+        _I2 = None
+        _I2x = None
+        _I2y = None
+
+    if _I1 is not None:
+        _x_array = _I1['x_pos'].drop_duplicates(keep='last').values
+        _y_array = _I1['y_pos'].drop_duplicates(keep='last').values
+    elif _I2 is not None:
+        _x_array = _I2['x_pos'].drop_duplicates(keep='last').values
+        _y_array = _I2['y_pos'].drop_duplicates(keep='last').values
+
+    for _y in _y_array:
+        for _x in _x_array:
+            if _I1x is not None:
+                _I1x_item = _I1x.loc[(_I1x['x_pos'] == _x) &
+                                     (_I1x['y_pos'] == _y)]
+                _I1x_item = _I1x_item.sort_values('I1_std').drop_duplicates('x_pos')
+                _I1x_mean = _np.append(
+                    _I1x_mean, _I1x_item['I1_mean'].iloc[0]*10**6)
+                _I1x_std = _np.append(
+                    _I1x_std, _I1x_item['I1_std'].iloc[0]*10**6)
+            else:
+                _I1x_mean = _np.append(_I1x_mean, 0)
+                _I1x_std = _np.append(_I1x_std,  0)
+
+            if _I1y is not None:
+                _I1y_item = _I1y.loc[(_I1y['x_pos'] == _x) &
+                                     (_I1y['y_pos'] == _y)]
+                _I1y_item = _I1y_item.sort_values('I1_std').drop_duplicates('x_pos')
+                _I1y_mean = _np.append(
+                    _I1y_mean, _I1y_item['I1_mean'].iloc[0]*10**6)
+                _I1y_std = _np.append(
+                    _I1y_std, _I1y_item['I1_std'].iloc[0]*10**6)
+            else:
+                _I1y_mean = _np.append(_I1y_mean, 0)
+                _I1y_std = _np.append(_I1y_std,  0)
+
+            if _I2x is not None:
+                _I2x_item = _I2x.loc[(_I2x['x_pos'] == _x) &
+                                     (_I2x['y_pos'] == _y)]
+                _I2x_item = _I2x_item.sort_values('I2_std').drop_duplicates('x_pos')
+                _I2x_mean = _np.append(
+                    _I2x_mean, _I2x_item['I2_mean'].iloc[-1]*10**5)
+                _I2x_std = _np.append(
+                    _I2x_std, _I2x_item['I2_std'].iloc[-1]*10**5)
+            else:
+                _I2x_mean = _np.append(_I2x_mean, 0)
+                _I2x_std = _np.append(_I2x_std, 0)
+
+            if _I2y is not None:
+                _I2y_item = _I2y.loc[(_I2y['x_pos'] == _x) &
+                                     (_I2y['y_pos'] == _y)]
+                _I2y_item = _I2y_item.sort_values('I2_std').drop_duplicates('x_pos')
+                _I2y_mean = _np.append(
+                    _I2y_mean, _I2y_item['I2_mean'].iloc[-1]*10**5)
+                _I2y_std = _np.append(
+                    _I2y_std, _I2y_item['I2_std'].iloc[-1]*10**5)
+            else:
+                _I2y_mean = _np.append(_I2y_mean, 0)
+                _I2y_std = _np.append(_I2y_std, 0)
+
+    _map.x_pos_array = _x_array
+    _map.y_pos_array = _y_array
+    _map.I1x = _I1x_mean
+    _map.I1x_std = _I1x_std
+    _map.I1y = _I1y_mean
+    _map.I1y_std = _I1y_std
+    _map.I2x = _I2x_mean
+    _map.I2x_std = _I2x_std
+    _map.I2y = _I2y_mean
+    _map.I2y_std = _I2y_std
+
+
+def synthetic_tables(nx=50, ny=20, repetitions=3, seed=0):
+    """Returns sw I1 and I2 tables and a map spanning all their rows."""
+    _rng = _np.random.default_rng(seed)
+    _x = _np.linspace(-10, 10, nx)
+    _y = _np.linspace(-5, 5, ny)
+    _rows = []
+    for _yi in _y:
+        for _xi in _x:
+            for _axis in ['Y', 'X']:
+                for _ in range(repetitions):
+                    _rows.append((_xi, _yi, _axis))
+    _tables = []
+    for _col in ['I1', 'I2']:
+        _df = _pd.DataFrame(_rows, columns=['x_pos', 'y_pos', 'motion_axis'])
+        _df.insert(0, 'id', _np.arange(1, len(_df) + 1))
+        _df[_col + '_mean'] = _rng.normal(0, 1e-4, len(_df))
+        _df[_col + '_std'] = _rng.uniform(1e-7, 1e-5, len(_df))
+        _tables.append(_df)
+    _n = len(_rows)
+    _map = _types.SimpleNamespace(I1_start_id=1, I1_end_id=_n,
+                                  I2_start_id=1, I2_end_id=_n)
+    return _tables[0], _tables[1], _map
+
+
+def compare(nx=50, ny=20, repetitions=3):
+    """Runs both implementations and prints timings and differences."""
+    _I1, _I2, _legacy = synthetic_tables(nx, ny, repetitions)
+    _new = _types.SimpleNamespace(**vars(_legacy))
+
+    _t0 = _time.perf_counter()
+    legacy_update_map_arrays(_legacy, _I1, _I2)
+    _t_legacy = _time.perf_counter() - _t0
+
+    _t0 = _time.perf_counter()
+    _maps.update_map_arrays(_new, _I1, _I2)
+    _t_new = _time.perf_counter() - _t0
+
+    print('nx={0}, ny={1}, repetitions={2}'.format(nx, ny, repetitions))
+    print('  legacy:     {0:10.4f} s'.format(_t_legacy))
+    print('  vectorized: {0:10.4f} s ({1:.0f}x)'.format(
+        _t_new, _t_legacy/max(_t_new, 1e-12)))
+    for attr in ['x_pos_array', 'y_pos_array', 'I1x', 'I1x_std', 'I1y',
+                 'I1y_std', 'I2x', 'I2x_std', 'I2y', 'I2y_std']:
+        _equal = _np.array_equal(getattr(_legacy, attr), getattr(_new, attr))
+        print('  {0:>11}: {1}'.format(attr, 'equal' if _equal else 'DIFFERENT'))
+
+
+if __name__ == '__main__':
+    _args = [int(arg) for arg in _sys.argv[1:4]]
+    compare(*_args)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""Measures the overhead of the stage moves against the simulated PPMAC.
+
+Each move is timed and compared with the duration of its simulated motion
+profile; the difference is the command and polling overhead.
+
+Usage:
+    python benchmarks/motion_benchmark.py [moves] [latency_ms] [poll_ms]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import types as _types
+import numpy as _np
+
+_sys.path.insert(
+    0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from movingwire.devices import ppmac as _ppmac
+from movingwire.engine import motion as _motion
+from movingwire.simulation import ppmac as _sim
+
+
+def stage_cfg():
+    """Ppmac configuration with 1 um counts and +/- 50 mm ranges."""
+    return _types.SimpleNamespace(
+        x_sf=0.001, y_sf=0.001, x_offset=0, y_offset=0,
+        min_x=-50, max_x=50, min_y=-50, max_y=50)
+
+
+def run(moves=20, latency=0.002, poll_interval=0.05):
+    """Moves the Y axis back and forth between -5 and 5 mm.
+
+    Returns:
+        (total time, total profile time, mean command latency) [s].
+    """
+    _server = _sim.start_server(latency=latency)
+    try:
+        _sim.attach(_ppmac, _server.address)
+        _ppmac.latencies.clear()
+        _stage = _motion.Stage(stage_cfg(), poll_interval=poll_interval)
+        _motors = [_server.controller.motors[m] for m in [1, 3]]
+        _total = 0
+        _profile = 0
+        for i in range(moves):
+            _t0 = _time.perf_counter()
+            _result = _stage.move('Y', 5 if i % 2 == 0 else -5)
+            _total += _time.perf_counter() - _t0
+            if not _result.reached:
+                raise RuntimeError('Move {0} failed.'.format(i))
+            _profile += _np.mean([m.last_duration for m in _motors])
+        return _total, _profile, _ppmac.mean_latency()
+    finally:
+        _ppmac.ppmac.close()
+        _server.stop()
+
+
+def compare(moves=20, latency_ms=2, poll_ms=50):
+    for _poll in sorted({poll_ms, 10}, reverse=True):
+        _total, _profile, _latency = run(moves, latency_ms*1e-3,
+                                         _poll*1e-3)
+        print('poll {0:4.0f} ms: {1:6.3f} s total, {2:6.3f} s motion, '
+              '{3:5.1f} ms/move overhead, {4:4.1f} ms/command'.format(
+                  _poll, _total, _profile, (_total - _profile)/moves*1e3,
+                  _latency*1e3))
+
+
+if __name__ == '__main__':
+    _args = [float(arg) for arg in _sys.argv[1:4]]
+    if len(_args) > 0:
+        _args[0] = int(_args[0])
+    compare(*_args)
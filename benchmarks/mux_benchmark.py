@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""Compares locked and multiplexed PPMAC queries from concurrent threads.
+
+Each thread reads motor positions and status parameters from the simulated
+PPMAC in a loop, as the position monitor, the motion waiters and the GUI
+panels do. Every reply is checked against its command, so interleaved
+replies are counted as errors.
+
+Usage:
+    python benchmarks/mux_benchmark.py [threads] [seconds] [latency_ms]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import threading as _threading
+
+_sys.path.insert(
+    0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from movingwire.devices import ppmac as _ppmac
+from movingwire.simulation import ppmac as _sim
+
+
+def _poller(index, duration, counts):
+    _motor = index % 8 + 1
+    _cmd = 'Motor[{0}].JogSpeed'.format(_motor)
+    _queries = 0
+    _errors = 0
+    _deadline = _time.monotonic() + duration
+    while _time.monotonic() < _deadline:
+        try:
+            if index % 2 == 0:
+                _reply = _ppmac.query(_cmd)
+                _ok = _reply.lstrip().startswith(_cmd)
+            else:
+                _pos = _ppmac.read_motor_pos([1, 2, 3, 4])
+                _ok = _pos is not None and len(_pos) == 4
+        except Exception:
+            _ok = False
+        _queries += 1
+        _errors += 0 if _ok else 1
+    counts[index] = (_queries, _errors)
+
+
+def run(threads=4, duration=2, latency=0.002, mux=True):
+    """Runs the pollers.
+
+    Returns:
+        (queries per second, errors).
+    """
+    _server = _sim.start_server(latency=latency)
+    try:
+        _sim.attach(_ppmac, _server.address)
+        if mux:
+            _ppmac.mux.start()
+        _counts = {}
+        _threads = [_threading.Thread(target=_poller,
+                                      args=(i, duration, _counts))
+                    for i in range(threads)]
+        for _thread in _threads:
+            _thread.start()
+        for _thread in _threads:
+            _thread.join()
+        _queries = sum(c[0] for c in _counts.values())
+        _errors = sum(c[1] for c in _counts.values())
+        return _queries/duration, _errors
+    finally:
+        _ppmac.mux.stop()
+        _ppmac.ppmac.close()
+        _server.stop()
+
+
+def compare(threads=4, duration=2, latency_ms=2):
+    for _mux in [False, True]:
+        _rate, _errors = run(int(threads), duration, latency_ms*1e-3, _mux)
+        print('{0:<12}{1:8.0f} queries/s, {2} errors'.format(
+            'multiplexed' if _mux else 'locked', _rate, _errors))
+
+
+if __name__ == '__main__':
+    compare(*[float(arg) for arg in _sys.argv[1:4]])
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""Measures the stretched wire sweep throughput against the simulated
+PPMAC and 3458A multimeter.
+
+Each sweep pair is timed and compared with its acquisition time
+(2*duration); the recovered first integral is checked against the field
+model. Software triggered sweeps (TRIG SGL, then the move after the
+initial interval) are compared with sweeps triggered by the simulated
+position compare output (TRIG EXT), which last the move time only.
+
+Usage:
+    python benchmarks/sweep_benchmark.py [pairs] [duration_s] [nplc]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import types as _types
+import numpy as _np
+
+_sys.path.insert(
+    0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from movingwire.analysis import integrals as _integrals
+from movingwire.devices import (
+    ppmac as _ppmac,
+    volt as _volt,
+    compare as _compare,
+    )
+from movingwire.engine import runs as _runs
+from movingwire.simulation import instruments as _instruments
+from movingwire.simulation import ppmac as _sim_ppmac
+
+
+class _Scan(_runs.StretchedWireScan):
+
+    def run(self):
+        pass
+
+
+def run(pairs=5, duration=1.5, nplc=1, I1=50e-6, step=2, trigger=False):
+    """Measures sweep pairs of step [mm] around Y = 0.
+
+    Args:
+        trigger (bool): True to trigger the multimeter with the position
+                        compare output.
+    Returns:
+        (time per pair [s], acquisition time per sweep [s],
+        measured I1 [T.m]).
+    """
+    _server = _sim_ppmac.start_server(latency=0.001)
+    try:
+        _sim_ppmac.attach(_ppmac, _server.address)
+        _field = _instruments.FieldModel(
+            I1=I1, gain=100, turns=1, noise=1e-6,
+            motion=_instruments.StageMotion(_server.controller, 'Y'))
+        _instruments.attach(_volt, _instruments.Multimeter3458A(
+            _field, trigger=_server.controller.trigger_time))
+        # speed [mm/s], accel [mm/s^2] and jerk [mm/s^3] of the Y motors
+        _cfg = _types.SimpleNamespace(
+            x_sf=0.001, y_sf=0.001, x_offset=0, y_offset=0,
+            min_x=-50, max_x=50, min_y=-50, max_y=50,
+            y_step=step, speed_y=5, accel_y=100, jerk_y=5000)
+        # jog setup of the ppmac widget: counts/ms, inverse accel and jerk
+        for _motor in [1, 3]:
+            _ppmac.query(
+                'Motor[{0}].JogSpeed={1};Motor[{0}].JogTa={2};'
+                'Motor[{0}].JogTs={3}'.format(
+                    _motor, _cfg.speed_y/_cfg.y_sf*1e-3,
+                    -_cfg.y_sf*1e6/_cfg.accel_y,
+                    -_cfg.y_sf*1e9/_cfg.jerk_y))
+        _scan = _Scan(_cfg, database_name=None)
+        _acq_init, _acq_final = 0.3, 0.1
+        if trigger:
+            _scan.compare = _compare
+            duration = _scan.sweep_duration('Y', duration, _acq_final)
+            _acq_init = 0
+        _scan.stage.move('Y', -step/2)
+        _npoints = int(_np.ceil(duration/(nplc/60)))
+        _volt.configure_volt(nplc=nplc, time=duration)
+
+        _frw, _bck = [], []
+        _t0 = _time.perf_counter()
+        for _ in range(pairs):
+            _data_frw, _data_bck = _scan.sweep_pair(
+                'Y', -step/2, step/2, None, _npoints, duration,
+                _acq_init - 0.1)
+            _frw.append(_data_frw)
+            _bck.append(_data_bck)
+        _elapsed = (_time.perf_counter() - _t0)/pairs
+
+        _meas = _types.SimpleNamespace(
+            data_frw=_np.array(_frw).T, data_bck=_np.array(_bck).T,
+            step=step, nplc=nplc, gain=100, turns=1, length=1,
+            duration=duration, acq_init_interval=_acq_init,
+            acq_final_interval=_acq_final)
+        _integrals.integral_calculus_sw(_meas)
+        return _elapsed, duration, _meas.I1_mean
+    finally:
+        _ppmac.ppmac.close()
+        _server.stop()
+
+
+def compare(pairs=5, duration=1.5, nplc=1):
+    for _trigger in [False, True]:
+        _elapsed, _duration, _I1 = run(pairs, duration, nplc,
+                                       trigger=_trigger)
+        print('{0:<10}{1:.3f} s/pair ({2:.3f} s acquisition), I1 = '
+              '{3:.2f} G.cm (model 50.00 G.cm)'.format(
+                  'hardware' if _trigger else 'software', _elapsed,
+                  2*_duration, _I1*1e6))
+
+
+if __name__ == '__main__':
+    _args = [float(arg) for arg in _sys.argv[1:4]]
+    if len(_args) > 0:
+        _args[0] = int(_args[0])
+    compare(*_args)
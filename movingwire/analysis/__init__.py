@@ -0,0 +1,7 @@
+"""Sub-package for measurement data analysis."""
+
+from . import integrals
+from . import ambient
+from . import pipeline
+from . import maps
+from . import cache
@@ -0,0 +1,72 @@
+"""Ambient field correction of field integral measurements."""
+
+import movingwire.data as _data
+from movingwire.tracing import traced as _traced
+
+
+@_traced('integrate')
+def ambient_field_correction(meas, database_name, mongo=False, server=None):
+    """Discounts the ambient field measurement (meas.Iamb_id) from meas.
+
+    Args:
+        meas (MeasurementDataFC/SW/SW2): measurement data with calculated
+                                         integrals;
+        database_name (str): database file name;
+        mongo (bool): True to use mongodb;
+        server (str): mongodb server.
+    Returns:
+        I_mean (float): measured integral before the correction [G.cm] or
+                        [kG.cm2];
+        I_std (float): measured integral standard deviation before the
+                       correction [G.cm] or [kG.cm2];
+        Iamb_mean (float): ambient integral [G.cm] or [kG.cm2];
+        Iamb_std (float): ambient integral standard deviation [G.cm] or
+                          [kG.cm2];
+        amb_meas (MeasurementDataFC/SW/SW2): ambient measurement.
+    """
+    if meas.mode == 'FC_I1' or meas.mode is None:
+        _amb_meas = _data.measurement.MeasurementDataFC()
+        _amb_meas.db_update_database(database_name,
+                                     mongo=mongo, server=server)
+        _amb_meas.db_read(meas.Iamb_id)
+
+        I_mean = meas.I1_mean*10**6   # T.m to G.cm
+        I_std = meas.I1_std*10**6   # T.m to G.cm
+
+        meas.I1_mean = meas.I1_mean - _amb_meas.I1_mean
+        meas.I1_std = (meas.I1_std**2 + _amb_meas.I1_std**2)**0.5
+
+        Iamb_mean = _amb_meas.I1_mean*10**6   # T.m to G.cm
+        Iamb_std = _amb_meas.I1_std*10**6   # T.m to G.cm
+
+    if meas.mode == 'SW_I1' or meas.mode == 'sw':
+        _amb_meas = _data.measurement.MeasurementDataSW()
+        _amb_meas.db_update_database(database_name,
+                                     mongo=mongo, server=server)
+        _amb_meas.db_read(meas.Iamb_id)
+
+        I_mean = meas.I1_mean*10**6   # T.m to G.cm
+        I_std = meas.I1_std*10**6   # T.m to G.cm
+
+        meas.I1_mean = meas.I1_mean - _amb_meas.I1_mean
+        meas.I1_std = (meas.I1_std**2 + _amb_meas.I1_std**2)**0.5
+
+        Iamb_mean = _amb_meas.I1_mean*10**6   # T.m to G.cm
+        Iamb_std = _amb_meas.I1_std*10**6   # T.m to G.cm
+
+    elif meas.mode == 'SW_I2':
+        _amb_meas = _data.measurement.MeasurementDataSW2()
+        _amb_meas.db_update_database(database_name,
+                                     mongo=mongo, server=server)
+        _amb_meas.db_read(meas.Iamb_id)
+
+        I_mean = meas.I2_mean*10**5  # T.m2 to kG.cm2
+        I_std = meas.I2_std*10**5  # T.m2 to kG.cm2
+
+        meas.I2_mean = meas.I2_mean - _amb_meas.I2_mean
+        meas.I2_std = (meas.I2_std**2 + _amb_meas.I2_std**2)**0.5
+
+        Iamb_mean = _amb_meas.I2_mean*10**5  # T.m2 to kG.cm2
+        Iamb_std = _amb_meas.I2_std*10**5  # T.m2 to kG.cm2
+
+    return I_mean, I_std, Iamb_mean, Iamb_std, _amb_meas
@@ -0,0 +1,233 @@
+"""Cache of integrals calculated from measurement raw data.
+
+Results are keyed by a hash of the measurement identity (database, table,
+id, name, date and hour), of every parameter used by the calculation and
+of the stored integral of the ambient field measurement, so changing an
+analysis parameter or recalculating the ambient measurement (e.g. with
+analysis.reprocess) gives a new key instead of a stale result. The most recently used results are kept in memory and every result
+is also written to an .npz file, both bounded with least recently used
+eviction (file modification times are used as the disk access order).
+"""
+
+import os as _os
+import sys as _sys
+import hashlib as _hashlib
+import threading as _threading
+import traceback as _traceback
+import collections as _collections
+import numpy as _np
+
+
+DIRECTORY = _os.path.join(_os.path.expanduser('~'), '.movingwire_cache')
+
+# measurement attributes set by integrals.integral_calculus_sw/fc
+SW_FIELDS = ['flx_f', 'flx_b', 'I_f', 'I_b', 'I', 'If', 'If_std', 'Ib',
+             'Ib_std', 'max_integral_diff', 'I1_mean', 'I1_std']
+SW2_FIELDS = SW_FIELDS[:-2] + ['I2_mean', 'I2_std']
+FC_FIELDS = ['flx_f', 'flx_b', 'I_f', 'I_b', 'I', 'If', 'If_std', 'Ib',
+             'Ib_std', 'I_mean', 'I_std', 'I1_mean', 'I1_std']
+
+# parameters of the calculation
+SW_PARAMETERS = ['step', 'nplc', 'gain', 'turns', 'length', 'duration',
+                 'acq_init_interval', 'acq_final_interval', 'Iamb_id']
+FC_PARAMETERS = ['width', 'turns', 'nplc']
+
+
+def result_fields(meas, I2=False):
+    """Returns the names of the calculated attributes of meas."""
+    if meas.collection_name == 'measurements_fc_I1':
+        return FC_FIELDS
+    return SW2_FIELDS if I2 else SW_FIELDS
+
+
+def ambient_values(meas, I2=False):
+    """Returns the stored integral (mean, std) of the ambient field
+    measurement of meas, None if it has none.
+
+    Args:
+        meas (MeasurementDataFC/SW/SW2): measurement data read from the
+                                         database;
+        I2 (bool): True for second integral calculus.
+    """
+    if not meas.Iamb_id:
+        return None
+    _names = ['I2_mean', 'I2_std'] if I2 else ['I1_mean', 'I1_std']
+    return tuple(meas.db_get_value(name, meas.Iamb_id) for name in _names)
+
+
+def result_key(meas, database_name, cfg=None, I2=False, fdi_mode=False,
+               ambient=None):
+    """Returns the cache key of the integrals of a measurement.
+
+    Args:
+        meas (MeasurementDataFC/SW/SW2): measurement data read from the
+                                         database;
+        database_name (str): database file name (or mongodb database);
+        cfg (MeasurementConfig): flip coil measurement configuration;
+        I2 (bool): True for second integral calculus;
+        fdi_mode (bool): True for flip coil FDI integrator data;
+        ambient (tuple): stored ambient field integral (see
+                         ambient_values), which the corrected results
+                         depend on.
+    Returns:
+        key (str).
+    """
+    _items = [_os.path.abspath(database_name) if database_name else None,
+              meas.collection_name, meas.idn, meas.name, meas.date,
+              meas.hour, I2, fdi_mode, ambient]
+    _items += [getattr(meas, name, None) for name in SW_PARAMETERS]
+    if cfg is not None:
+        _items += [cfg.idn] + [getattr(cfg, name, None)
+                               for name in FC_PARAMETERS]
+    return _hashlib.sha1(repr(_items).encode()).hexdigest()
+
+
+def results(meas, I2=False, **extra):
+    """Returns a dict with the calculated attributes of meas.
+
+    Args:
+        meas (MeasurementDataFC/SW/SW2): measurement with calculated
+                                         integrals;
+        I2 (bool): True for second integral results;
+        extra: other values to cache with the results (e.g. ambient
+               field texts).
+    """
+    _results = {name: getattr(meas, name, None)
+                for name in result_fields(meas, I2)}
+    _results.update(extra)
+    return {name: value for name, value in _results.items()
+            if value is not None}
+
+
+def restore(meas, results, I2=False):
+    """Sets the cached attributes on meas."""
+    for name in result_fields(meas, I2):
+        if name in results:
+            _value = results[name]
+            if _value.ndim == 0:
+                _value = _value.item()
+            setattr(meas, name, _value)
+    return meas
+
+
+class ResultCache():
+    """Least recently used cache of calculation results in memory and on
+    disk."""
+
+    def __init__(self, directory=DIRECTORY, max_memory=32,
+                 max_disk_bytes=500*1024**2):
+        """Create the cache.
+
+        Args:
+            directory (str): cache files directory, None to keep the results
+                             only in memory;
+            max_memory (int): maximum number of results in memory;
+            max_disk_bytes (int): maximum size of the cache files.
+        """
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = _collections.OrderedDict()
+        self._lock = _threading.Lock()
+
+    def _path(self, key):
+        return _os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """Returns the cached results of key, None if not cached."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        _results = self._read(key)
+        with self._lock:
+            if _results is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, _results)
+        return _results
+
+    def put(self, key, results):
+        """Caches results (dict of arrays, numbers or strings)."""
+        _results = {name: _np.asarray(value)
+                    for name, value in results.items()}
+        with self._lock:
+            self._remember(key, _results)
+        self._write(key, _results)
+
+    def clear(self):
+        """Removes all cached results."""
+        with self._lock:
+            self._memory.clear()
+        for _path in self._files():
+            try:
+                _os.remove(_path)
+            except OSError:
+                pass
+
+    def _remember(self, key, results):
+        self._memory[key] = results
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        _path = self._path(key)
+        if not _os.path.isfile(_path):
+            return None
+        try:
+            with _np.load(_path, allow_pickle=False) as _file:
+                _results = {name: _file[name] for name in _file.files}
+            # mark as recently used for the disk eviction
+            _os.utime(_path)
+            return _results
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            return None
+
+    def _write(self, key, results):
+        if self.directory is None:
+            return
+        try:
+            _os.makedirs(self.directory, exist_ok=True)
+            _tmp = self._path(key) + '.tmp'
+            with open(_tmp, 'wb') as _file:
+                _np.savez(_file, **results)
+            _os.replace(_tmp, self._path(key))
+            self._evict()
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def _files(self):
+        if self.directory is None or not _os.path.isdir(self.directory):
+            return []
+        return [_os.path.join(self.directory, name)
+                for name in _os.listdir(self.directory)
+                if name.endswith('.npz')]
+
+    def _evict(self):
+        _files = []
+        for _path in self._files():
+            try:
+                _stat = _os.stat(_path)
+            except OSError:
+                continue
+            _files.append((_stat.st_mtime, _stat.st_size, _path))
+        _size = sum(f[1] for f in _files)
+        for _mtime, _bytes, _path in sorted(_files):
+            if _size <= self.max_disk_bytes:
+                break
+            try:
+                _os.remove(_path)
+                _size -= _bytes
+            except OSError:
+                pass
+
+
+results_cache = ResultCache()
@@ -0,0 +1,178 @@
+"""Field integral calculus from moving wire raw voltage data."""
+
+import numpy as _np
+
+from movingwire.tracing import traced as _traced
+
+
+def cumulative_flux(data, dt, delay=1):
+    """Calculates the running flux of every column of a voltage matrix.
+
+    Equivalent to evaluating _np.trapz(data[:idx - delay + 1, j], dx=dt) for
+    every sample index idx and column j, but in a single cumulative pass.
+
+    Args:
+        data (np.ndarray): voltage data, (samples, repetitions) or (samples,);
+        dt (float): sampling interval in [s];
+        delay (int): number of leading zero samples of the running flux
+                     (1 for the stretched wire and 2 for the flip coil
+                     legacy prefix integration).
+    Returns:
+        flux (np.ndarray): running flux [V.s], with the same shape as data.
+    """
+    data = _np.asarray(data, dtype=float)
+    flux = _np.zeros(data.shape)
+    n = data.shape[0] - delay
+    if n > 1:
+        _trapz = (data[1:n] + data[:n - 1]) * (dt / 2)
+        _np.cumsum(_trapz, axis=0, out=flux[delay + 1:])
+    return flux
+
+
+def offset_flux(data, dt, offset_samples=40):
+    """Calculates the offset corrected flip coil running flux.
+
+    The offset of each column is the mean of its first offset_samples
+    voltage readings.
+
+    Args:
+        data (np.ndarray): voltage data, (samples, repetitions);
+        dt (float): sampling interval in [s];
+        offset_samples (int): number of samples used to estimate the offset.
+    Returns:
+        flux (np.ndarray): running flux [V.s], (samples, repetitions).
+    """
+    data = _np.asarray(data, dtype=float)
+    _offset = data[:offset_samples].mean(axis=0)
+    return cumulative_flux(data - _offset, dt, delay=2)
+
+
+def sw_integral_indexes(meas):
+    """Returns the initial and final stretched wire integral indexes.
+
+    Args:
+        meas (MeasurementDataSW/2): measurement data.
+    Returns:
+        idx_0 (int): initial integral index;
+        idx_f (int): final integral index.
+    """
+    _dt = meas.nplc/60  # [s]
+
+    if getattr(meas, 'acq_init_interval', None) is None:
+        _acq_init_interval = 1  # [s]
+    else:
+        _acq_init_interval = meas.acq_init_interval - 0.1  # [s]
+
+    if getattr(meas, 'acq_final_interval', None) is None:
+        _acq_final_interval = 1  # [s]
+    else:
+        _acq_final_interval = meas.acq_final_interval  # [s]
+
+    _idx_0 = max(int(_acq_init_interval // _dt), 0)
+    _idx_f = int((meas.duration - _acq_final_interval) // _dt)
+    return _idx_0, _idx_f
+
+
+@_traced('integrate')
+def integral_calculus_sw(meas, I2=False):
+    """Calculates stretched wire field integrals from raw data.
+
+    Forward and backward data of all repetitions are integrated at once.
+    Sets flx_f, flx_b, I_f, I_b, I, If, If_std, Ib, Ib_std,
+    max_integral_diff and I1_mean/I1_std (or I2_mean/I2_std) on meas.
+
+    Args:
+        meas (MeasurementDataSW/2): measurement data;
+        I2 (bool): False for first integral calculus,
+                   True for second integral calculus.
+    Returns:
+        meas (MeasurementDataSW/2): updated measurement data.
+    """
+    _step = meas.step*1e-3  # [m]
+    _dt = meas.nplc/60  # [s]
+    _idx_0, _idx_f = sw_integral_indexes(meas)
+
+    if not I2:
+        # first field integral coefficient
+        _coef = 1 / (meas.gain * meas.turns * _step)
+    else:
+        # second field integral coefficient
+        _coef = meas.length / (meas.gain * meas.turns * _step)
+
+    # data[i, j]
+    # i: measurement voltage array index
+    # j: measurement number index
+    _frw = _np.asarray(meas.data_frw, dtype=float)
+    _bck = _np.asarray(meas.data_bck, dtype=float)
+    _frw = _frw.reshape(_frw.shape[0], -1)
+    _bck = _bck.reshape(_bck.shape[0], -1)
+    _flx = cumulative_flux(_np.stack([_frw, _bck], axis=1), _dt)
+    meas.flx_f = _flx[:, 0]
+    meas.flx_b = _flx[:, 1]
+
+    meas.I_f = meas.flx_f * _coef
+    meas.I_b = meas.flx_b * _coef
+    meas.I = (meas.I_f - meas.I_b) / 2
+
+    meas.If = meas.I_f[_idx_f, :] - meas.I_f[_idx_0, :]
+    meas.If_std = meas.If.std(ddof=1)
+
+    meas.Ib = meas.I_b[_idx_f, :] - meas.I_b[_idx_0, :]
+    meas.Ib_std = meas.Ib.std(ddof=1)
+
+    integrals = meas.I[_idx_f, :] - meas.I[_idx_0, :]
+    meas.max_integral_diff = integrals.max() - integrals.min()
+
+    if not I2:
+        meas.I1_mean = integrals.mean()
+        meas.I1_std = integrals.std(ddof=1)
+    else:
+        meas.I2_mean = integrals.mean()
+        meas.I2_std = integrals.std(ddof=1)
+
+    return meas
+
+
+@_traced('integrate')
+def integral_calculus_fc(cfg, meas, fdi_mode=False):
+    """Calculates flip coil first field integral from raw data.
+
+    Sets flx_f, flx_b, I_f, I_b, I, If, If_std, Ib, Ib_std, I_mean and
+    I_std on meas.
+
+    Args:
+        cfg (MeasurementConfig): measurement configuration;
+        meas (MeasurementDataFC): measurement data;
+        fdi_mode (bool): True if the data was already integrated by the FDI
+                         integrator; False for multimeter voltage data.
+    Returns:
+        meas (MeasurementDataFC): updated measurement data.
+    """
+    _width = cfg.width
+    _turns = cfg.turns  # number of coil turns
+    _dt = cfg.nplc/60
+    # I = flux/(2*N*width)
+    if not fdi_mode:
+        _frw = _np.asarray(meas.data_frw, dtype=float)
+        _bck = _np.asarray(meas.data_bck, dtype=float)
+        _flx = offset_flux(_np.stack([_frw, _bck], axis=1), _dt)
+        meas.flx_f = _flx[:, 0]
+        meas.flx_b = _flx[:, 1]
+    else:
+        meas.flx_f = _np.copy(meas.data_frw)
+        meas.flx_b = _np.copy(meas.data_bck)
+
+    meas.I_f = meas.flx_f * 1/(2*_turns*_width)
+    meas.I_b = meas.flx_b * 1/(2*_turns*_width)
+    meas.I = (meas.flx_f - meas.flx_b)/2 * 1/(2*_turns*_width)
+
+    meas.If = meas.I_f[61, :] - meas.I_f[40, :]
+    meas.If_std = meas.If.std(ddof=1)
+
+    meas.Ib = meas.I_b[61, :] - meas.I_b[40, :]
+    meas.Ib_std = meas.Ib.std(ddof=1)
+
+    meas.I_mean = (meas.If.mean() - meas.Ib.mean())/2
+    meas.I_std = 1/2*(meas.If_std**2 + meas.Ib_std**2)**0.5
+
+    return meas
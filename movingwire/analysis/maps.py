@@ -0,0 +1,117 @@
+"""Field integral map assembly from stretched wire measurements."""
+
+import numpy as _np
+import pandas as _pd
+
+from movingwire.data.loaders import (
+    pandas_load_map_measurements as _pandas_load_map_measurements,
+    select_id_range as _select_id_range,
+    )
+
+
+def _select(meas, start_id, end_id):
+    """Returns the map rows of meas and their Ix (Y motion) and Iy (X
+    motion) subsets, None where empty."""
+    if end_id == 0:
+        return None, None, None
+    _rows = _select_id_range(meas, start_id, end_id)
+    _x = _rows.loc[_rows['motion_axis'] == 'Y']
+    _y = _rows.loc[_rows['motion_axis'] == 'X']
+    return (_rows, _x if len(_x) > 0 else None,
+            _y if len(_y) > 0 else None)
+
+
+def component_grid(meas, x_array, y_array, mean_col, std_col, scale):
+    """Builds a dense map of one field integral component.
+
+    The repetition with the lowest standard deviation is selected at each
+    (x_pos, y_pos) in a single sort (NaN stds last, ties keep the first
+    measurement).
+
+    Args:
+        meas (pd.DataFrame): measurements of the component, None if it was
+                             not measured;
+        x_array (np.ndarray): map x positions [mm];
+        y_array (np.ndarray): map y positions [mm];
+        mean_col (str): integral column name (I1_mean or I2_mean);
+        std_col (str): standard deviation column name (I1_std or I2_std);
+        scale (float): unit conversion factor.
+    Returns:
+        (mean, std) arrays with shape (len(y_array), len(x_array)), zero if
+        meas is None and NaN at positions without measurements.
+    """
+    _shape = (len(y_array), len(x_array))
+    if meas is None:
+        return _np.zeros(_shape), _np.zeros(_shape)
+    _mean = _np.full(_shape, _np.nan)
+    _std = _np.full(_shape, _np.nan)
+    _best = meas.sort_values(std_col, kind='stable').drop_duplicates(
+        ['x_pos', 'y_pos'])
+    _ix = _pd.Index(x_array).get_indexer(_best['x_pos'])
+    _iy = _pd.Index(y_array).get_indexer(_best['y_pos'])
+    _valid = (_ix >= 0) & (_iy >= 0)
+    _ix, _iy = _ix[_valid], _iy[_valid]
+    _mean[_iy, _ix] = _best[mean_col].values[_valid]*scale
+    _std[_iy, _ix] = _best[std_col].values[_valid]*scale
+    return _mean, _std
+
+
+def map_grids(meas_I1, meas_I2, map_data):
+    """Builds the dense field integral maps of map_data.
+
+    Args:
+        meas_I1 (pd.DataFrame): sw I1 measurements (with id column);
+        meas_I2 (pd.DataFrame): sw I2 measurements (with id column);
+        map_data (IntegralMaps): integral map with the measurement id
+                                 ranges.
+    Returns:
+        x_array, y_array and a dict with (ny, nx) arrays for I1x, I1x_std,
+        I1y, I1y_std [G.cm], I2x, I2x_std, I2y and I2y_std [kG.cm^2].
+    """
+    _I1, _I1x, _I1y = _select(meas_I1, map_data.I1_start_id,
+                              map_data.I1_end_id)
+    _I2, _I2x, _I2y = _select(meas_I2, map_data.I2_start_id,
+                              map_data.I2_end_id)
+
+    _pos = _I1 if _I1 is not None else _I2
+    if _pos is None:
+        raise ValueError('The map has no measurements.')
+    # sorted, since the map points may be measured in serpentine order
+    _x_array = _np.sort(_pos['x_pos'].unique())
+    _y_array = _np.sort(_pos['y_pos'].unique())
+
+    _grids = {}
+    for _name, _meas, _col, _scale in [
+            ('I1x', _I1x, 'I1', 10**6), ('I1y', _I1y, 'I1', 10**6),
+            ('I2x', _I2x, 'I2', 10**5), ('I2y', _I2y, 'I2', 10**5)]:
+        _grids[_name], _grids[_name + '_std'] = component_grid(
+            _meas, _x_array, _y_array, _col + '_mean', _col + '_std',
+            _scale)
+    return _x_array, _y_array, _grids
+
+
+def update_map_arrays(map_data, meas_I1=None, meas_I2=None):
+    """Updates field integral map data position and field integral arrays.
+    If one of the integrals or components were not selected to be measured,
+    their values will be set to zero.
+    If repetitions > 1, saves the smaller error measurement at each
+    coordinate.
+
+    Args:
+        map_data (IntegralMaps): Integral maps database class to be
+                                 updated;
+        meas_I1 (pd.DataFrame): sw I1 measurements, the map id range is
+                                loaded from the database if None;
+        meas_I2 (pd.DataFrame): sw I2 measurements, the map id range is
+                                loaded from the database if None.
+    """
+    if meas_I1 is None or meas_I2 is None:
+        meas_I1, meas_I2 = _pandas_load_map_measurements(map_data)
+
+    _x_array, _y_array, _grids = map_grids(meas_I1, meas_I2, map_data)
+
+    # map arrays are stored flattened with x varying fastest
+    map_data.x_pos_array = _x_array
+    map_data.y_pos_array = _y_array
+    for _name, _grid in _grids.items():
+        setattr(map_data, _name, _grid.ravel())
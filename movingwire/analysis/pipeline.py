@@ -0,0 +1,111 @@
+"""Background processing of finished measurements."""
+
+import sys as _sys
+import queue as _queue
+import threading as _threading
+import traceback as _traceback
+
+
+class AnalysisPipeline():
+    """Producer/consumer pipeline for measurement post-processing.
+
+    The acquisition loop submits finished measurements and continues while a
+    worker thread calls process on each of them. The input queue is bounded,
+    so submit blocks (back-pressure) when the worker falls behind.
+    """
+
+    _stop = object()
+
+    def __init__(self, process, maxsize=2):
+        """Create the pipeline.
+
+        Args:
+            process (function): called by the worker thread with each
+                                submitted item, its return value is
+                                reported by results;
+            maxsize (int): maximum number of items waiting to be processed.
+        """
+        self.process = process
+        self._queue = _queue.Queue(maxsize=maxsize)
+        self._done = _queue.Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        """Returns True if the worker thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts the worker thread."""
+        if not self.running:
+            self._thread = _threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            _item = self._queue.get()
+            try:
+                if _item is self._stop:
+                    break
+                try:
+                    _result = self.process(_item)
+                    self._done.put((_item, _result, None))
+                except Exception as e:
+                    _traceback.print_exc(file=_sys.stdout)
+                    self._done.put((_item, None, e))
+            finally:
+                self._queue.task_done()
+
+    def _put(self, item, wait=None):
+        while True:
+            try:
+                self._queue.put(item, timeout=0.05)
+                return
+            except _queue.Full:
+                if wait is not None:
+                    wait(0.05)
+
+    def submit(self, item, wait=None):
+        """Queues an item for processing.
+
+        Args:
+            item (object): item passed to process;
+            wait (function): called with a time interval in [s] while the
+                             queue is full (e.g. a sleep that processes GUI
+                             events).
+        """
+        self.start()
+        self._put(item, wait)
+
+    def results(self):
+        """Returns the finished items.
+
+        Returns:
+            list of (item, result, error) tuples, error is None if process
+            succeeded.
+        """
+        _results = []
+        while True:
+            try:
+                _results.append(self._done.get_nowait())
+            except _queue.Empty:
+                return _results
+
+    def join(self, wait=None):
+        """Waits until every submitted item is processed and stops the worker.
+
+        Args:
+            wait (function): called with a time interval in [s] while the
+                             worker is busy.
+        Returns:
+            list of (item, result, error) tuples not yet returned by results.
+        """
+        if self.running:
+            self._put(self._stop, wait)
+            while self._thread.is_alive():
+                if wait is not None:
+                    wait(0.05)
+                else:
+                    self._thread.join(0.05)
+            self._thread = None
+        return self.results()
@@ -0,0 +1,334 @@
+"""Recalculates the field integrals of every measurement of a database.
+
+The measurement rows are read in chunks and their integrals are
+calculated by a process pool. The ambient field correction is applied and
+the results of each table are written in a single transaction, either back
+into the measurement table or into a separate results table.
+
+Usage:
+    python -m movingwire.analysis.reprocess database.db
+        [--acq-init-interval 1.5] [--acq-final-interval 1] [--table name]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import sqlite3 as _sqlite3
+import argparse as _argparse
+import concurrent.futures as _futures
+from types import SimpleNamespace as _SimpleNamespace
+
+from movingwire.analysis import integrals as _integrals
+from movingwire.data import arraycodec as _arraycodec
+from movingwire.data import summary as _summary
+
+
+# measurement table: (integral mean and std columns)
+TABLES = {
+    'measurements_sw_I1': ('I1_mean', 'I1_std'),
+    'measurements_sw_I2': ('I2_mean', 'I2_std'),
+    'measurements_fc_I1': ('I1_mean', 'I1_std'),
+    }
+
+SW_COLUMNS = ['id', 'Iamb_id', 'step', 'gain', 'turns', 'length', 'nplc',
+              'duration', 'acq_init_interval', 'acq_final_interval',
+              'data_frw', 'data_bck']
+FC_COLUMNS = ['id', 'Iamb_id', 'cfg_id', 'data_frw', 'data_bck']
+CFG_COLUMNS = ['id', 'width', 'turns', 'nplc']
+
+# parameters that can be replaced in stretched wire measurements
+PARAMETERS = ['acq_init_interval', 'acq_final_interval', 'gain', 'turns']
+
+
+def calculate(item):
+    """Calculates the integrals of one measurement row.
+
+    Runs in the pool processes.
+
+    Args:
+        item (tuple): (table, row, cfg, fdi_mode), row and cfg are dicts
+                      with the table columns (cfg is None for stretched
+                      wire measurements).
+    Returns:
+        (id, mean, std) tuple, mean and std are None if the calculation
+        failed.
+    """
+    table, row, cfg, fdi_mode = item
+    try:
+        _meas = _SimpleNamespace(**row)
+        _meas.data_frw = _arraycodec.decode(row['data_frw'])
+        _meas.data_bck = _arraycodec.decode(row['data_bck'])
+        if table == 'measurements_fc_I1':
+            _integrals.integral_calculus_fc(
+                _SimpleNamespace(**cfg), _meas, fdi_mode)
+            return row['id'], float(_meas.I_mean), float(_meas.I_std)
+        I2 = table == 'measurements_sw_I2'
+        _integrals.integral_calculus_sw(_meas, I2)
+        if not I2:
+            return row['id'], float(_meas.I1_mean), float(_meas.I1_std)
+        return row['id'], float(_meas.I2_mean), float(_meas.I2_std)
+    except Exception:
+        return row['id'], None, None
+
+
+def stored_integrals(con, table, ids):
+    """Returns a dict id: (mean, std) with the saved integrals of ids."""
+    _mean, _std = TABLES[table]
+    _ids = list(ids)
+    _values = {}
+    for i in range(0, len(_ids), 500):
+        _chunk = _ids[i:i + 500]
+        _rows = con.execute(
+            'SELECT id, {0}, {1} FROM {2} WHERE id IN ({3})'.format(
+                _mean, _std, table, ', '.join('?'*len(_chunk))), _chunk)
+        _values.update({row[0]: (row[1], row[2]) for row in _rows})
+    return _values
+
+
+def ambient_correction(con, table, results, ambient_ids):
+    """Discounts the ambient field integrals from results.
+
+    Ambient measurements recalculated in the same run are discounted with
+    their new values, the others with the saved values.
+
+    Args:
+        con (sqlite3.Connection): database connection;
+        table (str): measurement table name;
+        results (dict): id: (mean, std) recalculated integrals, updated in
+                        place (in id order, so corrected ambient
+                        measurements are used by later ones);
+        ambient_ids (dict): id: Iamb_id of each recalculated measurement.
+    """
+    _stored = stored_integrals(
+        con, table, set(ambient_ids.values()) - set(results) - {0, None})
+    for idn in sorted(results):
+        _amb_id = ambient_ids.get(idn)
+        if not _amb_id or results[idn][0] is None:
+            continue
+        _amb = results.get(_amb_id, _stored.get(_amb_id))
+        if _amb is None or _amb[0] is None:
+            results[idn] = (None, None)
+            continue
+        _mean, _std = results[idn]
+        results[idn] = (_mean - _amb[0], (_std**2 + _amb[1]**2)**0.5)
+
+
+def read_rows(con, table, chunk=100):
+    """Yields the measurement rows of table (as dicts) in chunks."""
+    _columns = SW_COLUMNS if table != 'measurements_fc_I1' else FC_COLUMNS
+    _cursor = con.execute('SELECT {0} FROM {1} ORDER BY id'.format(
+        ', '.join(_columns), table))
+    while True:
+        _rows = _cursor.fetchmany(chunk)
+        if len(_rows) == 0:
+            break
+        yield [dict(zip(_columns, row)) for row in _rows]
+
+
+def read_cfgs(con):
+    """Returns a dict id: measurement configuration columns (dict)."""
+    try:
+        _rows = con.execute('SELECT {0} FROM measurement_cfg'.format(
+            ', '.join(CFG_COLUMNS)))
+    except _sqlite3.OperationalError:
+        return {}
+    return {row[0]: dict(zip(CFG_COLUMNS, row)) for row in _rows}
+
+
+def create_results_table(con, name):
+    """Creates the results table if needed."""
+    con.execute(
+        'CREATE TABLE IF NOT EXISTS {0} ('
+        'id INTEGER PRIMARY KEY, collection TEXT NOT NULL, '
+        'meas_id INTEGER NOT NULL, I_mean REAL, I_std REAL, date TEXT, '
+        'hour TEXT, acq_init_interval REAL, acq_final_interval REAL, '
+        'gain REAL, turns REAL, fdi_mode INTEGER, '
+        'UNIQUE (collection, meas_id))'.format(name))
+
+
+def write_results(con, table, results, parameters, fdi_mode=False,
+                  results_table=None):
+    """Writes the recalculated integrals in a single transaction.
+
+    Args:
+        con (sqlite3.Connection): database connection;
+        table (str): measurement table name;
+        results (dict): id: (mean, std) recalculated integrals, failed
+                        calculations (None) are not written;
+        parameters (dict): replaced parameters, also written to the
+                           stretched wire measurement rows;
+        fdi_mode (bool): flip coil FDI integrator mode;
+        results_table (str): table to write the results into, None to
+                             update the measurement table.
+    Returns:
+        number of rows written.
+    """
+    _values = [(idn, mean, std) for idn, (mean, std) in sorted(
+        results.items()) if mean is not None]
+    _mean, _std = TABLES[table]
+    if table == 'measurements_fc_I1':
+        parameters = {}
+    parameters = {name: parameters[name] for name in PARAMETERS
+                  if name in parameters}
+    _sets = [_mean, _std] + list(parameters)
+    with con:
+        if results_table is None:
+            con.executemany(
+                'UPDATE {0} SET {1} WHERE id = ?'.format(
+                    table, ', '.join(col + ' = ?' for col in _sets)),
+                [(mean, std) + tuple(parameters.values()) + (idn, )
+                 for idn, mean, std in _values])
+            if _summary_exists(con):
+                _summary.update_integrals(con, table, _values)
+        else:
+            create_results_table(con, results_table)
+            con.executemany(
+                'INSERT OR REPLACE INTO {0} (collection, meas_id, I_mean, '
+                'I_std, date, hour, acq_init_interval, acq_final_interval, '
+                'gain, turns, fdi_mode) SELECT ?, id, ?, ?, date, hour, '
+                '{1}, {2}, {3}, {4}, ? FROM {5} WHERE id = ?'.format(
+                    results_table,
+                    *[('?' if name in parameters else name)
+                      if table != 'measurements_fc_I1' else 'NULL'
+                      for name in PARAMETERS], table),
+                [(table, mean, std) + tuple(parameters.values()) +
+                 (int(fdi_mode), idn) for idn, mean, std in _values])
+    return len(_values)
+
+
+def _summary_exists(con):
+    return con.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND "
+        "name = ?", (_summary.TABLE, )).fetchone()[0] > 0
+
+
+def reprocess_table(con, table, pool, parameters=None, fdi_mode=False,
+                    results_table=None, chunk=100, cfgs=None, progress=None):
+    """Recalculates the integrals of a measurement table.
+
+    Args:
+        con (sqlite3.Connection): database connection;
+        table (str): measurement table name;
+        pool (concurrent.futures.Executor): executor of the calculations;
+        parameters (dict): stretched wire parameters to replace, e.g.
+                           {'acq_init_interval': 1.5};
+        fdi_mode (bool): flip coil FDI integrator mode;
+        results_table (str): table to write the results into, None to
+                             update the measurement table;
+        chunk (int): rows read per query;
+        cfgs (dict): measurement configurations by id (flip coil only);
+        progress (function): called with (table, rows processed) after each
+                             chunk.
+    Returns:
+        (rows written, failed calculations).
+    """
+    parameters = parameters or {}
+    _results = {}
+    _ambient_ids = {}
+    for _rows in read_rows(con, table, chunk):
+        _items = []
+        for _row in _rows:
+            _row.update(parameters)
+            _cfg = None
+            if table == 'measurements_fc_I1':
+                _cfg = (cfgs or {}).get(_row['cfg_id'])
+                if _cfg is None:
+                    _results[_row['id']] = (None, None)
+                    continue
+            _ambient_ids[_row['id']] = _row['Iamb_id']
+            _items.append((table, _row, _cfg, fdi_mode))
+        for idn, mean, std in pool.map(calculate, _items):
+            _results[idn] = (mean, std)
+        if progress is not None:
+            progress(table, len(_results))
+
+    ambient_correction(con, table, _results, _ambient_ids)
+    _written = write_results(con, table, _results, parameters, fdi_mode,
+                             results_table)
+    return _written, len(_results) - _written
+
+
+def reprocess(database_name, parameters=None, fdi_mode=False,
+              results_table=None, tables=None, workers=None, chunk=100,
+              progress=None):
+    """Recalculates the integrals of every measurement of a database.
+
+    Args:
+        database_name (str): sqlite database file;
+        parameters (dict): stretched wire parameters to replace;
+        fdi_mode (bool): flip coil FDI integrator mode;
+        results_table (str): table to write the results into, None to
+                             update the measurement tables;
+        tables (list): measurement tables, all of TABLES if None;
+        workers (int): number of processes, the number of cores if None;
+        chunk (int): rows read per query;
+        progress (function): called with (table, rows processed).
+    Returns:
+        dict table: (rows written, failed calculations).
+    """
+    con = _sqlite3.connect(database_name)
+    try:
+        _existing = [row[0] for row in con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        _cfgs = read_cfgs(con)
+        _counts = {}
+        with _futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for table in tables or list(TABLES):
+                if table not in _existing:
+                    _counts[table] = (0, 0)
+                    continue
+                _counts[table] = reprocess_table(
+                    con, table, pool, parameters, fdi_mode, results_table,
+                    chunk, _cfgs, progress)
+    finally:
+        con.close()
+    return _counts
+
+
+def main(argv=None):
+    parser = _argparse.ArgumentParser(
+        prog='python -m movingwire.analysis.reprocess',
+        description='Recalculates the field integrals of a database.')
+    parser.add_argument('database', help='sqlite database file.')
+    parser.add_argument('--acq-init-interval', type=float,
+                        help='stretched wire initial interval [s].')
+    parser.add_argument('--acq-final-interval', type=float,
+                        help='stretched wire final interval [s].')
+    parser.add_argument('--gain', type=float,
+                        help='stretched wire integrator gain.')
+    parser.add_argument('--turns', type=float,
+                        help='stretched wire number of turns.')
+    parser.add_argument('--fdi', action='store_true',
+                        help='flip coil data integrated by the FDI.')
+    parser.add_argument('--table', help='write the results into this table '
+                        'instead of the measurement tables.')
+    parser.add_argument('--only', choices=list(TABLES), action='append',
+                        help='measurement table to recalculate (all if not '
+                        'given, may be repeated).')
+    parser.add_argument('--workers', type=int, help='number of processes '
+                        '(number of cores by default).')
+    parser.add_argument('--chunk', type=int, default=100,
+                        help='rows read per query.')
+    args = parser.parse_args(argv)
+
+    _parameters = {name: getattr(args, name) for name in PARAMETERS
+                   if getattr(args, name) is not None}
+    _start = _time.time()
+
+    def progress(table, count):
+        _elapsed = _time.time() - _start
+        print('{0}: {1} rows, {2:.1f} rows/s'.format(
+            table, count, count/_elapsed if _elapsed > 0 else 0), flush=True)
+
+    _counts = reprocess(args.database, _parameters, args.fdi, args.table,
+                        args.only, args.workers or _os.cpu_count(),
+                        args.chunk, progress)
+    for table, (written, failed) in _counts.items():
+        print('{0}: {1} rows written, {2} failed.'.format(
+            table, written, failed))
+    print('Finished in {0:.1f} s.'.format(_time.time() - _start))
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
@@ -1,4 +1,10 @@
 """Sub-package for configuration data."""
 
+from . import arraycodec
 from . import configuration
+from . import gather
+from . import loaders
 from . import measurement
+from . import summary
+from . import sweepbuffer
+from . import timings
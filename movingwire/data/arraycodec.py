@@ -0,0 +1,137 @@
+"""Compact storage of numpy array fields in database documents.
+
+Array fields were stored as JSON lists (about 20 bytes per float64). The
+codec stores the raw little-endian buffer with its dtype and shape as a
+text token, so it still fits the JSON text columns written by the database
+documents:
+
+    mwa1:<dtype>:<shape>:<compression>:<base64 buffer>
+
+e.g. 'mwa1:<f8:1800,10:zlib:eJz...'. decode also accepts the legacy JSON
+lists, so old rows stay readable (see migration.py to convert them).
+"""
+
+import json as _json
+import zlib as _zlib
+import base64 as _base64
+import numpy as _np
+
+from movingwire.tracing import traced as _traced
+
+
+PREFIX = 'mwa1:'
+
+
+def is_encoded(value):
+    """Returns True if value is an encoded array token."""
+    if isinstance(value, _np.ndarray) and value.ndim == 0:
+        value = value.item()
+    return isinstance(value, str) and value.startswith(PREFIX)
+
+
+def encode(array, compress=False):
+    """Encodes a numeric array into a text token.
+
+    Args:
+        array (np.ndarray): numeric array;
+        compress (bool): True to compress the buffer with zlib.
+    Returns:
+        encoded array (str).
+    """
+    _array = _np.asarray(array)
+    _dtype = _array.dtype.newbyteorder('<')
+    _buffer = _np.ascontiguousarray(_array, dtype=_dtype).tobytes()
+    if compress:
+        _buffer = _zlib.compress(_buffer)
+    return '{0}{1}:{2}:{3}:{4}'.format(
+        PREFIX, _dtype.str, ','.join(str(n) for n in _array.shape),
+        'zlib' if compress else 'raw',
+        _base64.b64encode(_buffer).decode('ascii'))
+
+
+def decode(value):
+    """Decodes an array field value.
+
+    Args:
+        value (str, bytes, list or np.ndarray): encoded token, legacy JSON
+                                                text, list or array.
+    Returns:
+        np.ndarray.
+    """
+    if isinstance(value, _np.ndarray):
+        if not is_encoded(value):
+            return value
+        value = value.item()
+    if isinstance(value, bytes):
+        value = value.decode('ascii')
+    if isinstance(value, str):
+        if value.startswith('"'):
+            # token saved as a JSON string
+            value = _json.loads(value)
+        if not value.startswith(PREFIX):
+            return _np.array(_json.loads(value))
+        _dtype, _shape, _compression, _data = value[len(PREFIX):].split(
+            ':', 3)
+        _buffer = _base64.b64decode(_data)
+        if _compression == 'zlib':
+            _buffer = _zlib.decompress(_buffer)
+        _shape = tuple(int(n) for n in _shape.split(',') if n != '')
+        _array = _np.frombuffer(_buffer, dtype=_dtype).reshape(_shape)
+        return _array.astype(_array.dtype.newbyteorder('='))
+    return _np.array(value)
+
+
+def array_fields(document):
+    """Returns the attribute names of the array fields of a document."""
+    return [name for name, field in document.db_dict.items()
+            if field['dtype'] is _np.ndarray]
+
+
+class ArrayCodecMixin():
+    """Stores the array fields of a database document with the codec.
+
+    Must come before the database document class in the bases.
+    """
+
+    compress_arrays = False
+
+    def _encode_arrays(self):
+        _arrays = {}
+        for name in array_fields(self):
+            _value = getattr(self, name, None)
+            if _value is None or is_encoded(_value):
+                continue
+            _array = _np.asarray(_value)
+            if _array.dtype.kind not in 'biuf':
+                continue
+            _arrays[name] = _value
+            setattr(self, name, _np.array(
+                encode(_array, self.compress_arrays)))
+        return _arrays
+
+    def decode_arrays(self):
+        """Decodes the array fields read from the database."""
+        for name in array_fields(self):
+            _value = getattr(self, name, None)
+            if is_encoded(_value):
+                setattr(self, name, decode(_value))
+
+    def _with_encoded_arrays(self, method, *args, **kwargs):
+        _arrays = self._encode_arrays()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            for name, value in _arrays.items():
+                setattr(self, name, value)
+
+    @_traced('save')
+    def db_save(self, *args, **kwargs):
+        return self._with_encoded_arrays(super().db_save, *args, **kwargs)
+
+    def db_update(self, *args, **kwargs):
+        return self._with_encoded_arrays(super().db_update, *args, **kwargs)
+
+    def db_read(self, *args, **kwargs):
+        _result = super().db_read(*args, **kwargs)
+        self.decode_arrays()
+        return _result
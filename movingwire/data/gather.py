@@ -0,0 +1,143 @@
+"""Gathered sweep positions of the stretched wire measurements.
+
+The PPMAC Gather captures (see devices.gather) of each forward and backward
+sweep are kept in their own table, one row per sweep, with the arrays
+stored by the array codec. Only sqlite databases are supported; on mongodb
+the captures are not saved.
+"""
+
+import sys as _sys
+import sqlite3 as _sqlite3
+import traceback as _traceback
+import collections as _collections
+
+from movingwire.data import arraycodec as _arraycodec
+
+
+TABLE = 'gather_data'
+DIRECTIONS = ('frw', 'bck')
+
+
+class GatherData(_collections.namedtuple(
+        'GatherData', ['motors', 'time', 'positions'])):
+    """Positions captured during a sweep.
+
+    motors (list): gathered motors;
+    time (np.ndarray): sample times from the first sample [s];
+    positions (np.ndarray): (samples, motors) positions [counts].
+    """
+
+    __slots__ = ()
+
+    def motor_pos(self, motor):
+        """Returns the positions of a gathered motor."""
+        return self.positions[:, self.motors.index(motor)]
+
+
+def connect(database_name):
+    """Opens the database and creates the gather table if needed."""
+    con = _sqlite3.connect(database_name)
+    con.execute(
+        'CREATE TABLE IF NOT EXISTS {0} ('
+        'id INTEGER PRIMARY KEY, collection TEXT NOT NULL, '
+        'meas_id INTEGER NOT NULL, sweep INTEGER NOT NULL, '
+        'direction TEXT NOT NULL, motors TEXT, time TEXT, positions TEXT, '
+        'UNIQUE (collection, meas_id, sweep, direction))'.format(TABLE))
+    return con
+
+
+def add(database_name, collection, idn, captures):
+    """Saves the captures of a measurement.
+
+    Args:
+        database_name (str): sqlite database file;
+        collection (str): measurement table name;
+        idn (int): measurement id;
+        captures (list): (forward, backward) GatherData pairs, one per
+                         sweep pair; None items are skipped.
+    """
+    _rows = []
+    for _sweep, _pair in enumerate(captures):
+        for _direction, _data in zip(DIRECTIONS, _pair):
+            if _data is None:
+                continue
+            _rows.append((
+                collection, int(idn), _sweep, _direction,
+                ','.join(str(m) for m in _data.motors),
+                _arraycodec.encode(_data.time, compress=True),
+                _arraycodec.encode(_data.positions, compress=True)))
+    if len(_rows) == 0:
+        return
+    con = connect(database_name)
+    try:
+        with con:
+            con.executemany(
+                'INSERT OR REPLACE INTO {0} (collection, meas_id, sweep, '
+                'direction, motors, time, positions) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)'.format(TABLE), _rows)
+    finally:
+        con.close()
+
+
+def load(database_name, collection, idn):
+    """Reads the captures of a measurement.
+
+    Returns:
+        list of (forward, backward) GatherData pairs ordered by sweep,
+        with None for a missing direction.
+    """
+    con = connect(database_name)
+    try:
+        _rows = con.execute(
+            'SELECT sweep, direction, motors, time, positions FROM {0} '
+            'WHERE collection = ? AND meas_id = ? '
+            'ORDER BY sweep'.format(TABLE), (collection, int(idn))).fetchall()
+    finally:
+        con.close()
+    _pairs = {}
+    for _sweep, _direction, _motors, _time, _positions in _rows:
+        _pair = _pairs.setdefault(_sweep, [None, None])
+        _pair[DIRECTIONS.index(_direction)] = GatherData(
+            [int(m) for m in _motors.split(',') if m != ''],
+            _arraycodec.decode(_time), _arraycodec.decode(_positions))
+    return [tuple(_pairs[s]) for s in sorted(_pairs)]
+
+
+class GatherMixin():
+    """Saves the gathered positions (gather_data attribute) with the
+    measurement.
+
+    Must come before the database document class in the bases.
+    """
+
+    gather_data = None
+    gather_database = None
+
+    def db_update_database(self, database_name=None, mongo=False,
+                           server=None, **kwargs):
+        self.gather_database = database_name if not mongo else None
+        return super().db_update_database(
+            database_name=database_name, mongo=mongo, server=server,
+            **kwargs)
+
+    def db_save(self, *args, **kwargs):
+        _idn = super().db_save(*args, **kwargs)
+        if self.gather_database is not None and self.gather_data:
+            try:
+                if _idn is None:
+                    _idn = self.db_get_last_id()
+                add(self.gather_database, self.collection_name, _idn,
+                    self.gather_data)
+            except Exception:
+                _traceback.print_exc(file=_sys.stdout)
+        return _idn
+
+    def load_gather_data(self, idn):
+        """Reads the gathered positions of the measurement idn into
+        gather_data."""
+        if self.gather_database is None:
+            self.gather_data = None
+        else:
+            self.gather_data = load(self.gather_database,
+                                    self.collection_name, idn)
+        return self.gather_data
@@ -0,0 +1,133 @@
+"""Pandas loaders of the stretched wire measurement and map tables.
+
+Used by the map assembly (analysis.maps) and the GUI, which re-exports
+them from gui.utils.
+"""
+
+import sqlite3 as _sqlite3
+import pandas as _pd
+
+
+MEAS_TABLES = ('measurements_sw_I1', 'measurements_sw_I2')
+MAP_COLUMNS = {
+    'measurements_sw_I1': ['id', 'name', 'motion_axis', 'x_pos', 'y_pos',
+                           'Iamb_id', 'I1_mean', 'I1_std'],
+    'measurements_sw_I2': ['id', 'name', 'motion_axis', 'x_pos', 'y_pos',
+                           'Iamb_id', 'I2_mean', 'I2_std'],
+    }
+
+
+def create_db_indexes(con):
+    """Creates the id, name and motion_axis indexes of the stretched wire
+    measurement tables if they do not exist.
+
+    Args:
+        con (sqlite3.Connection): database connection.
+    """
+    try:
+        for _table in MEAS_TABLES:
+            for _col in ['id', 'name', 'motion_axis']:
+                con.execute('CREATE INDEX IF NOT EXISTS idx_{0}_{1} '
+                            'ON {0}({1})'.format(_table, _col))
+        con.commit()
+    except _sqlite3.Error:
+        # read-only database or missing table, queries still work
+        pass
+
+
+def pandas_load_db_table(con, table, columns=None, id_range=None,
+                         where=None, params=()):
+    """Loads rows of a database table using pandas.
+
+    Args:
+        con (sqlite3.Connection): database connection;
+        table (str): table name;
+        columns (list): columns to load, all columns if None;
+        id_range (tuple): (first id, last id) to load, both included;
+        where (str): additional SQL condition;
+        params (tuple): where condition parameters.
+    Returns:
+        pd.DataFrame with the selected rows.
+    """
+    _cols = '*' if columns is None else ', '.join(columns)
+    _conditions = []
+    _params = []
+    if id_range is not None:
+        _conditions.append('id BETWEEN ? AND ?')
+        _params.extend(int(_id) for _id in id_range)
+    if where is not None:
+        _conditions.append(where)
+        _params.extend(params)
+    _query = 'SELECT {0} FROM {1}'.format(_cols, table)
+    if len(_conditions) > 0:
+        _query += ' WHERE ' + ' AND '.join(_conditions)
+    return _pd.read_sql(_query + ' ORDER BY id', con, params=_params)
+
+
+def pandas_load_db_measurements(I1_ids=None, I2_ids=None, columns=None):
+    """Loads Database measurements using pandas.
+
+    Args:
+        I1_ids (tuple): (first id, last id) of the sw I1 measurements to
+                        load, all if None;
+        I2_ids (tuple): (first id, last id) of the sw I2 measurements to
+                        load, all if None;
+        columns (dict): table name: list of columns to load (e.g.
+                        MAP_COLUMNS), all columns if None.
+    Returns:
+        meas_I1 (pd.DataFrame): DataFrame containing sw I1 measurements;
+        meas_I2 (pd.DataFrame): DataFrame containing sw I2 measurements.
+    """
+
+    con = _sqlite3.connect('moving_wire_measurements.db')
+    try:
+        create_db_indexes(con)
+        _dfs = []
+        for _table, _ids in zip(MEAS_TABLES, [I1_ids, I2_ids]):
+            _cols = None if columns is None else columns[_table]
+            _dfs.append(pandas_load_db_table(con, _table, _cols, _ids))
+    finally:
+        con.close()
+    meas_I1, meas_I2 = _dfs
+    return meas_I1, meas_I2
+
+
+def pandas_load_map_measurements(map_data):
+    """Loads only the measurements referenced by a field integral map.
+
+    Args:
+        map_data (IntegralMaps or pd.Series): map with I1_start_id,
+                                              I1_end_id, I2_start_id and
+                                              I2_end_id.
+    Returns:
+        meas_I1, meas_I2 DataFrames with the MAP_COLUMNS of the map
+        measurements.
+    """
+    return pandas_load_db_measurements(
+        I1_ids=(map_data.I1_start_id, map_data.I1_end_id),
+        I2_ids=(map_data.I2_start_id, map_data.I2_end_id),
+        columns=MAP_COLUMNS)
+
+
+def select_id_range(meas, start_id, end_id):
+    """Returns the rows of meas with start_id <= id <= end_id."""
+    return meas.loc[(meas['id'] >= start_id) & (meas['id'] <= end_id)]
+
+
+def pandas_load_db_maps(name=None):
+    """Loads Database measurements using pandas.
+
+    Args:
+        name (str): loads only the map with this name if not None.
+    Returns:
+        maps (pd.DataFrame): DataFrame containing field integral maps data.
+    """
+
+    con = _sqlite3.connect('moving_wire_measurements.db')
+    if name is None:
+        maps = _pd.read_sql('SELECT * from integral_maps', con)
+    else:
+        maps = _pd.read_sql('SELECT * from integral_maps WHERE name = ?',
+                            con, params=[name])
+    con.close()
+    return maps
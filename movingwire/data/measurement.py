@@ -4,8 +4,13 @@ import numpy as _np
 import collections as _collections
 import imautils.db.database as _database
 
+from movingwire.data import arraycodec as _arraycodec
+from movingwire.data import gather as _gather
+from movingwire.data import summary as _summary
 
-class MeasurementDataFC(_database.DatabaseAndFileDocument):
+
+class MeasurementDataFC(_summary.SummaryMixin, _arraycodec.ArrayCodecMixin,
+                        _database.DatabaseAndFileDocument):
     """Read, write and store moving wire measurement results data."""
 
     label = 'Measurement'
@@ -66,7 +71,9 @@ class MeasurementDataFC(_database.DatabaseAndFileDocument):
             database_name=database_name, mongo=mongo, server=server)
 
 
-class MeasurementDataSW(_database.DatabaseAndFileDocument):
+class MeasurementDataSW(_summary.SummaryMixin, _gather.GatherMixin,
+                        _arraycodec.ArrayCodecMixin,
+                        _database.DatabaseAndFileDocument):
     """Read, write and store stretched wire measurement results data."""
 
     #.start, end, step, x|y, nturns
@@ -148,7 +155,9 @@ class MeasurementDataSW(_database.DatabaseAndFileDocument):
             database_name=database_name, mongo=mongo, server=server)
 
 
-class MeasurementDataSW2(_database.DatabaseAndFileDocument):
+class MeasurementDataSW2(_summary.SummaryMixin, _gather.GatherMixin,
+                         _arraycodec.ArrayCodecMixin,
+                         _database.DatabaseAndFileDocument):
     """Read, write and store stretched wire measurement results data."""
 
     label = 'MeasurementSWI2'
@@ -227,7 +236,8 @@ class MeasurementDataSW2(_database.DatabaseAndFileDocument):
             database_name=database_name, mongo=mongo, server=server)
 
 
-class IntegralMaps(_database.DatabaseAndFileDocument):
+class IntegralMaps(_arraycodec.ArrayCodecMixin,
+                   _database.DatabaseAndFileDocument):
     """Read, write and store stretched wire integrals map data."""
 
     label = 'IntegralMaps'
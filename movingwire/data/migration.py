@@ -0,0 +1,131 @@
+"""Converts JSON array fields of a sqlite database to the array codec.
+
+Usage:
+    python -m movingwire.data.migration database.db [--compress] [--vacuum]
+"""
+
+import sys as _sys
+import json as _json
+import sqlite3 as _sqlite3
+import argparse as _argparse
+import numpy as _np
+
+from movingwire.data import arraycodec as _arraycodec
+from movingwire.data import measurement as _measurement
+
+
+DOCUMENTS = [
+    _measurement.MeasurementDataFC,
+    _measurement.MeasurementDataSW,
+    _measurement.MeasurementDataSW2,
+    _measurement.IntegralMaps,
+    ]
+
+
+def array_columns(document):
+    """Returns the table name and array column names of a document class."""
+    return document.collection_name, [
+        field['field'] for field in document.db_dict.values()
+        if field['dtype'] is _np.ndarray]
+
+
+def convert_value(value, compress=False):
+    """Returns the encoded field value, or None if it is already encoded
+    or is not a numeric JSON array."""
+    if value is None or _arraycodec.is_encoded(value):
+        return None
+    if isinstance(value, str) and value.startswith('"'):
+        return None
+    try:
+        _array = _np.array(_json.loads(value))
+    except (TypeError, ValueError):
+        return None
+    if _array.dtype.kind not in 'biuf':
+        return None
+    return _json.dumps(_arraycodec.encode(_array, compress))
+
+
+def migrate_table(con, table, columns, compress=False, batch=100):
+    """Converts the array columns of a table.
+
+    Args:
+        con (sqlite3.Connection): database connection;
+        table (str): table name;
+        columns (list): array column names;
+        compress (bool): True to compress the array buffers;
+        batch (int): rows converted per transaction.
+    Returns:
+        number of converted values.
+    """
+    _existing = [row[1] for row in con.execute(
+        'PRAGMA table_info({0})'.format(table))]
+    columns = [col for col in columns if col in _existing]
+    if len(columns) == 0:
+        return 0
+    _ids = [row[0] for row in con.execute(
+        'SELECT id FROM {0} ORDER BY id'.format(table))]
+    _count = 0
+    for i in range(0, len(_ids), batch):
+        _chunk = _ids[i:i + batch]
+        _rows = con.execute(
+            'SELECT id, {0} FROM {1} WHERE id BETWEEN ? AND ?'.format(
+                ', '.join(columns), table), (_chunk[0], _chunk[-1]))
+        _updates = []
+        for _row in _rows:
+            for col, value in zip(columns, _row[1:]):
+                _new = convert_value(value, compress)
+                if _new is not None:
+                    _updates.append((col, _new, _row[0]))
+        with con:
+            for col, value, idn in _updates:
+                con.execute('UPDATE {0} SET {1} = ? WHERE id = ?'.format(
+                    table, col), (value, idn))
+        _count += len(_updates)
+    return _count
+
+
+def migrate(database_name, compress=False, vacuum=False):
+    """Converts every array column of the measurement tables.
+
+    Args:
+        database_name (str): sqlite database file;
+        compress (bool): True to compress the array buffers;
+        vacuum (bool): True to shrink the database file afterwards.
+    Returns:
+        dict with the number of converted values per table.
+    """
+    con = _sqlite3.connect(database_name)
+    try:
+        _counts = {}
+        for document in DOCUMENTS:
+            table, columns = array_columns(document)
+            try:
+                _counts[table] = migrate_table(con, table, columns, compress)
+            except _sqlite3.OperationalError:
+                # table not created in this database
+                _counts[table] = 0
+        if vacuum:
+            con.execute('VACUUM')
+    finally:
+        con.close()
+    return _counts
+
+
+def main(argv=None):
+    parser = _argparse.ArgumentParser(
+        prog='python -m movingwire.data.migration',
+        description='Converts JSON array fields to the array codec.')
+    parser.add_argument('database', help='sqlite database file.')
+    parser.add_argument('--compress', action='store_true',
+                        help='compress the array buffers with zlib.')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='shrink the database file afterwards.')
+    args = parser.parse_args(argv)
+    for table, count in migrate(args.database, args.compress,
+                                args.vacuum).items():
+        print('{0}: {1} values converted.'.format(table, count))
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
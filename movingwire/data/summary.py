@@ -0,0 +1,201 @@
+"""Measurement summary table for browsing without reading array fields.
+
+The summary keeps one row per measurement with its scalar results. Rows
+are added when a measurement is saved and rows missing from the summary
+(e.g. saved by an older version) are copied from the measurement tables
+the next time the summary is listed. Only sqlite databases are indexed;
+listing returns None for mongodb, so callers can fall back to the
+measurement tables.
+"""
+
+import sys as _sys
+import sqlite3 as _sqlite3
+import traceback as _traceback
+import numpy as _np
+
+
+TABLE = 'measurement_summary'
+COLUMNS = ['collection', 'meas_id', 'name', 'mode', 'date', 'hour',
+           'motion_axis', 'x_pos', 'y_pos', 'I_mean', 'I_std', 'Iamb_id']
+
+# measurement table: (mode, integral mean and std columns)
+COLLECTIONS = {
+    'measurements_fc_I1': ("'FC_I1'", 'I1_mean', 'I1_std'),
+    'measurements_sw_I1': ('mode', 'I1_mean', 'I1_std'),
+    'measurements_sw_I2': ('mode', 'I2_mean', 'I2_std'),
+    }
+
+
+def connect(database_name):
+    """Opens the database and creates the summary table if needed."""
+    con = _sqlite3.connect(database_name)
+    con.execute(
+        'CREATE TABLE IF NOT EXISTS {0} ('
+        'id INTEGER PRIMARY KEY, collection TEXT NOT NULL, '
+        'meas_id INTEGER NOT NULL, name TEXT, mode TEXT, date TEXT, '
+        'hour TEXT, motion_axis TEXT, x_pos REAL, y_pos REAL, I_mean REAL, '
+        'I_std REAL, Iamb_id INTEGER, '
+        'UNIQUE (collection, meas_id))'.format(TABLE))
+    con.execute('CREATE INDEX IF NOT EXISTS idx_{0}_name '
+                'ON {0}(collection, name)'.format(TABLE))
+    return con
+
+
+def _scalar(value):
+    if value is None:
+        return None
+    if isinstance(value, _np.ndarray) or isinstance(value, list):
+        # flip coil positions are stored as arrays
+        _array = _np.asarray(value, dtype=float)
+        return float(_array.mean()) if _array.size > 0 else None
+    return value
+
+
+def row_from_document(meas, idn):
+    """Returns the summary row of a measurement document.
+
+    Args:
+        meas (MeasurementDataFC/SW/SW2): measurement document;
+        idn (int): measurement id.
+    Returns:
+        tuple with the COLUMNS values.
+    """
+    _mode, _mean, _std = COLLECTIONS[meas.collection_name]
+    return (meas.collection_name, int(idn), meas.name,
+            getattr(meas, 'mode', None) or _mode.strip("'"),
+            meas.date, meas.hour, getattr(meas, 'motion_axis', None),
+            _scalar(getattr(meas, 'x_pos', None)),
+            _scalar(getattr(meas, 'y_pos', None)),
+            _scalar(getattr(meas, _mean, None)),
+            _scalar(getattr(meas, _std, None)),
+            getattr(meas, 'Iamb_id', None))
+
+
+def add(database_name, meas, idn):
+    """Adds or replaces the summary row of a saved measurement."""
+    con = connect(database_name)
+    try:
+        # older rows first, so sync keeps working from the last meas_id
+        sync(con, meas.collection_name)
+        _query = 'INSERT OR REPLACE INTO {0} ({1}) VALUES ({2})'.format(
+            TABLE, ', '.join(COLUMNS), ', '.join('?'*len(COLUMNS)))
+        with con:
+            con.execute(_query, row_from_document(meas, idn))
+    finally:
+        con.close()
+
+
+def sync(con, collection):
+    """Copies the measurements missing from the summary.
+
+    Only measurement ids greater than the last summarized id are read, and
+    only their scalar columns.
+
+    Returns:
+        number of rows added.
+    """
+    _mode, _mean, _std = COLLECTIONS[collection]
+    _last = con.execute(
+        'SELECT COALESCE(MAX(meas_id), 0) FROM {0} '
+        'WHERE collection = ?'.format(TABLE), (collection, )).fetchone()[0]
+    _cols = [row[1] for row in con.execute(
+        'PRAGMA table_info({0})'.format(collection))]
+    if len(_cols) == 0:
+        return 0
+    # flip coil positions are arrays, they are only summarized on save
+    _axis = 'motion_axis' if 'motion_axis' in _cols else 'NULL'
+    _pos = ('x_pos', 'y_pos') if _axis != 'NULL' else ('NULL', 'NULL')
+    with con:
+        _cursor = con.execute(
+            'INSERT OR IGNORE INTO {0} ({1}) SELECT ?, id, name, {2}, date, '
+            'hour, {3}, {4}, {5}, {6}, {7}, Iamb_id FROM {8} '
+            'WHERE id > ?'.format(TABLE, ', '.join(COLUMNS), _mode, _axis,
+                                  _pos[0], _pos[1], _mean, _std, collection),
+            (collection, _last))
+    return _cursor.rowcount
+
+
+def update_integrals(con, collection, values):
+    """Updates the integrals of summarized measurements.
+
+    Args:
+        con (sqlite3.Connection): database connection, the caller commits;
+        collection (str): measurement table name;
+        values (list): (meas_id, I_mean, I_std) tuples.
+    """
+    con.executemany(
+        'UPDATE {0} SET I_mean = ?, I_std = ? WHERE collection = ? AND '
+        'meas_id = ?'.format(TABLE),
+        [(mean, std, collection, idn) for idn, mean, std in values])
+
+
+def entries(database_name, collection, where=None, params=()):
+    """Returns the summary rows of a measurement table.
+
+    Args:
+        database_name (str): sqlite database file;
+        collection (str): measurement table name;
+        where (str): optional SQL condition on the summary columns, e.g.
+                     'motion_axis = ? AND Iamb_id = 0';
+        params (tuple): where condition parameters.
+    Returns:
+        list of dicts with the COLUMNS values, ordered by meas_id.
+    """
+    con = connect(database_name)
+    try:
+        sync(con, collection)
+        _query = 'SELECT {0} FROM {1} WHERE collection = ?'.format(
+            ', '.join(COLUMNS), TABLE)
+        if where is not None:
+            _query += ' AND (' + where + ')'
+        _rows = con.execute(_query + ' ORDER BY meas_id',
+                            (collection, ) + tuple(params)).fetchall()
+    finally:
+        con.close()
+    return [dict(zip(COLUMNS, row)) for row in _rows]
+
+
+def names(meas):
+    """Returns the measurement names and ids of a document table.
+
+    Args:
+        meas (SummaryMixin): measurement document, after
+                             db_update_database.
+    Returns:
+        (names, ids) lists ordered by id, or None if the document database
+        is not summarized.
+    """
+    _database = getattr(meas, 'summary_database', None)
+    if _database is None or meas.collection_name not in COLLECTIONS:
+        return None
+    _entries = entries(_database, meas.collection_name)
+    return ([entry['name'] for entry in _entries],
+            [entry['meas_id'] for entry in _entries])
+
+
+class SummaryMixin():
+    """Adds saved measurements to the summary table.
+
+    Must come before the database document class in the bases.
+    """
+
+    summary_database = None
+
+    def db_update_database(self, database_name=None, mongo=False,
+                           server=None, **kwargs):
+        self.summary_database = database_name if not mongo else None
+        return super().db_update_database(
+            database_name=database_name, mongo=mongo, server=server,
+            **kwargs)
+
+    def db_save(self, *args, **kwargs):
+        _idn = super().db_save(*args, **kwargs)
+        if self.summary_database is not None:
+            try:
+                if _idn is None:
+                    _idn = self.db_get_last_id()
+                add(self.summary_database, self, _idn)
+            except Exception:
+                # the summary is rebuilt from the tables when listed
+                _traceback.print_exc(file=_sys.stdout)
+        return _idn
@@ -0,0 +1,92 @@
+"""Preallocated acquisition buffer for repeated voltage sweeps."""
+
+import numpy as _np
+
+
+class SweepBuffer():
+    """Column-wise storage of repeated sweeps.
+
+    Each sweep is written into its own column of a preallocated
+    (samples, repetitions) array and its actual length is recorded, so
+    sweeps with different sample counts do not break the acquisition.
+    """
+
+    def __init__(self, nmeasurements, npoints, dtype=float):
+        """Allocate the buffer.
+
+        Args:
+            nmeasurements (int): expected number of sweeps (repetitions);
+            npoints (int): expected number of samples per sweep;
+            dtype (type): data type of the samples.
+        """
+        self._data = _np.zeros((max(int(npoints), 1),
+                                max(int(nmeasurements), 1)), dtype=dtype)
+        self.lengths = _np.zeros(self._data.shape[1], dtype=int)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        """Returns the (samples, repetitions) allocated shape."""
+        return self._data.shape
+
+    def _grow(self, nrows, ncols):
+        """Enlarges the buffer to at least (nrows, ncols)."""
+        _rows, _cols = self._data.shape
+        _new = _np.zeros((max(_rows, nrows), max(_cols, ncols)),
+                         dtype=self._data.dtype)
+        _new[:_rows, :_cols] = self._data
+        self._data = _new
+        _lengths = _np.zeros(_new.shape[1], dtype=int)
+        _lengths[:_cols] = self.lengths
+        self.lengths = _lengths
+
+    def append(self, sweep):
+        """Stores a sweep in the next free column.
+
+        Args:
+            sweep (array like): sweep samples. None is stored as an empty
+                                sweep.
+        Returns:
+            index (int): column index of the stored sweep.
+        """
+        if sweep is None:
+            sweep = []
+        sweep = _np.ravel(sweep)
+        _n = sweep.shape[0]
+        _idx = self.count
+        if _n > self._data.shape[0] or _idx >= self._data.shape[1]:
+            self._grow(_n, _idx + 1)
+        self._data[:_n, _idx] = sweep
+        self.lengths[_idx] = _n
+        self.count += 1
+        return _idx
+
+    def clear(self):
+        """Discards the stored sweeps keeping the allocated memory."""
+        self.lengths[:] = 0
+        self.count = 0
+
+    @property
+    def npoints(self):
+        """Returns the number of samples common to every stored sweep."""
+        if self.count == 0:
+            return 0
+        return int(self.lengths[:self.count].min())
+
+    def is_ragged(self):
+        """Returns True if the stored sweeps have different lengths."""
+        if self.count == 0:
+            return False
+        _lengths = self.lengths[:self.count]
+        return bool(_lengths.min() != _lengths.max())
+
+    def array(self):
+        """Returns the stored sweeps as a (samples, repetitions) array.
+
+        The array is a view on the buffer truncated to the shortest sweep,
+        so no data is copied.
+        """
+        return self._data[:self.npoints, :self.count]
@@ -0,0 +1,118 @@
+"""Timings of past runs for the run time estimates.
+
+One row is kept per finished run with the phases predicted by the run
+estimator (see engine.estimator), the elapsed time and, when the timing
+spans were recorded, the measured time of each phase. The calibration
+factors relate the measured and predicted times of the last runs of the
+same type. Only sqlite databases are supported.
+"""
+
+import json as _json
+import time as _time
+import sqlite3 as _sqlite3
+
+
+TABLE = 'run_timings'
+
+
+def connect(database_name):
+    """Opens the database and creates the timings table if needed."""
+    con = _sqlite3.connect(database_name)
+    con.execute(
+        'CREATE TABLE IF NOT EXISTS {0} ('
+        'id INTEGER PRIMARY KEY, run_type TEXT NOT NULL, date TEXT, '
+        'hour TEXT, sweeps INTEGER, estimated REAL, elapsed REAL, '
+        'predicted TEXT, measured TEXT)'.format(TABLE))
+    return con
+
+
+def measured_phases(summary, elapsed, phases):
+    """Returns the measured time of the estimated phases.
+
+    Args:
+        summary (dict): tracer summary, phase: (calls, self time, total
+                        time);
+        elapsed (float): run time [s];
+        phases (list): estimated phases, the 'other' phase gets the time
+                       not spent in the others.
+    Returns:
+        dict phase: time [s].
+    """
+    _measured = {p: summary[p][1] if p in summary else 0.0
+                 for p in phases if p != 'other'}
+    if 'other' in phases:
+        _measured['other'] = max(elapsed - sum(_measured.values()), 0)
+    return _measured
+
+
+def add(database_name, run_type, estimate, elapsed, measured=None):
+    """Saves the timing of a finished run.
+
+    Args:
+        database_name (str): sqlite database file;
+        run_type (str): run class name;
+        estimate (Estimate): uncalibrated run time estimate;
+        elapsed (float): run time [s];
+        measured (dict): measured time of each phase [s], if known.
+    """
+    con = connect(database_name)
+    try:
+        with con:
+            con.execute(
+                'INSERT INTO {0} (run_type, date, hour, sweeps, estimated, '
+                'elapsed, predicted, measured) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'.format(TABLE),
+                (run_type, _time.strftime('%Y-%m-%d'),
+                 _time.strftime('%H:%M:%S'), int(estimate.sweeps),
+                 float(estimate.total), float(elapsed),
+                 _json.dumps(estimate.phases),
+                 _json.dumps(measured) if measured is not None else None))
+    finally:
+        con.close()
+
+
+def history(database_name, run_type, limit=10):
+    """Returns the last timings of a run type.
+
+    Returns:
+        list of (estimated, elapsed, predicted, measured) tuples, the
+        newest first; predicted and measured are phase: time dicts,
+        measured is None if the phases were not traced.
+    """
+    con = connect(database_name)
+    try:
+        _rows = con.execute(
+            'SELECT estimated, elapsed, predicted, measured FROM {0} '
+            'WHERE run_type = ? ORDER BY id DESC LIMIT ?'.format(TABLE),
+            (run_type, int(limit))).fetchall()
+    finally:
+        con.close()
+    return [(_estimated, _elapsed, _json.loads(_predicted),
+             _json.loads(_measured) if _measured is not None else None)
+            for _estimated, _elapsed, _predicted, _measured in _rows]
+
+
+def calibration(database_name, run_type, limit=10):
+    """Returns the calibration factors of a run type.
+
+    Args:
+        database_name (str): sqlite database file;
+        run_type (str): run class name;
+        limit (int): number of past runs used.
+    Returns:
+        dict with the 'total' factor (elapsed over estimated time) and the
+        factor of each phase traced in the past runs (measured over
+        predicted time); empty if there are no past runs.
+    """
+    _history = history(database_name, run_type, limit)
+    _estimated = sum(row[0] for row in _history)
+    if _estimated <= 0:
+        return {}
+    _factors = {'total': sum(row[1] for row in _history)/_estimated}
+    _traced = [row for row in _history if row[3] is not None]
+    for _phase in set(p for row in _traced for p in row[2]):
+        _predicted = sum(row[2].get(_phase, 0) for row in _traced)
+        if _predicted > 0:
+            _factors[_phase] = sum(
+                row[3].get(_phase, 0) for row in _traced)/_predicted
+    return _factors
@@ -10,11 +10,18 @@ import sys as _sys
 import threading as _threading
 import traceback as _traceback
 import socket as _socket
+import re as _re
+import collections as _collections
 
 
 from movingwire.gui.utils import (
     sleep as _sleep,
     )
+from movingwire.tracing import traced as _traced
+from movingwire.devices.monitor import PpmacMonitor as _PpmacMonitor
+from movingwire.devices.mux import CommandMux as _CommandMux
+from movingwire.devices.gather import GatherCapture as _GatherCapture
+from movingwire.devices.compare import PositionCompare as _PositionCompare
 from pickle import TRUE
 
 
@@ -61,6 +68,9 @@ class MultiChannel(_Agilent34970ALib.Agilent34970AGPIB):
 class Multimeter(_Agilent3458ALib.Agilent3458AGPIB):
     """Multimeter class."""
 
+    transfer_time = None  # last binary transfer duration [s]
+    throughput = None  # last binary transfer rate [readings/s]
+
     def configure(self, aper, mrange):
         """Configure multimeter.
         Args:
@@ -115,10 +125,18 @@ class Multimeter(_Agilent3458ALib.Agilent3458AGPIB):
             self.send_command(self.commands.oformat_dreal)
             self.send_command(self.commands.mformat_dreal)
 
-    def start_measurement(self):
+    @_traced('acquire')
+    def start_measurement(self, external=False):
+        """Starts a reading burst (NRDGS readings).
+
+        Args:
+            external (bool): False to start it now (TRIG SGL), True to
+                             start it at the next external trigger edge
+                             (TRIG EXT).
+        """
         try:
             volt.configure_reading_format('DREAL')
-            volt.send_command('TRIG SGL')
+            volt.send_command('TRIG EXT' if external else 'TRIG SGL')
         except Exception:
             raise
 
@@ -134,6 +152,72 @@ class Multimeter(_Agilent3458ALib.Agilent3458AGPIB):
             _traceback.print_exc(file=_sys.stdout)
             # raise
 
+    @_traced('acquire')
+    def wait_data_count(self, npoints, timeout, interval=0.05):
+        """Waits until the reading memory holds the expected reading count.
+
+        Args:
+            npoints (int): expected number of readings;
+            timeout (float): maximum waiting time in [s];
+            interval (float): MCOUNT? polling interval in [s].
+        Returns:
+            count (int): last reading count (-1 or None if it could not be
+                         read)."""
+        _deadline = _time.monotonic() + timeout
+        _count = self.get_data_count()
+        while all([_count is None or _count < npoints,
+                   _time.monotonic() < _deadline]):
+            _sleep(interval)
+            _count = self.get_data_count()
+        return _count
+
+    @_traced('read')
+    def get_readings_from_memory(self, *args, **kwargs):
+        return super().get_readings_from_memory(*args, **kwargs)
+
+    @_traced('read')
+    def read_dreal(self, npoints, out=None):
+        """Reads DREAL readings from memory in a single binary block.
+
+        The readings are recalled with RMEM and the raw big-endian float64
+        block is converted at once, without per-value parsing.
+
+        Args:
+            npoints (int): number of readings to transfer;
+            out (np.ndarray): optional preallocated float64 buffer with at
+                              least npoints elements.
+        Returns:
+            data (np.ndarray): readings in acquisition order (a view on out
+                               if it was given).
+        """
+        if out is None:
+            out = _np.empty(npoints, dtype=_np.float64)
+        _t0 = _time.perf_counter()
+        self.send_command('RMEM 1,{0},1'.format(npoints))
+        _raw = self.inst.read_bytes(8*npoints)
+        # RMEM returns the most recent reading first
+        out[:npoints] = _np.frombuffer(
+            _raw, dtype='>f8', count=npoints)[::-1]
+        self.transfer_time = _time.perf_counter() - _t0
+        self.throughput = npoints/max(self.transfer_time, 1e-9)
+        return out[:npoints]
+
+    def read_sweep(self, npoints, timeout, out=None):
+        """Waits for a sweep to finish and transfers its readings.
+
+        Args:
+            npoints (int): expected number of readings;
+            timeout (float): maximum waiting time in [s];
+            out (np.ndarray): optional preallocated float64 buffer.
+        Returns:
+            data (np.ndarray): readings in acquisition order.
+        """
+        _count = self.wait_data_count(npoints, timeout)
+        if _count is None or _count <= 0:
+            # reading count not available
+            return self.get_readings_from_memory(5)[::-1]
+        return self.read_dreal(min(_count, npoints), out=out)
+
     def error_query(self):
         volt.send_command('ERR?')
         return int(volt.read_from_device().strip('\r\n'))
@@ -163,12 +247,32 @@ class Fdi(Fdi_eth):
         return counts
 
 
+MotionResult = _collections.namedtuple(
+    'MotionResult', ['reached', 'faulted', 'limit', 'aborted', 'elapsed'])
+MotionResult.__doc__ = """Result of Ppmac.wait_in_position.
+
+    reached (bool): all motors stopped (and in position) without errors;
+    faulted (bool): amplifier fault or fatal following error;
+    limit (bool): limit switch stop;
+    aborted (bool): the abort event was set or the timeout expired;
+    elapsed (float): waiting time in [s]."""
+
+
 class Ppmac(Ppmac_eth):
     # deltatau functions
     def __init__(self):
         super().__init__()
         self.lock_ppmac = _threading.RLock()
+        self.mux = _CommandMux(self)
+        self.monitor = None  # PpmacMonitor
+        self._local = _threading.local()
         self.flag_abort = False
+        # reply framing
+        self.terminators = ('\x06',)
+        self.cmd_timeout = 1  # [s]
+        self.poll_interval = 0.001  # [s]
+        self.latency = None  # last command round trip [s]
+        self.latencies = _collections.deque(maxlen=100)
         self.motor_vars = {0: 'AmpFault',
                            1: 'LimitStop',
                            2: 'PlusLimit',
@@ -187,6 +291,127 @@ class Ppmac(Ppmac_eth):
                            15: 'AmpEna',
                            }
 
+    def raw_write(self, *args, **kwargs):
+        """Sends a command without locking or multiplexing."""
+        return super().write(*args, **kwargs)
+
+    def _written(self):
+        # replies of the commands written by the current thread
+        try:
+            return self._local.written
+        except AttributeError:
+            self._local.written = _collections.deque(maxlen=64)
+            return self._local.written
+
+    @_traced('ppmac')
+    def write(self, msg, *args, **kwargs):
+        if self.mux.running:
+            self._written().append(self.mux.submit(msg))
+            return True
+        with self.lock_ppmac:
+            return super().write(msg, *args, **kwargs)
+
+    @_traced('ppmac')
+    def read(self, *args, **kwargs):
+        if self.mux.running:
+            return self.read_written()
+        with self.lock_ppmac:
+            return super().read(*args, **kwargs)
+
+    def read_written(self, timeout=None):
+        """Returns the replies of the commands written by the calling
+        thread since its last read (multiplexer mode).
+
+        Args:
+            timeout (float): maximum waiting time for each reply in [s];
+                             cmd_timeout is used if None.
+        Returns:
+            replies (str), without the ones that failed or timed out.
+        """
+        if timeout is None:
+            timeout = self.cmd_timeout
+        _written = self._written()
+        _replies = []
+        while len(_written) > 0:
+            try:
+                _replies.append(_written.popleft().result(timeout))
+            except Exception:
+                pass
+        return ''.join(_replies)
+
+    def flush_input(self):
+        """Discards any unread data from the controller channel."""
+        if self.mux.running:
+            # the multiplexer reads and routes every reply
+            return
+        while self.ppmac.recv_ready():
+            self.ppmac.recv(4096)
+
+    def read_reply(self, timeout=None):
+        """Reads the controller channel until a reply terminator arrives.
+
+        Args:
+            timeout (float): maximum waiting time in [s]; cmd_timeout is
+                             used if None.
+        Returns:
+            reply (str) including the terminator.
+        Raises:
+            TimeoutError if the reply is not complete within timeout.
+        """
+        if timeout is None:
+            timeout = self.cmd_timeout
+        _deadline = _time.monotonic() + timeout
+        _reply = ''
+        while True:
+            if self.ppmac.recv_ready():
+                _reply = _reply + self.ppmac.recv(4096).decode(
+                    'utf-8', errors='ignore')
+                if any(t in _reply for t in self.terminators):
+                    return _reply
+            elif _time.monotonic() > _deadline:
+                raise TimeoutError(
+                    'PPMAC reply not terminated after {0} s: {1!r}'.format(
+                        timeout, _reply))
+            else:
+                _time.sleep(self.poll_interval)
+
+    @_traced('ppmac')
+    def query(self, msg, timeout=None):
+        """Sends a command and returns as soon as its reply is complete.
+
+        While the multiplexer runs the command is pipelined with the ones
+        of other threads; otherwise the channel is locked until the reply
+        arrives. The round trip time is stored in latency and latencies.
+
+        Args:
+            msg (str): command;
+            timeout (float): reply timeout in [s]; cmd_timeout if None.
+        Returns:
+            reply (str) including the command echo and the terminator.
+        """
+        if timeout is None:
+            timeout = self.cmd_timeout
+        if self.mux.running:
+            # as flush_input, drops the unread replies of earlier writes
+            self._written().clear()
+            _t0 = _time.perf_counter()
+            _reply = self.mux.query(msg, timeout)
+        else:
+            with self.lock_ppmac:
+                self.flush_input()
+                _t0 = _time.perf_counter()
+                self.write(msg)
+                _reply = self.read_reply(timeout)
+        self.latency = _time.perf_counter() - _t0
+        self.latencies.append(self.latency)
+        return _reply
+
+    def mean_latency(self):
+        """Returns the mean round trip time of the last commands in [s]."""
+        if len(self.latencies) == 0:
+            return None
+        return sum(self.latencies)/len(self.latencies)
+
     def check_errors(self, motor_id):
 
         fault_error = [False, False, False, False]
@@ -220,13 +445,80 @@ class Ppmac(Ppmac_eth):
             # _traceback.print_exc(file=_sys.stdout)
             return None
 
+    def wait_in_position(self, motors, interval=0.05, timeout=None,
+                         require_inpos=False, start_delay=0.05,
+                         callback=None, abort=None):
+        """Waits until the listed motors stop.
+
+        DesVelZero, InPos and the fault bits of all motors are read in a
+        single query on each poll. While the monitor is running the motors
+        status is read from its snapshots instead, at the monitor rate.
+
+        Args:
+            motors (list): list of motor numbers (int);
+            interval (float): polling interval in [s];
+            timeout (float): maximum waiting time in [s], None waits until
+                             the motors stop, a fault occurs or abort is
+                             set;
+            require_inpos (bool): if True the motors must also report InPos;
+            start_delay (float): time in [s] given to the controller to
+                                 start the move before the first poll;
+            callback (function): called with the status dict (keys
+                                 (motor, param)) after each poll while the
+                                 motors are moving;
+            abort (threading.Event): stops waiting when set. flag_abort
+                                     is not checked, it may be left set
+                                     by an earlier stop.
+        Returns:
+            MotionResult namedtuple.
+        """
+        if (self.monitor is not None and self.monitor.running and
+                all(m in self.monitor.status_motors for m in motors)):
+            return self.monitor.wait_in_position(
+                motors, timeout=timeout, require_inpos=require_inpos,
+                start_delay=start_delay, callback=callback, abort=abort)
+
+        _params = [self.motor_vars[4], 'InPos', self.motor_vars[0],
+                   self.motor_vars[12], self.motor_vars[1]]
+        _t0 = _time.monotonic()
+        if start_delay:
+            _sleep(start_delay)
+        while True:
+            _ans = self.query_motor_params(motors, _params)
+            _status = {}
+            for _key, _value in _ans.items():
+                try:
+                    _status[_key] = int(round(float(_value)))
+                except (TypeError, ValueError):
+                    _status[_key] = None
+            _elapsed = _time.monotonic() - _t0
+
+            _faulted = any(_status[(m, p)] for m in motors
+                           for p in [self.motor_vars[0], self.motor_vars[12]])
+            _limit = any(_status[(m, self.motor_vars[1])] for m in motors)
+            _stopped = all(_status[(m, self.motor_vars[4])]
+                           for m in motors)
+            if require_inpos:
+                _stopped = _stopped and all(_status[(m, 'InPos')]
+                                            for m in motors)
+
+            if _faulted or _limit or _stopped:
+                return MotionResult(
+                    _stopped and not (_faulted or _limit),
+                    _faulted, _limit, False, _elapsed)
+            _aborted = abort is not None and abort.is_set()
+            if _aborted or (timeout is not None and _elapsed > timeout):
+                return MotionResult(False, _faulted, _limit, True, _elapsed)
+
+            if callback is not None:
+                callback(_status)
+            _sleep(interval)
+
     def in_motion(self):
 #         with self.lock_ppmac:
         try:
             msg = 'motionFlag'
-            self.write(msg)
-            _sleep(0.1)
-            ans = self.read().split(msg)[-1]
+            ans = self.query(msg).split(msg)[-1]
             return int(ans.split('=')[-1][0])
         except Exception:
             # _traceback.print_exc(file=_sys.stdout)
@@ -246,9 +538,7 @@ class Ppmac(Ppmac_eth):
             msg = '#'
             msg = msg + str(motors).strip('[]').replace(' ', '')
             msg = msg + 'p'
-            self.write(msg)
-            _sleep(0.1)
-            ans = self.read()
+            ans = self.query(msg)
             ans1 = ans.split(msg)[-1].strip('\r\n\x06').split(' ')
             pos = _np.array([float(val) for val in ans1])
             return pos
@@ -262,8 +552,7 @@ class Ppmac(Ppmac_eth):
             if all([axis is not None,
                     axis != '']):
                 msg = '&' + str(coord) + axis + 'p'
-                self.write(msg)
-                ans = self.read()
+                ans = self.query(msg)
                 ans1 = ans.split(msg)[-1].strip('\r\n\x06')
                 return float(ans1)
             else:
@@ -283,9 +572,8 @@ class Ppmac(Ppmac_eth):
             False otherwise.
         """
         try:
-            self.write("Motor{0}Homed".format(motor))
-            _ans = self.read()
-            if int(_ans.split('=')[-1].strip('\r\n\x06')):
+            _ans = self.query_motor_params([motor], ['Homed'])
+            if int(_ans[(motor, 'Homed')]):
                 return True
             else:
                 return False
@@ -302,14 +590,120 @@ class Ppmac(Ppmac_eth):
         Returns:
             variable value (str)"""
         try:
-            self.write("Motor[{0}].{1}".format(motor, param))
-            _sleep(0.1)
-            _ans = self.read()
+            _ans = self.query("Motor[{0}].{1}".format(motor, param))
             return _ans.split('=')[-1].strip('\r\n\x06')
         except Exception:
             # _traceback.print_exc(file=_sys.stdout)
             return None
 
+    @staticmethod
+    def motor_param_expression(motor, param):
+        """Returns the PPMAC expression of a motor parameter.
+
+        Args:
+            motor (int): motor number (Xa=1, Ya=2, Xb=3, Yb=4, Ra=5, Rb=6);
+            param (str): parameter name; 'Homed' refers to the
+                         Motor{n}Homed global variable.
+        Returns:
+            expression (str)."""
+        if param == 'Homed':
+            return 'Motor{0}Homed'.format(motor)
+        return 'Motor[{0}].{1}'.format(motor, param)
+
+    def query_motor_params(self, motors, params, max_cmd_len=1000,
+                           max_reads=10):
+        """Queries several motor parameters in a single command.
+
+        The expressions are joined with semicolons so that every
+        Motor[n].Param value is returned in one reply.
+
+        Args:
+            motors (list): list of motor numbers (int);
+            params (list): list of parameter names (str), see
+                           motor_param_expression;
+            max_cmd_len (int): maximum command length, longer queries are
+                               split into several commands;
+            max_reads (int): maximum number of terminated replies read
+                             waiting for every value of each command.
+        Returns:
+            dict with (motor, param) keys and variable values (str);
+            values missing from the reply are None."""
+        _keys = [(m, p) for m in motors for p in params]
+        _result = dict.fromkeys(_keys)
+        _cmds = []
+        _cmd_keys = []
+        for _key in _keys:
+            _expr = self.motor_param_expression(*_key)
+            if (_cmds and
+                    len(_cmds[-1]) + len(_expr) + 1 <= max_cmd_len):
+                _cmds[-1] = _cmds[-1] + ';' + _expr
+                _cmd_keys[-1].append(_key)
+            else:
+                _cmds.append(_expr)
+                _cmd_keys.append([_key])
+
+        for _cmd, _ckeys in zip(_cmds, _cmd_keys):
+            try:
+                _ans = self.query(_cmd)
+                for _ in range(max_reads):
+                    for _key in _ckeys:
+                        if _result[_key] is not None:
+                            continue
+                        _match = _re.search(
+                            _re.escape(self.motor_param_expression(*_key)) +
+                            r'\s*=\s*([^\r\n\x06]*)', _ans)
+                        if _match is not None:
+                            _result[_key] = _match.group(1).strip()
+                    if (all(_result[_key] is not None for _key in _ckeys)
+                            or self.mux.running):
+                        break
+                    _ans = _ans + self.read_reply()
+            except Exception:
+                # _traceback.print_exc(file=_sys.stdout)
+                pass
+        return _result
+
+    def motor_status(self, motors=[1, 2, 3, 4]):
+        """Reads the status flags of the listed motors in one round trip.
+
+        Args:
+            motors (list): list of motor numbers (int).
+        Returns:
+            dict with (motor, flag) keys and int values (None if the flag
+            could not be read). Flags: AmpEna, AmpFault, FeFatal,
+            LimitStop, PlusLimit, MinusLimit and Homed."""
+        _params = ['AmpEna', self.motor_vars[0], self.motor_vars[12],
+                   self.motor_vars[1], self.motor_vars[2],
+                   self.motor_vars[3], 'Homed']
+        _ans = self.query_motor_params(motors, _params)
+        _status = {}
+        for _key, _value in _ans.items():
+            try:
+                _status[_key] = int(float(_value))
+            except (TypeError, ValueError):
+                _status[_key] = None
+        return _status
+
+    def motor_errors(self, motors):
+        """Checks amplifier fault, limit switches and following error.
+
+        Args:
+            motors (list): list of motor numbers (int).
+        Returns:
+            True if any listed motor has an error;
+            False otherwise (flags that could not be read are ignored, as
+            in motor_fault, motor_limits and motor_fefatal)."""
+        _params = [self.motor_vars[0], self.motor_vars[1],
+                   self.motor_vars[12]]
+        _ans = self.query_motor_params(motors, _params)
+        _errors = []
+        for _value in _ans.values():
+            try:
+                _errors.append(int(_value))
+            except (TypeError, ValueError):
+                pass
+        return any(_errors)
+
     def set_motor_param(self, motor, param, value):
         """Sets and checks a motor parameter.
 
@@ -320,8 +714,7 @@ class Ppmac(Ppmac_eth):
         Returns:
             True if successfull, False otherwise"""
         try:
-            self.write("Motor[{0}].{1}={2}".format(motor, param, value))
-            _sleep(0.1)
+            self.query("Motor[{0}].{1}={2}".format(motor, param, value))
             # _ans = self.read()
             # _ans = _ans.split('=')[-1].strip('\r\n\x06')
             # if value - 1e-3 <= _ans <= value + 1e-3:
@@ -344,8 +737,9 @@ class Ppmac(Ppmac_eth):
             False otherwise.
         """
         try:
-            _ans = int(self.query_motor_param(motor, self.motor_vars[0]))
-            if _ans:
+            _param = self.motor_vars[0]
+            _ans = self.query_motor_params([motor], [_param])
+            if int(_ans[(motor, _param)]):
                 return True
             else:
                 return False
@@ -387,8 +781,9 @@ class Ppmac(Ppmac_eth):
             False otherwise.
         """
         try:
-            _ans = int(self.query_motor_param(motor, self.motor_vars[1]))
-            if _ans:
+            _param = self.motor_vars[1]
+            _ans = self.query_motor_params([motor], [_param])
+            if int(_ans[(motor, _param)]):
                 return True
             else:
                 return False
@@ -407,8 +802,9 @@ class Ppmac(Ppmac_eth):
             False otherwise.
         """
         try:
-            _ans = int(self.query_motor_param(motor, self.motor_vars[12]))
-            if _ans:
+            _param = self.motor_vars[12]
+            _ans = self.query_motor_params([motor], [_param])
+            if int(_ans[(motor, _param)]):
                 return True
             else:
                 return False
@@ -466,10 +862,11 @@ class Ppmac(Ppmac_eth):
             Returns:
                 True if successful, False otherwise.
                 """
+        # the waiting loops see the abort even if the kill fails
+        self.flag_abort = True
         try:
+            # the kill must not wait for (or depend on) the reply
             self.write('#1..6k')
-            self.read()
-            self.flag_abort = True
             return True
         except Exception:
             # _traceback.print_exc(file=_sys.stdout)
@@ -490,15 +887,11 @@ class Ppmac(Ppmac_eth):
 
             self.write('#5j=' + str(ccw*(dp + -1*target_pos_steps)) +
                        ';#6j=' + str(ccw*(-1*dp + target_pos_steps)))
-            _sleep(0.1)
-            while not self.motor_stopped(5):
-                _sleep(0.1)
+            self.wait_in_position([5], interval=0.1, start_delay=0.1)
             _sleep(1)
             self.write('#5j^' + str(-1*ccw*dp) +
                        ';#6j^' + str(ccw*dp))
-            _sleep(0.1)
-            while not self.motor_stopped(5):
-                _sleep(0.1)
+            self.wait_in_position([5], interval=0.1, start_delay=0.1)
             _sleep(1)
             p_list = self.read_motor_pos([5, 6, 7, 8])
 
@@ -511,15 +904,11 @@ class Ppmac(Ppmac_eth):
                 dp6 = dp6 + ccw*int((target_pos - p_list[-1])*102400/360000)
                 self.write('#5j=' + str(ccw*(dp + -1*target_pos_steps)) +
                            ';#6j=' + str(ccw*(-1*dp + target_pos_steps)))
-                _sleep(0.1)
-                while not self.motor_stopped(5):
-                    _sleep(0.1)
+                self.wait_in_position([5], interval=0.1, start_delay=0.1)
                 _sleep(1)
                 self.write('#5j^' + str(ccw*dp5) +
                            ';#6j^' + str(ccw*dp6))
-                _sleep(0.1)
-                while not self.motor_stopped(5):
-                    _sleep(0.1)
+                self.wait_in_position([5], interval=0.1, start_delay=0.1)
                 _sleep(1)
                 p_list = _np.floor(self.read_motor_pos([5, 6, 7, 8]))
                 n_tries = n_tries + 1
@@ -543,9 +932,7 @@ class Ppmac(Ppmac_eth):
             # volta 1000 passos antes do zero
             steps = _np.array([bck_stps, -1*bck_stps]) - 1*sf*p_list
             self.write('#5j^{0};#6j^{1}'.format(steps[0], steps[1]))
-            _sleep(0.1)
-            while not self.motor_stopped(5):
-                _sleep(0.1)
+            self.wait_in_position([5], interval=0.1, start_delay=0.1)
             _sleep(interval)
             p_list = self.read_motor_pos([7, 8])
             p_sign_init = _np.sign(p_list)
@@ -657,6 +1044,10 @@ class Ppmac(Ppmac_eth):
 
 
 ppmac = Ppmac()
+monitor = _PpmacMonitor(ppmac)
+ppmac.monitor = monitor
+gather = _GatherCapture(ppmac)
+compare = _PositionCompare(ppmac)
 fdi = Fdi()
 ps = SerialDRS()
 volt = Multimeter(log=True)
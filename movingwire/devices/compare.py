@@ -0,0 +1,71 @@
+"""PPMAC position compare trigger of the multimeter.
+
+The EQU output of a PowerBrick encoder channel toggles when the motor
+position crosses the CompA and CompB registers, as set up by the motion
+programs (prog1.pmc and prog2.pmc). Wired to the 3458A external trigger
+input, it starts the multimeter readings when the wire leaves the sweep
+start position, independently of the software and network timing.
+"""
+
+from movingwire.tracing import traced as _traced
+
+
+# motors whose channel EQU output is wired to the multimeter trigger
+MOTORS = [2, 3]
+ENCODER_MODULUS = 1048576  # compare registers hold the counts modulo 2^20
+FRACTION = 4096  # compare registers have 12 fractional bits
+
+
+class PositionCompare():
+    """Programs the position compare outputs of a Ppmac."""
+
+    def __init__(self, device, motors=MOTORS, offset=2, width=10):
+        """Create the trigger.
+
+        Args:
+            device (Ppmac): ppmac device;
+            motors (list): motors with a wired compare output, motor n
+                           uses PowerBrick[0].Chan[n - 1];
+            offset (int): distance from the sweep start position to the
+                          trigger edge [counts];
+            width (int): compare pulse width [counts].
+        """
+        self.device = device
+        self.motors = motors
+        self.offset = offset
+        self.width = width
+
+    def select(self, motors):
+        """Returns the first of the moving motors with a wired compare
+        output, None if there is none."""
+        for _motor in motors:
+            if _motor in self.motors:
+                return _motor
+        return None
+
+    def register(self, motor, position):
+        """Returns the compare register expression of a motor position
+        [counts]."""
+        return '((Motor[{0}].HomePos+{1})%{2})*{3}'.format(
+            motor, int(position), ENCODER_MODULUS, FRACTION)
+
+    @_traced('ppmac')
+    def arm(self, motor, start, end):
+        """Sets the compare pulse just after the sweep start position.
+
+        Args:
+            motor (int): moving motor with a wired compare output;
+            start (int): sweep start position [counts];
+            end (int): sweep end position [counts].
+        Returns:
+            True if the controller accepted the command.
+        """
+        _sign = 1 if end >= start else -1
+        _first = start + _sign*self.offset
+        _second = _first + _sign*self.width
+        _chan = 'PowerBrick[0].Chan[{0}].'.format(motor - 1)
+        _ans = self.device.query(';'.join([
+            _chan + 'CompA=' + self.register(motor, max(_first, _second)),
+            _chan + 'CompB=' + self.register(motor, min(_first, _second)),
+            _chan + 'EquWrite=$1']))
+        return 'error' not in _ans.lower()
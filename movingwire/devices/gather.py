@@ -0,0 +1,139 @@
+"""PPMAC Gather capture of the motor positions during the sweeps.
+
+The controller samples the gathered addresses every Gather.Period servo
+cycles into its own buffer, so the positions are captured at servo rate
+without any command per sample. After the sweep the buffer is written to a
+file by the gather utility (over ssh) and read back over sftp.
+"""
+
+import time as _time
+import numpy as _np
+
+from movingwire.tracing import traced as _traced
+from movingwire.data.gather import GatherData as _GatherData
+
+
+COUNTER = 'Sys.ServoCount'
+MOTORS = [1, 2, 3, 4, 5, 6, 7, 8]
+REMOTE_DIR = '/var/ftp/gather'
+COMMAND = 'gather -u {0}'  # writes the gather buffer to a text file
+
+
+def decode(text, nitems):
+    """Decodes the gather utility output.
+
+    Args:
+        text (str or bytes): whitespace separated values, one sample per
+                             line;
+        nitems (int): gathered items per sample.
+    Returns:
+        (samples, nitems) float array, a trailing partial sample is dropped.
+    """
+    if isinstance(text, bytes):
+        text = text.decode('ascii', errors='ignore')
+    _values = _np.array(text.split(), dtype=float)
+    _nsamples = len(_values)//nitems
+    return _values[:_nsamples*nitems].reshape(_nsamples, nitems)
+
+
+class GatherCapture():
+    """Gathers the servo counter and the motor positions of a Ppmac."""
+
+    def __init__(self, device, motors=MOTORS, remote_dir=REMOTE_DIR):
+        """Create the capture.
+
+        Args:
+            device (Ppmac): ppmac device, with its ssh client (device.ssh)
+                            and sftp session (device.ftp) open;
+            motors (list): motors whose ActPos is gathered;
+            remote_dir (str): controller directory of the gather files.
+        """
+        self.device = device
+        self.motors = motors
+        self.remote_dir = remote_dir
+        self.period = 1
+        self.servo_period = None  # [ms]
+        self.configured = False
+        self.armed = False
+
+    @property
+    def items(self):
+        """Gathered addresses, the servo counter first."""
+        return [COUNTER] + ['Motor[{0}].ActPos'.format(m)
+                            for m in self.motors]
+
+    def configure(self, motors=None, period=1, max_samples=None):
+        """Sets the gathered addresses in a single command.
+
+        Args:
+            motors (list): motors whose ActPos is gathered, the current
+                           ones if None;
+            period (int): servo cycles between samples;
+            max_samples (int): gather buffer size [samples], unchanged if
+                               None.
+        Returns:
+            True if the controller accepted the configuration.
+        """
+        if motors is not None:
+            self.motors = motors
+        self.period = int(period)
+        _cmds = ['Gather.Enable=0',
+                 'Gather.Items={0}'.format(len(self.items)),
+                 'Gather.Period={0}'.format(self.period)]
+        if max_samples is not None:
+            _cmds.append('Gather.MaxSamples={0}'.format(int(max_samples)))
+        _cmds += ['Gather.Addr[{0}]={1}.a'.format(i, item)
+                  for i, item in enumerate(self.items)]
+        _ans = self.device.query(';'.join(_cmds))
+        if 'error' in _ans.lower():
+            self.configured = False
+            return False
+        _ans = self.device.query('Sys.ServoPeriod')
+        self.servo_period = float(
+            _ans.split('=')[-1].split('\x06')[0].strip())
+        self.configured = True
+        return True
+
+    @_traced('ppmac')
+    def arm(self):
+        """Clears the gather buffer and starts gathering."""
+        self.device.query('Gather.Enable=2')
+        self.armed = True
+
+    @_traced('ppmac')
+    def stop(self):
+        """Stops gathering."""
+        self.device.query('Gather.Enable=0')
+        self.armed = False
+
+    def remote_path(self, name):
+        return '{0}/{1}.txt'.format(self.remote_dir, name)
+
+    @_traced('gather')
+    def fetch(self, name='sweep', timeout=10):
+        """Writes the gather buffer to a file and reads it.
+
+        Args:
+            name (str): file name, without directory and extension;
+            timeout (float): maximum gather utility time [s].
+        Returns:
+            GatherData namedtuple (see data.gather).
+        Raises:
+            TimeoutError if the gather utility does not finish in time.
+        """
+        _path = self.remote_path(name)
+        _stdin, _stdout, _stderr = self.device.ssh.exec_command(
+            COMMAND.format(_path), timeout=timeout)
+        _deadline = _time.monotonic() + timeout
+        while not _stdout.channel.exit_status_ready():
+            if _time.monotonic() > _deadline:
+                raise TimeoutError('PPMAC gather upload timed out.')
+            _time.sleep(0.01)
+        with self.device.ftp.open(_path, 'rb') as _f:
+            _samples = decode(_f.read(), len(self.items))
+        # the servo counter is a wrapping 32 bit integer
+        _cycles = (_samples[:, 0] - _samples[0, 0]) % 2**32 if len(
+            _samples) > 0 else _samples[:, 0]
+        return _GatherData(list(self.motors),
+                           _cycles*self.servo_period*1e-3,
+                           _samples[:, 1:])
@@ -0,0 +1,253 @@
+"""Background PPMAC position and status monitor.
+
+A single thread polls the motor positions and status flags and keeps the
+last values in a lock protected snapshot. GUI panels and motion waiters
+read the snapshot instead of querying the controller themselves. The
+polls take Ppmac.lock_ppmac, so they never interleave with other commands,
+unless the command multiplexer is running (see devices.mux).
+"""
+
+import sys as _sys
+import time as _time
+import threading as _threading
+import traceback as _traceback
+import collections as _collections
+import numpy as _np
+
+from movingwire.gui.utils import (
+    sleep as _sleep,
+    )
+
+
+STATUS_FLAGS = ['DesVelZero', 'InPos', 'AmpFault', 'FeFatal', 'LimitStop',
+                'PlusLimit', 'MinusLimit', 'AmpEna', 'Homed']
+
+
+class _NoLock():
+
+    def acquire(self, timeout=None):
+        return True
+
+    def release(self):
+        pass
+
+
+class Snapshot(_collections.namedtuple(
+        'Snapshot', ['time', 'count', 'positions', 'status'])):
+    """Controller state of one poll.
+
+    time (float): time.monotonic() when the poll started [s];
+    count (int): poll number;
+    positions (dict): motor: position [counts];
+    status (dict): (motor, flag): int value, None if it could not be read
+                   (flags in STATUS_FLAGS).
+    """
+
+    __slots__ = ()
+
+    def read_motor_pos(self, motors):
+        """Returns the positions of the listed motors (numpy array)."""
+        return _np.array([self.positions[m] for m in motors])
+
+    def flags(self, motors, flag):
+        """Returns the flag values of the listed motors."""
+        return [self.status.get((m, flag)) for m in motors]
+
+
+class PpmacMonitor():
+    """Polls a Ppmac device on a background thread."""
+
+    def __init__(self, device, motors=[1, 2, 3, 4, 5, 6, 7, 8],
+                 status_motors=[1, 2, 3, 4, 5, 6], interval=0.2):
+        """Create the monitor.
+
+        Args:
+            device (Ppmac): ppmac device;
+            motors (list): motors whose positions are read, in ascending
+                           order;
+            status_motors (list): motors whose status flags are read;
+            interval (float): polling interval [s].
+        """
+        self.device = device
+        self.motors = motors
+        self.status_motors = status_motors
+        self.interval = interval
+        self.errors = 0
+        self._snapshot = None
+        self._count = 0
+        self._lock = _threading.Lock()
+        self._stop = _threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """True while the polling thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def connected(self):
+        """Returns True if the device channel is open."""
+        _channel = getattr(self.device, 'ppmac', None)
+        return _channel is not None and not getattr(_channel, 'closed',
+                                                    False)
+
+    def start(self, interval=None):
+        """Starts polling (interval in [s] if given)."""
+        if interval is not None:
+            self.interval = interval
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = _threading.Thread(target=self._run, daemon=True,
+                                         name='PpmacMonitor')
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """Stops polling and clears the snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            self._snapshot = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                self.errors += 1
+                if self.errors == 1:
+                    _traceback.print_exc(file=_sys.stdout)
+            self._stop.wait(self.interval)
+
+    def poll(self):
+        """Reads positions and status flags into a new snapshot.
+
+        The poll is skipped if the channel is closed or another thread
+        holds the controller link for longer than the polling interval.
+
+        Returns:
+            the new Snapshot, None if the poll was skipped or failed.
+        """
+        if not self.connected():
+            return None
+        # the multiplexer serializes the commands itself
+        _lock = (_NoLock() if self.device.mux.running
+                 else self.device.lock_ppmac)
+        if not _lock.acquire(timeout=self.interval):
+            return None
+        try:
+            _t0 = _time.monotonic()
+            _pos = self.device.read_motor_pos(self.motors)
+            _ans = self.device.query_motor_params(self.status_motors,
+                                                  STATUS_FLAGS)
+        finally:
+            _lock.release()
+        if _pos is None or len(_pos) != len(self.motors):
+            return None
+        _status = {}
+        for _key, _value in _ans.items():
+            try:
+                _status[_key] = int(round(float(_value)))
+            except (TypeError, ValueError):
+                _status[_key] = None
+        with self._lock:
+            self._count += 1
+            self._snapshot = Snapshot(_t0, self._count,
+                                      dict(zip(self.motors, _pos)), _status)
+            return self._snapshot
+
+    def snapshot(self, max_age=None):
+        """Returns the last snapshot.
+
+        Args:
+            max_age (float): maximum snapshot age [s], any age if None.
+        Returns:
+            Snapshot, None if there is none or it is older than max_age.
+        """
+        with self._lock:
+            _snapshot = self._snapshot
+        if _snapshot is None:
+            return None
+        if (max_age is not None and
+                _time.monotonic() - _snapshot.time > max_age):
+            return None
+        return _snapshot
+
+    def read_motor_pos(self, motors, max_age=None):
+        """Returns the snapshot positions of the listed motors, None if
+        there is no recent snapshot or a motor is not monitored."""
+        _snapshot = self.snapshot(max_age)
+        if _snapshot is None or not all(m in _snapshot.positions
+                                        for m in motors):
+            return None
+        return _snapshot.read_motor_pos(motors)
+
+    def wait_snapshot(self, after, timeout=None):
+        """Waits for a snapshot taken after a time.
+
+        Args:
+            after (float): time.monotonic() value [s];
+            timeout (float): maximum waiting time [s], ten polling
+                             intervals if None.
+        Returns:
+            Snapshot, None if the monitor stopped or the timeout expired.
+        """
+        if timeout is None:
+            timeout = 10*self.interval
+        _deadline = _time.monotonic() + timeout
+        while self.running:
+            _snapshot = self.snapshot()
+            if _snapshot is not None and _snapshot.time >= after:
+                return _snapshot
+            if _time.monotonic() > _deadline:
+                return None
+            _sleep(min(self.interval, 0.05))
+        return None
+
+    def wait_in_position(self, motors, timeout=None, require_inpos=False,
+                         start_delay=0.05, callback=None, abort=None):
+        """Waits until the listed motors stop, reading the snapshots.
+
+        Same arguments and result as Ppmac.wait_in_position, which calls
+        this method while the monitor is running.
+
+        Returns:
+            MotionResult namedtuple.
+        Raises:
+            RuntimeError if no snapshot arrives within ten polling
+            intervals.
+        """
+        from movingwire.devices import MotionResult as _MotionResult
+        _t0 = _time.monotonic()
+        if start_delay:
+            _sleep(start_delay)
+        _after = _t0 + start_delay
+        while True:
+            _snapshot = self.wait_snapshot(_after)
+            if _snapshot is None:
+                raise RuntimeError('PPMAC monitor stopped updating.')
+            _after = _snapshot.time + 1e-9
+            _status = {(m, p): _snapshot.status.get((m, p))
+                       for m in motors for p in STATUS_FLAGS}
+            _elapsed = _time.monotonic() - _t0
+
+            _faulted = any(_status[(m, p)] for m in motors
+                           for p in ['AmpFault', 'FeFatal'])
+            _limit = any(_status[(m, 'LimitStop')] for m in motors)
+            _stopped = all(_status[(m, 'DesVelZero')] for m in motors)
+            if require_inpos:
+                _stopped = _stopped and all(_status[(m, 'InPos')]
+                                            for m in motors)
+
+            if _faulted or _limit or _stopped:
+                return _MotionResult(
+                    _stopped and not (_faulted or _limit),
+                    _faulted, _limit, False, _elapsed)
+            _aborted = abort is not None and abort.is_set()
+            if _aborted or (timeout is not None and _elapsed > timeout):
+                return _MotionResult(False, _faulted, _limit, True,
+                                     _elapsed)
+
+            if callback is not None:
+                callback(_status)
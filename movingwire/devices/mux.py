@@ -0,0 +1,213 @@
+"""Request/response multiplexer for the PPMAC command channel.
+
+Commands from any thread are written to the single controller channel as
+they come, without waiting for the previous replies, and a reader thread
+routes each ACK terminated reply to the future of its command. Replies
+arrive in command order; when the controller echoes the commands the echo
+is also checked, so a lost reply fails its own command instead of shifting
+every reply after it.
+
+Each command has a deadline: the reader fails the commands whose reply did
+not arrive in time and frees their slots, so a silent controller cannot
+block the writers once max_inflight commands are waiting.
+"""
+
+import sys as _sys
+import time as _time
+import threading as _threading
+import traceback as _traceback
+import collections as _collections
+import concurrent.futures as _futures
+
+
+_Request = _collections.namedtuple(
+    '_Request', ['command', 'future', 'sent', 'deadline'])
+
+
+class CommandMux():
+    """Pipelines the commands of a Ppmac device over its channel."""
+
+    def __init__(self, device, max_inflight=32, terminator='\x06'):
+        """Create the multiplexer.
+
+        Args:
+            device (Ppmac): ppmac device, whose channel is device.ppmac and
+                            whose raw_write sends a command;
+            max_inflight (int): maximum number of commands waiting for
+                                their replies;
+            terminator (str): reply terminator.
+        """
+        self.device = device
+        self.max_inflight = max_inflight
+        self.terminator = terminator
+        self.unmatched = 0  # replies without a waiting command
+        self.lost = 0  # commands whose reply never arrived
+        self.expired = 0  # commands failed at their deadline
+        self._pending = _collections.deque()
+        # commands of the expired requests, whose replies may come late
+        self._expired = _collections.deque(maxlen=max_inflight)
+        self._send_lock = _threading.Lock()
+        self._slots = _threading.BoundedSemaphore(max_inflight)
+        self._stop = _threading.Event()
+        self._thread = None
+        self._buffer = ''
+
+    @property
+    def running(self):
+        """True while the reader thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def inflight(self):
+        """Number of commands waiting for their replies."""
+        return len(self._pending)
+
+    def start(self):
+        """Discards unread input and starts routing replies."""
+        if self.running:
+            return
+        self.device.flush_input()
+        self._buffer = ''
+        self._stop.clear()
+        self._thread = _threading.Thread(target=self._run, daemon=True,
+                                         name='PpmacMux')
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """Stops the reader and fails the commands still waiting."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        with self._send_lock:
+            self._expired.clear()
+            while len(self._pending) > 0:
+                self._finish(self._pending.popleft(), error=RuntimeError(
+                    'PPMAC multiplexer stopped.'))
+
+    def submit(self, command, timeout=None):
+        """Sends a command and returns the future of its reply.
+
+        Args:
+            command (str): PPMAC command;
+            timeout (float): maximum waiting time for a free slot and for
+                             the reply [s], device.cmd_timeout if None.
+        Returns:
+            concurrent.futures.Future with the reply (str), including the
+            command echo and the terminator; it fails with TimeoutError if
+            no slot is freed or the reply does not arrive within timeout.
+        Raises:
+            RuntimeError if the multiplexer is not running.
+        """
+        if not self.running:
+            raise RuntimeError('PPMAC multiplexer is not running.')
+        if timeout is None:
+            timeout = self.device.cmd_timeout
+        _future = _futures.Future()
+        if not self._slots.acquire(timeout=timeout):
+            _future.set_exception(TimeoutError(
+                'PPMAC multiplexer busy after {0} s: {1!r}'.format(
+                    timeout, command)))
+            return _future
+        try:
+            with self._send_lock:
+                _sent = _time.monotonic()
+                self._pending.append(_Request(
+                    command.strip(), _future, _sent, _sent + timeout))
+                self.device.raw_write(command)
+        except Exception as e:
+            with self._send_lock:
+                for _request in list(self._pending):
+                    if _request.future is _future:
+                        self._pending.remove(_request)
+            self._slots.release()
+            _future.set_exception(e)
+        return _future
+
+    def query(self, command, timeout=None):
+        """Sends a command and waits for its reply.
+
+        Args:
+            command (str): PPMAC command;
+            timeout (float): maximum waiting time [s], device.cmd_timeout
+                             if None.
+        Returns:
+            reply (str).
+        Raises:
+            TimeoutError if the reply does not arrive within timeout.
+        """
+        if timeout is None:
+            timeout = self.device.cmd_timeout
+        _future = self.submit(command, timeout)
+        try:
+            # the reader fails the request at its deadline
+            return _future.result(2*timeout)
+        except _futures.TimeoutError:
+            raise TimeoutError(
+                'PPMAC reply not received after {0} s: {1!r}'.format(
+                    timeout, command))
+
+    def _finish(self, request, reply=None, error=None):
+        self._slots.release()
+        if request.future.done():
+            return
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(reply)
+
+    @staticmethod
+    def _echo(reply):
+        return reply.lstrip('\r\n').split('\r', 1)[0].split('\n', 1)[0]
+
+    def _expire(self):
+        _now = _time.monotonic()
+        with self._send_lock:
+            # replies arrive in order, the oldest requests expire first
+            while len(self._pending) > 0 and self._pending[0].deadline < _now:
+                _request = self._pending.popleft()
+                self.expired += 1
+                self._expired.append(_request.command)
+                self._finish(_request, error=TimeoutError(
+                    'PPMAC reply not received: {0!r}'.format(
+                        _request.command)))
+
+    def _route(self, reply):
+        _echo = self._echo(reply).strip()
+        with self._send_lock:
+            _commands = [r.command for r in self._pending]
+            if _echo not in _commands and _echo in self._expired:
+                # late reply of an expired command
+                self._expired.remove(_echo)
+                self.unmatched += 1
+                return
+            if len(self._pending) == 0:
+                self.unmatched += 1
+                return
+            if _echo in _commands:
+                # the replies of the commands sent before were lost
+                for _ in range(_commands.index(_echo)):
+                    self.lost += 1
+                    self._finish(self._pending.popleft(), error=RuntimeError(
+                        'PPMAC reply lost.'))
+            self._finish(self._pending.popleft(), reply=reply)
+
+    def _run(self):
+        _channel = self.device.ppmac
+        while not self._stop.is_set():
+            try:
+                self._expire()
+                if not _channel.recv_ready():
+                    _time.sleep(self.device.poll_interval)
+                    continue
+                self._buffer = self._buffer + _channel.recv(4096).decode(
+                    'utf-8', errors='ignore')
+                while self.terminator in self._buffer:
+                    _reply, self._buffer = self._buffer.split(
+                        self.terminator, 1)
+                    self._route(_reply + self.terminator)
+            except Exception:
+                if self._stop.is_set():
+                    break
+                _traceback.print_exc(file=_sys.stdout)
+                _time.sleep(0.1)
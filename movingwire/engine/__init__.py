@@ -0,0 +1,5 @@
+"""Sub-package for headless measurement runs."""
+
+from . import motion
+from . import planner
+from . import runs
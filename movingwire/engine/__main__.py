@@ -0,0 +1,212 @@
+"""Run stretched wire, flip coil and map measurements without the GUI.
+
+Example:
+    python -m movingwire.engine sw my_sw_cfg my_ppmac_cfg --ppmac-ip <ip>
+        --volt-address <gpib address> --repeat 10
+    python -m movingwire.engine map my_map_cfg my_ppmac_cfg --sw-cfg my_sw_cfg
+        --estimate
+"""
+
+import sys as _sys
+import time as _time
+import argparse as _argparse
+
+import movingwire.data as _data
+from movingwire.engine import runs as _runs
+from movingwire.engine import planner as _planner
+from movingwire.tracing import tracer as _tracer
+from movingwire.gui.utils import (
+    DATABASE_NAME as _DATABASE_NAME,
+    MONGO as _MONGO,
+    SERVER as _SERVER,
+    )
+from movingwire.devices import (
+    ppmac as _ppmac,
+    monitor as _monitor,
+    gather as _gather,
+    compare as _compare,
+    volt as _volt,
+    )
+
+
+def load_from_name(db, name, args):
+    """Reads the database entry called name into db and returns db."""
+    db.db_update_database(args.database, mongo=args.mongo,
+                          server=args.server)
+    _id = db.db_search_field('name', name)[0]['id']
+    db.db_read(_id)
+    return db
+
+
+def meas_from_cfg(cfg, mode, args):
+    """Returns a measurement data object set up from a MeasurementConfig."""
+    if mode == 'fc':
+        _meas = _data.measurement.MeasurementDataFC()
+        _meas.mode = 'FC_I1'
+    elif mode == 'sw2':
+        _meas = _data.measurement.MeasurementDataSW2()
+        _meas.mode = 'SW_I2'
+    else:
+        _meas = _data.measurement.MeasurementDataSW()
+        _meas.mode = 'SW_I1'
+    _meas.name = (args.name or cfg.name) + _time.strftime('_%y%m%d_%H%M')
+    _meas.comments = args.comments
+    _meas.Iamb_id = args.iamb_id
+    if mode == 'fc':
+        _meas.cfg_id = cfg.idn
+    for _attr in ['motion_axis', 'length', 'turns', 'nplc', 'duration',
+                  'nmeasurements', 'gain', 'range', 'acq_init_interval',
+                  'acq_final_interval']:
+        setattr(_meas, _attr, getattr(cfg, _attr))
+    return _meas
+
+
+def parse_args(argv=None):
+    """Parses the command line arguments."""
+    parser = _argparse.ArgumentParser(
+        prog='python -m movingwire.engine',
+        description='Headless moving wire measurements.')
+    parser.add_argument('mode', choices=['sw', 'sw2', 'fc', 'map'],
+                        help='measurement type.')
+    parser.add_argument('cfg', help='measurement (or map) configuration '
+                        'name.')
+    parser.add_argument('ppmac_cfg', help='ppmac configuration name.')
+    parser.add_argument('--sw-cfg', help='stretched wire measurement '
+                        'configuration name used by map runs.')
+    parser.add_argument('--order', choices=_planner.ORDERS, default='auto',
+                        help='map point order.')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of runs.')
+    parser.add_argument('--name', help='measurement name prefix.')
+    parser.add_argument('--comments', default='')
+    parser.add_argument('--iamb-id', type=int, default=0,
+                        help='ambient field measurement id.')
+    parser.add_argument('--fdi', action='store_true',
+                        help='flip coil acquisition with the FDI integrator.')
+    parser.add_argument('--ppmac-ip')
+    parser.add_argument('--volt-address', type=int,
+                        help='multimeter GPIB address.')
+    parser.add_argument('--volt-board', type=int, default=0,
+                        help='GPIB board index.')
+    parser.add_argument('--database', default=_DATABASE_NAME)
+    parser.add_argument('--mongo', action='store_true', default=_MONGO)
+    parser.add_argument('--server', default=_SERVER)
+    parser.add_argument('--monitor-interval', type=float, metavar='SECONDS',
+                        help='poll the ppmac status on a background thread '
+                        'and wait for the moves on its snapshots.')
+    parser.add_argument('--gather', action='store_true',
+                        help='gather the motor positions of each stretched '
+                        'wire sweep at servo rate and save them with the '
+                        'measurement.')
+    parser.add_argument('--trigger', action='store_true',
+                        help='start the stretched wire sweep readings with '
+                        'the ppmac position compare output (multimeter '
+                        'external trigger) instead of the initial '
+                        'interval.')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write the timing spans to FILE (Chrome trace '
+                        'JSON, or CSV if FILE ends with .csv).')
+    parser.add_argument('--estimate', action='store_true',
+                        help='print the estimated run time and exit, '
+                        'without connecting the instruments.')
+    args = parser.parse_args(argv)
+    if not args.estimate and (args.ppmac_ip is None or
+                              args.volt_address is None):
+        parser.error('--ppmac-ip and --volt-address are required.')
+    return args
+
+
+def connect(args):
+    """Connects the ppmac and the multimeter."""
+    _ppmac.connect(args.ppmac_ip)
+    _ppmac.ppmac.timeout = 3
+    _ppmac.mux.start()
+    _volt.connect(address=args.volt_address, board=args.volt_board)
+    if args.monitor_interval:
+        _monitor.start(args.monitor_interval)
+    if args.gather:
+        _ppmac.ftp = _ppmac.ssh.open_sftp()
+        if not _gather.configure():
+            raise RuntimeError('PPMAC gather configuration failed.')
+
+
+def progress(run, value, maximum):
+    print('{0}/{1} {2}'.format(value, maximum, run.finish_text()),
+          flush=True)
+
+
+def saved(meas):
+    print('Saved {0}.'.format(meas.name), flush=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace:
+        _tracer.enable()
+    _db = dict(database_name=args.database, mongo=args.mongo,
+               server=args.server, result=saved)
+
+    ppmac_cfg = load_from_name(_data.configuration.PpmacConfig(),
+                               args.ppmac_cfg, args)
+    if args.mode == 'map':
+        cfg = load_from_name(_data.configuration.IntegralMapsCfg(),
+                             args.cfg, args)
+        sw_cfg = load_from_name(_data.configuration.MeasurementConfig(),
+                                args.sw_cfg, args)
+    else:
+        cfg = load_from_name(_data.configuration.MeasurementConfig(),
+                             args.cfg, args)
+
+    def new_run():
+        if args.mode == 'map':
+            run = _runs.IntegralMapRun(cfg, ppmac_cfg, sw_cfg,
+                                       order=args.order, **_db)
+        elif args.mode == 'fc':
+            run = _runs.FlipCoilRun(meas_from_cfg(cfg, 'fc', args), cfg,
+                                    ppmac_cfg, fdi_mode=args.fdi, **_db)
+        else:
+            run = _runs.StretchedWireRun(meas_from_cfg(cfg, args.mode, args),
+                                         cfg, ppmac_cfg,
+                                         I2=args.mode == 'sw2', **_db)
+        if args.gather and args.mode != 'fc':
+            run.gather = _gather
+        if args.trigger and args.mode != 'fc':
+            run.compare = _compare
+        run.progress = lambda value, maximum: progress(run, value, maximum)
+        return run
+
+    if args.estimate:
+        _estimate = new_run().estimate()
+        print(_estimate.format())
+        if args.repeat > 1:
+            print('{0} runs: {1}'.format(args.repeat, _planner.format_duration(
+                args.repeat*_estimate.total)))
+        return 0
+
+    connect(args)
+    _status = 0
+    for i in range(args.repeat):
+        run = new_run()
+        run.start()
+        try:
+            run.wait()
+        except KeyboardInterrupt:
+            run.abort()
+            run.wait()
+        if not run.success:
+            print('Run {0} failed: {1}'.format(i + 1, run.error))
+            _status = 1
+            break
+    _monitor.stop()
+    _ppmac.mux.stop()
+    if args.gather:
+        _ppmac.ftp.close()
+    _ppmac.disconnect()
+    _volt.disconnect()
+    if args.trace:
+        _tracer.export(args.trace)
+    return _status
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
@@ -0,0 +1,291 @@
+"""Run time estimates of the measurement and map configurations.
+
+The estimate adds up the phases of the measurement loops: positioning and
+sweep moves, the fixed settling sleeps, the multimeter acquisition and the
+transfer of the readings. The command latencies, analysis and saving times
+are lumped in the 'other' phase. Each phase can be scaled by a factor
+learned from the timings of past runs (see data.timings), and a RunClock
+projects the finish time of a running measurement from the estimate and
+its progress.
+"""
+
+import time as _time
+import collections as _collections
+import numpy as _np
+
+from movingwire.engine.planner import (
+    MapPlanner as _MapPlanner,
+    format_duration as _format_duration,
+    )
+
+
+PHASES = ('move', 'settle', 'acquire', 'read', 'other')
+
+READ_RATE = 10000  # multimeter memory transfer rate [readings/s]
+SWEEP_OVERHEAD = 0.1  # multimeter and controller commands of a sweep [s]
+SAVE_TIME = 0.5  # analysis and saving of a map measurement [s]
+POSITION_SETTLE = 0.5  # sleep before the sweeps of a scan position [s]
+
+
+class Estimate(_collections.namedtuple('Estimate', ['phases', 'sweeps'])):
+    """Estimated run time.
+
+    phases (dict): phase: time [s], for the phases in PHASES;
+    sweeps (int): number of sweeps (or flip coil rotations).
+    """
+
+    __slots__ = ()
+
+    @property
+    def total(self):
+        """Estimated run time [s]."""
+        return sum(self.phases.values())
+
+    def calibrated(self, factors):
+        """Returns the estimate scaled by calibration factors.
+
+        Args:
+            factors (dict): phase: factor, with an optional 'total' factor
+                            used for the phases not listed (see
+                            data.timings.calibration).
+        """
+        _default = factors.get('total', 1.0)
+        return Estimate({p: t*factors.get(p, _default)
+                         for p, t in self.phases.items()}, self.sweeps)
+
+    def scaled(self, count):
+        """Returns the estimate of count runs."""
+        return Estimate({p: count*t for p, t in self.phases.items()},
+                        count*self.sweeps)
+
+    def describe(self):
+        """Returns the total time and the finish time of a run started
+        now as text."""
+        return '{0} (finish at {1})'.format(
+            _format_duration(self.total),
+            _time.strftime('%H:%M', _time.localtime(
+                _time.time() + self.total)))
+
+    def format(self):
+        """Returns the per phase breakdown as a text table."""
+        _total = self.total
+        _lines = ['{0:<12}{1:>10}{2:>8}'.format('phase', 'time', '%')]
+        for _phase, _seconds in self.phases.items():
+            _lines.append('{0:<12}{1:>10}{2:>8.1f}'.format(
+                _phase, _format_duration(_seconds),
+                100*_seconds/_total if _total > 0 else 0))
+        _lines.append('{0:<12}{1:>10}'.format(
+            'total', _format_duration(_total)))
+        return '\n'.join(_lines)
+
+
+def _add(phases, other, count=1):
+    for _phase, _seconds in other.items():
+        phases[_phase] += count*_seconds
+    return phases
+
+
+class RunEstimator():
+    """Estimates the run time of the stretched wire, flip coil and map
+    measurements."""
+
+    def __init__(self, ppmac_cfg, read_rate=READ_RATE,
+                 sweep_overhead=SWEEP_OVERHEAD, save_time=SAVE_TIME,
+                 move_overhead=0.05):
+        """Create the estimator.
+
+        Args:
+            ppmac_cfg (PpmacConfig): ppmac configuration (x_step, y_step,
+                                     speed, accel and jerk of each axis);
+            read_rate (float): multimeter transfer rate [readings/s];
+            sweep_overhead (float): command time of each sweep [s];
+            save_time (float): analysis and saving time of each map
+                               measurement [s];
+            move_overhead (float): command and settling time added to each
+                                   move [s].
+        """
+        self.cfg = ppmac_cfg
+        self.read_rate = read_rate
+        self.sweep_overhead = sweep_overhead
+        self.save_time = save_time
+        self.planner = _MapPlanner(ppmac_cfg, move_overhead=move_overhead)
+
+    @staticmethod
+    def empty():
+        """Returns a dict with zero time for each phase."""
+        return dict.fromkeys(PHASES, 0.0)
+
+    def npoints(self, duration, nplc):
+        """Returns the readings of a sweep."""
+        return int(_np.ceil(duration/(nplc/60)))
+
+    def sweep(self, axis, duration, acq_init_interval, nplc):
+        """Returns the phases of one sweep.
+
+        Args:
+            axis (str): motion axis ('X' or 'Y');
+            duration (float): sweep acquisition time [s];
+            acq_init_interval (float): time between the acquisition and the
+                                       motion start, zero for hardware
+                                       triggered sweeps [s];
+            nplc (float): multimeter integration time [power line cycles].
+        """
+        _move = self.planner.move_time(
+            axis, getattr(self.cfg, axis.lower() + '_step'))
+        _phases = self.empty()
+        _phases['settle'] = acq_init_interval
+        _phases['move'] = _move
+        # the readings left after the move
+        _phases['acquire'] = max(duration - acq_init_interval - _move, 0)
+        _phases['read'] = self.npoints(duration, nplc)/self.read_rate
+        _phases['other'] = self.sweep_overhead
+        return _phases
+
+    def scan(self, axis, positions, duration, acq_init_interval, nplc,
+             nmeasurements, I2=False):
+        """Estimates a stretched wire scan (StretchedWireRun).
+
+        Args:
+            axis (str): motion axis ('X' or 'Y');
+            positions (np.ndarray): transversal positions [mm];
+            duration (float): sweep acquisition time [s];
+            acq_init_interval (float): see sweep;
+            nplc (float): multimeter integration time [power line cycles];
+            nmeasurements (int): sweep pairs at each position;
+            I2 (bool): True for second integral scans, which center both
+                       motors before moving one of them to the sweep start.
+        Returns:
+            Estimate namedtuple.
+        """
+        _half = getattr(self.cfg, axis.lower() + '_step')/2
+        _overhead = self.planner.move_overhead
+        _phases = self.empty()
+        _phases['settle'] = POSITION_SETTLE*(len(positions) + 1)
+        for i in range(1, len(positions)):
+            # the first position is reached from an unknown position
+            _phases['move'] += self.planner.move_time(
+                axis, positions[i] - positions[i - 1]) + _overhead
+            if I2:
+                _phases['move'] += self.planner.move_time(axis, _half)
+        # back to the last position
+        _phases['move'] += self.planner.move_time(axis, _half)
+        _add(_phases, self.sweep(axis, duration, acq_init_interval, nplc),
+             2*nmeasurements*len(positions))
+        return Estimate(_phases, 2*nmeasurements*len(positions))
+
+    def flip_coil(self, nmeasurements, duration=3):
+        """Estimates a flip coil measurement (FlipCoilRun).
+
+        Args:
+            nmeasurements (int): forward and backward rotation pairs;
+            duration (float): acquisition time of a rotation [s].
+        """
+        _phases = self.empty()
+        # 1 s before each rotation, 5 s between the rotations of a pair
+        _phases['settle'] = 1.5 + 7*nmeasurements
+        _phases['acquire'] = 2*nmeasurements*duration
+        _phases['other'] = 2*nmeasurements*self.sweep_overhead
+        return Estimate(_phases, 2*nmeasurements)
+
+    def map(self, map_cfg, points, nmeasurements, nplc, x_duration,
+            y_duration, acq_init_interval, start=None):
+        """Estimates an integral map (IntegralMapRun).
+
+        Args:
+            map_cfg (IntegralMapsCfg): map configuration (components,
+                                       integrals and repetitions);
+            points (list): (x, y) map points in measurement order;
+            nmeasurements (int): sweep pairs per measurement;
+            nplc (float): multimeter integration time [power line cycles];
+            x_duration, y_duration (float): X and Y sweep acquisition
+                                            times [s];
+            acq_init_interval (float): see sweep;
+            start (dict): initial {'X': x, 'Y': y} positions [mm].
+        Returns:
+            Estimate namedtuple.
+        """
+        _planner = _MapPlanner(self.cfg, Ix=map_cfg.Ix, Iy=map_cfg.Iy,
+                               I1=map_cfg.I1, I2=map_cfg.I2,
+                               move_overhead=self.planner.move_overhead)
+        _overhead = self.planner.move_overhead
+        _phases = self.empty()
+        _phases['move'] = _planner.travel_time(points, start)
+        _sweeps = 0
+        for _on, _axis, _duration in [(map_cfg.Ix, 'Y', y_duration),
+                                      (map_cfg.Iy, 'X', x_duration)]:
+            if not _on:
+                continue
+            _half = getattr(self.cfg, _axis.lower() + '_step')/2
+            for _integral in ['I1', 'I2']:
+                if not getattr(map_cfg, _integral):
+                    continue
+                _count = len(points)*map_cfg.repetitions
+                # two moves to the sweep start before each measurement
+                _phases['move'] += 2*_count*_overhead
+                if _integral == 'I2':
+                    # both motors centered before each point
+                    _phases['move'] += len(points)*(
+                        2*_overhead + _planner.move_time(_axis, _half))
+                _phases['other'] += _count*self.save_time
+                _add(_phases, self.sweep(_axis, _duration,
+                                         acq_init_interval, nplc),
+                     2*nmeasurements*_count)
+                _sweeps += 2*nmeasurements*_count
+        return Estimate(_phases, _sweeps)
+
+
+class RunClock():
+    """Projects the finish time of a run.
+
+    Early in the run the remaining time follows the estimate; as the run
+    advances it shifts to the rate measured so far.
+    """
+
+    def __init__(self, estimate=None, start=None):
+        """Create the clock.
+
+        Args:
+            estimate (float): estimated run time [s], None projects from
+                              the progress only;
+            start (float): run start time (time.time()), now if None.
+        """
+        self.estimate = estimate
+        self.start = _time.time() if start is None else start
+
+    def elapsed(self):
+        """Returns the time since the run start [s]."""
+        return _time.time() - self.start
+
+    def remaining(self, fraction):
+        """Returns the projected remaining time [s], None if unknown.
+
+        Args:
+            fraction (float): completed fraction of the run.
+        """
+        _elapsed = self.elapsed()
+        if fraction <= 0:
+            if self.estimate is None:
+                return None
+            return max(self.estimate - _elapsed, 0)
+        fraction = min(fraction, 1)
+        _projected = _elapsed*(1 - fraction)/fraction
+        if self.estimate is None:
+            return _projected
+        _model = self.estimate*(1 - fraction)
+        return (1 - fraction)*_model + fraction*_projected
+
+    def finish_time(self, fraction):
+        """Returns the projected finish time (time.time() value), None if
+        unknown."""
+        _remaining = self.remaining(fraction)
+        return None if _remaining is None else _time.time() + _remaining
+
+    def format(self, fraction):
+        """Returns the projected finish time as text, '' if unknown."""
+        _remaining = self.remaining(fraction)
+        if _remaining is None:
+            return ''
+        return 'finish at {0} ({1} left)'.format(
+            _time.strftime('%H:%M:%S',
+                           _time.localtime(_time.time() + _remaining)),
+            _format_duration(_remaining))
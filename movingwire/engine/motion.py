@@ -0,0 +1,140 @@
+"""Stretched wire stage motion without GUI dependencies."""
+
+import numpy as _np
+
+from movingwire.devices import ppmac as _ppmac
+from movingwire.tracing import traced as _traced
+
+
+class MotionError(Exception):
+    """Raised when a stage move fails."""
+
+
+class Stage():
+    """X and Y stretched wire stages.
+
+    X motors: 2 (Xa) and 4 (Xb); Y motors: 1 (Ya) and 3 (Yb).
+    """
+
+    motors = {'X': [2, 4], 'Y': [1, 3]}
+    others = {'X': '#1,3,5,6k', 'Y': '#2,4,5,6k'}
+
+    def __init__(self, cfg, poll_interval=0.05, abort=None):
+        """Create the stage.
+
+        Args:
+            cfg (PpmacConfig): ppmac configuration (scale factors, offsets
+                               and limits);
+            poll_interval (float): motion completion polling interval [s];
+            abort (threading.Event): stops the motion waits when set.
+        """
+        self.cfg = cfg
+        self.poll_interval = poll_interval
+        self.abort = abort
+
+    def _axis(self, axis):
+        axis = axis.upper()[0]
+        if axis == 'X':
+            return (axis, self.cfg.x_sf, self.cfg.x_offset,
+                    [self.cfg.min_x, self.cfg.max_x])
+        return (axis, self.cfg.y_sf, self.cfg.y_offset,
+                [self.cfg.min_y, self.cfg.max_y])
+
+    def to_counts(self, axis, position, absolute=True):
+        """Converts a position in [mm] into motor counts.
+
+        Args:
+            axis (str): 'X' or 'Y';
+            position (float): position in [mm];
+            absolute (bool): True for absolute positions.
+        Returns:
+            position in motor counts (int).
+        Raises:
+            MotionError if an absolute position is out of the axis limits.
+        """
+        _axis, _sf, _offset, _lim = self._axis(axis)
+        if absolute:
+            position = position + _offset
+            if not _lim[0] + _offset <= position <= _lim[1] + _offset:
+                raise MotionError(
+                    '{0} position out of range.'.format(_axis))
+        return int(position/_sf)
+
+    def position(self, axis):
+        """Returns the mean position of the axis motors in [mm]."""
+        _axis, _sf, _offset, _ = self._axis(axis)
+        _pos = _ppmac.read_motor_pos(self.motors[_axis])
+        if _pos is None:
+            return None
+        return _np.mean(_pos)*_sf - _offset
+
+    def _motor_list(self, axis, motor):
+        if motor is None:
+            return self.motors[axis]
+        if motor not in self.motors[axis]:
+            raise MotionError(
+                'Motor {0} is not a {1} motor.'.format(motor, axis))
+        return [motor]
+
+    @_traced('move')
+    def move(self, axis, position, absolute=True, motor=None):
+        """Moves the axis motors and returns after they stop.
+
+        Args:
+            axis (str): 'X' or 'Y';
+            position (float): position in [mm];
+            absolute (bool): True for absolute positioning;
+            motor (int): moves only this motor if not None.
+        Returns:
+            MotionResult namedtuple.
+        """
+        _axis = self._axis(axis)[0]
+        _pos = self.to_counts(_axis, position, absolute)
+        _motors = self._motor_list(_axis, motor)
+        _list = str(_motors).strip('[]').replace(' ', '')
+        _mode = '=' if absolute else '^'
+        _ppmac.write(self.others[_axis])
+        _ppmac.write('#{0}j/'.format(_list))
+        _ppmac.query('#{0}j{1}{2}'.format(_list, _mode, _pos))
+        return _ppmac.wait_in_position(_motors, interval=self.poll_interval,
+                                       abort=self.abort)
+
+    def configure_move(self, axis, position, absolute=True, motor=None):
+        """Sets the jog target without moving (see trigger_move).
+
+        Args:
+            axis (str): 'X' or 'Y';
+            position (float): position in [mm];
+            absolute (bool): True for absolute positions;
+            motor (int): configures only this motor if not None.
+        """
+        _axis = self._axis(axis)[0]
+        _pos = self.to_counts(_axis, position, absolute)
+        for _motor in self._motor_list(_axis, motor):
+            _ppmac.set_motor_param(_motor, 'ProgJogPos', _pos)
+            _rb = _ppmac.query_motor_param(_motor, 'ProgJogPos')
+            if _rb is None or abs(int(float(_rb)) - _pos) > 0.1:
+                raise MotionError(
+                    'Tried to set {0} steps on motor {1} but {2} '
+                    'was set.'.format(_pos, _motor, _rb))
+
+    @_traced('move')
+    def trigger_move(self, axis, absolute=True, motor=None):
+        """Starts the move configured by configure_move and waits for it.
+
+        Args:
+            axis (str): 'X' or 'Y';
+            absolute (bool): True for absolute positions;
+            motor (int): moves only this motor if not None.
+        Returns:
+            MotionResult namedtuple.
+        """
+        _axis = self._axis(axis)[0]
+        _motors = self._motor_list(_axis, motor)
+        _list = str(_motors).strip('[]').replace(' ', '')
+        _mode = '=' if absolute else '^'
+        _ppmac.write(self.others[_axis])
+        _ppmac.write('#{0}j/'.format(_list))
+        _ppmac.query('#{0}j{1}*'.format(_list, _mode))
+        return _ppmac.wait_in_position(_motors, interval=self.poll_interval,
+                                       abort=self.abort)
@@ -0,0 +1,176 @@
+"""Integral map scan planning.
+
+At each map point the Ix components are measured sweeping the wire along Y
+with X fixed at the point, and the Iy components sweeping along X with Y
+fixed. The planner orders the points to reduce the positioning moves
+between them and estimates the run time from the PPMAC speed, acceleration
+and jerk configuration.
+"""
+
+# jerk limited moves, shared with the simulated controller
+from movingwire.kinematics import move_time
+
+
+ORDERS = ('raster', 'serpentine', 'columns', 'auto')
+
+# moves aligning the static axis: both motors, then each one, twice
+GO_TO_MOVES = 6
+
+
+def serpentine(outer, inner):
+    """Returns the (outer, inner) pairs with the inner direction reversed
+    on every other outer position."""
+    _pairs = []
+    for i, _o in enumerate(outer):
+        _inner = inner if i % 2 == 0 else inner[::-1]
+        _pairs += [(_o, _i) for _i in _inner]
+    return _pairs
+
+
+class MapPlanner():
+    """Orders the integral map points and estimates the run time."""
+
+    def __init__(self, ppmac_cfg, Ix=True, Iy=False, I1=True, I2=False,
+                 move_overhead=0.05, tolerance=1e-6):
+        """Create the planner.
+
+        Args:
+            ppmac_cfg (PpmacConfig): ppmac configuration (x_step, y_step,
+                                     speed, accel and jerk of each axis);
+            Ix, Iy (bool): measured components;
+            I1, I2 (bool): measured integrals;
+            move_overhead (float): command and settling time added to each
+                                   move [s];
+            tolerance (float): positions closer than tolerance [mm] are the
+                               same.
+        """
+        self.cfg = ppmac_cfg
+        self.Ix = Ix
+        self.Iy = Iy
+        self.I1 = I1
+        self.I2 = I2
+        self.move_overhead = move_overhead
+        self.tolerance = tolerance
+
+    def move_time(self, axis, distance, commands=1):
+        """Returns the axis move duration [s], zero if distance is within
+        tolerance.
+
+        Args:
+            axis (str): 'X' or 'Y';
+            distance (float): move distance [mm];
+            commands (int): moves issued to reach the position, each one
+                            adding move_overhead.
+        """
+        if abs(distance) <= self.tolerance:
+            return 0.0
+        _sf = axis.lower()
+        return commands*self.move_overhead + move_time(
+            distance, getattr(self.cfg, 'speed_' + _sf),
+            getattr(self.cfg, 'accel_' + _sf),
+            getattr(self.cfg, 'jerk_' + _sf))
+
+    def point_moves(self, x, y):
+        """Returns the positioning moves at a map point.
+
+        Args:
+            x, y (float): map point [mm].
+        Returns:
+            list of (axis, position, commands) in execution order; the
+            static axis is aligned by GO_TO_MOVES moves and each sweep pair
+            starts and ends at the sweep initial position.
+        """
+        _moves = []
+        if self.Ix:
+            _moves += [('X', x, GO_TO_MOVES),
+                       ('Y', y - self.cfg.y_step/2, 1)]
+        if self.Iy:
+            _moves += [('Y', y, GO_TO_MOVES),
+                       ('X', x - self.cfg.x_step/2, 1)]
+        return _moves
+
+    def travel_time(self, points, start=None):
+        """Returns the positioning time of a point sequence [s].
+
+        Args:
+            points (list): (x, y) map points in measurement order;
+            start (dict): initial {'X': x, 'Y': y} positions [mm], the
+                          first point moves are free if None.
+        """
+        _pos = dict(start) if start is not None else {}
+        _time = 0.0
+        for x, y in points:
+            for _axis, _target, _commands in self.point_moves(x, y):
+                if _axis in _pos:
+                    _time += self.move_time(
+                        _axis, _target - _pos[_axis], _commands)
+                _pos[_axis] = _target
+        return _time
+
+    def order(self, x_array, y_array, order='auto', start=None):
+        """Returns the map points in measurement order.
+
+        Args:
+            x_array, y_array (np.ndarray): map positions [mm];
+            order (str): 'raster' (rows, increasing x), 'serpentine'
+                         (rows, alternating x direction), 'columns'
+                         (columns, alternating y direction) or 'auto'
+                         (the one with the shortest travel time);
+            start (dict): initial {'X': x, 'Y': y} positions [mm].
+        Returns:
+            list of (x, y) points.
+        Raises:
+            ValueError for an unknown order.
+        """
+        x_array = list(x_array)
+        y_array = list(y_array)
+        _orders = {
+            'raster': [(x, y) for y in y_array for x in x_array],
+            'serpentine': [(x, y) for y, x in serpentine(y_array, x_array)],
+            'columns': serpentine(x_array, y_array),
+            }
+        if order == 'auto':
+            # the first candidate wins ties, keeping the familiar order
+            return min([_orders['serpentine'], _orders['columns']],
+                       key=lambda p: self.travel_time(p, start))
+        if order not in _orders:
+            raise ValueError('Unknown map order: {0}.'.format(order))
+        return _orders[order]
+
+    def sweep_time(self, axis, duration, acq_init_interval, nmeasurements):
+        """Returns the duration of nmeasurements sweep pairs [s]."""
+        _step = getattr(self.cfg, axis.lower() + '_step')
+        _sweep = max(duration,
+                     acq_init_interval + self.move_time(axis, _step))
+        # each pair also configures both moves before acquiring
+        return nmeasurements*2*(_sweep + self.move_overhead)
+
+    def estimate(self, points, repetitions, nmeasurements, x_duration,
+                 y_duration, acq_init_interval, start=None):
+        """Returns the estimated map run time [s].
+
+        Args:
+            points (list): (x, y) map points in measurement order;
+            repetitions (int): measurements of each component per point;
+            nmeasurements (int): sweep pairs per measurement;
+            x_duration, y_duration (float): X and Y sweep acquisition
+                                            times [s];
+            acq_init_interval (float): time between the acquisition and
+                                       the motion start [s];
+            start (dict): initial {'X': x, 'Y': y} positions [mm].
+        """
+        _integrals = int(bool(self.I1)) + int(bool(self.I2))
+        _point = 0.0
+        if self.Ix:
+            _point += _integrals*repetitions*self.sweep_time(
+                'Y', y_duration, acq_init_interval, nmeasurements)
+        if self.Iy:
+            _point += _integrals*repetitions*self.sweep_time(
+                'X', x_duration, acq_init_interval, nmeasurements)
+        return len(points)*_point + self.travel_time(points, start)
+
+
+def format_duration(seconds):
+    """Returns seconds as an 'h:mm:ss' string."""
+    _s = int(round(seconds))
+    return '{0}:{1:02d}:{2:02d}'.format(_s//3600, _s % 3600//60, _s % 60)
@@ -0,0 +1,1003 @@
+"""Measurement runs without GUI dependencies.
+
+A run holds the acquisition loop of one measurement type, takes its
+parameters from configuration and measurement data objects and runs on a
+worker thread. Progress, saved measurements and the end of the run are
+reported by callbacks, which are called from the worker threads.
+"""
+
+import sys as _sys
+import copy as _copy
+import time as _time
+import threading as _threading
+import traceback as _traceback
+import numpy as _np
+
+import movingwire.data as _data
+from movingwire.analysis import integrals as _integrals
+from movingwire.analysis import ambient as _ambient
+from movingwire.analysis import maps as _maps
+from movingwire.analysis.pipeline import AnalysisPipeline as _AnalysisPipeline
+from movingwire.engine.motion import Stage as _Stage
+from movingwire.engine.planner import (
+    MapPlanner as _MapPlanner,
+    move_time as _move_time,
+    )
+from movingwire.engine.estimator import (
+    RunEstimator as _RunEstimator,
+    RunClock as _RunClock,
+    )
+from movingwire.tracing import tracer as _tracer, traced as _traced
+from movingwire.devices import (
+    ppmac as _ppmac,
+    fdi as _fdi,
+    volt as _volt,
+    )
+
+
+class RunAborted(Exception):
+    """Raised inside a run when it is aborted."""
+
+
+def position_array(start, end, step):
+    """Returns the transversal positions of a scan.
+
+    Args:
+        start (float): start position [mm];
+        end (float): end position [mm];
+        step (float): step between positions [mm].
+    Returns:
+        numpy array with the positions [mm].
+    Raises:
+        ValueError if end < start.
+    """
+    if end < start:
+        raise ValueError('End position should be greater than start '
+                         'position.')
+    elif start == end:
+        return _np.array([start])
+    elif (end - start) < step:
+        return _np.array([start, end])
+    n_steps = int(1 + _np.ceil((end - start) / step))
+    return _np.linspace(start, end, n_steps)
+
+
+class Run():
+    """Base measurement run."""
+
+    def __init__(self, database_name, mongo=False, server=None,
+                 progress=None, result=None, finished=None):
+        """Create the run.
+
+        Args:
+            database_name (str): database file name;
+            mongo (bool): True to use mongodb;
+            server (str): mongodb server;
+            progress (function): called with (value, maximum) as the run
+                                 advances;
+            result (function): called with each measurement saved into the
+                               database;
+            finished (function): called with the run when it ends.
+        """
+        self.database_name = database_name
+        self.mongo = mongo
+        self.server = server
+        self.progress = progress
+        self.result = result
+        self.finished = finished
+        self.value = 0
+        self.maximum = 0
+        self.success = None
+        self.error = None
+        self.saved = []
+        self.volt_interval = 2
+        self.poll_interval = 0.05
+        self.pipeline = _AnalysisPipeline(self.analyse_and_save)
+        self._abort = _threading.Event()
+        self._thread = None
+        self.trace_start = None
+        self.sweeps = 0
+        self.predicted = None  # model estimate
+        self.estimated = None  # estimate calibrated by the past runs
+        self.clock = None
+
+    @property
+    def running(self):
+        """Returns True while the run thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts the run in a worker thread."""
+        if self.running:
+            return
+        self._abort.clear()
+        _ppmac.flag_abort = False
+        self.success = None
+        self.error = None
+        self.sweeps = 0
+        self.trace_start = _tracer.now()
+        try:
+            if self.estimate() is not None:
+                print('Estimated {0} time:'.format(type(self).__name__))
+                print(self.estimated.format())
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+        self.clock = _RunClock(self.estimated.total
+                               if self.estimated is not None else None)
+        self._thread = _threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.run()
+            self.success = True
+        except Exception as e:
+            if not isinstance(e, RunAborted):
+                _traceback.print_exc(file=_sys.stdout)
+            self.error = e
+            self.success = False
+        finally:
+            try:
+                self.publish(self.pipeline.join())
+            except Exception:
+                _traceback.print_exc(file=_sys.stdout)
+            if self.success:
+                try:
+                    self.record_timing()
+                except Exception:
+                    _traceback.print_exc(file=_sys.stdout)
+            if _tracer.enabled:
+                print('{0} time breakdown:'.format(type(self).__name__))
+                print(_tracer.format_summary(since=self.trace_start))
+            if self.finished is not None:
+                self.finished(self)
+
+    def run(self):
+        """Measurement loop, implemented by the subclasses."""
+        raise NotImplementedError
+
+    def estimate_time(self):
+        """Returns the model Estimate of the run time (see
+        engine.estimator), None if the run has no model. Implemented by the
+        subclasses."""
+        return None
+
+    def calibration(self):
+        """Returns the calibration factors of the past runs of this type
+        (see data.timings.calibration), empty on mongodb."""
+        if self.mongo:
+            return {}
+        return _data.timings.calibration(self.database_name,
+                                         type(self).__name__)
+
+    def estimate(self):
+        """Estimates the run time from the configuration and the past runs.
+
+        Returns:
+            calibrated Estimate, also kept in estimated (the model
+            estimate is kept in predicted), None if the run has no model.
+        """
+        self.predicted = self.estimate_time()
+        self.estimated = None
+        if self.predicted is not None:
+            self.estimated = self.predicted.calibrated(self.calibration())
+        return self.estimated
+
+    def fraction(self):
+        """Returns the completed fraction of the run."""
+        return self.value/self.maximum if self.maximum > 0 else 0
+
+    def finish_text(self):
+        """Returns the projected finish time as text, '' if unknown."""
+        if self.clock is None:
+            return ''
+        return self.clock.format(self.fraction())
+
+    def record_timing(self):
+        """Saves the run timing, which calibrates the next estimates."""
+        if self.mongo or self.predicted is None or self.clock is None:
+            return
+        _elapsed = self.clock.elapsed()
+        _measured = None
+        if _tracer.enabled:
+            _measured = _data.timings.measured_phases(
+                _tracer.summary(since=self.trace_start), _elapsed,
+                list(self.predicted.phases))
+        _data.timings.add(self.database_name, type(self).__name__,
+                          self.predicted, _elapsed, _measured)
+
+    def abort(self):
+        """Requests the run to stop and aborts any motor motion wait."""
+        self._abort.set()
+        _ppmac.flag_abort = True
+
+    def wait(self, timeout=None, wait=None):
+        """Waits for the run to finish.
+
+        Args:
+            timeout (float): maximum time to wait [s], None waits forever;
+            wait (function): called with a time interval in [s] while the
+                             run is active (e.g. a sleep that processes GUI
+                             events).
+        Returns:
+            True if the run succeeded, False if it failed and None if it is
+            still running.
+        """
+        _t0 = _time.time()
+        while self.running:
+            if timeout is not None and _time.time() - _t0 > timeout:
+                break
+            if wait is not None:
+                wait(0.05)
+            else:
+                self._thread.join(0.05)
+        return self.success
+
+    def check_abort(self):
+        """Raises RunAborted if an abort was requested."""
+        if self._abort.is_set() or _ppmac.flag_abort:
+            raise RunAborted('Measurement aborted.')
+
+    @_traced('settle')
+    def sleep(self, interval):
+        """Sleeps for interval [s], returning early if the run is aborted.
+
+        Raises:
+            RunAborted if an abort was requested.
+        """
+        self._abort.wait(max(interval, 0))
+        self.check_abort()
+
+    def report(self, value, maximum=None):
+        """Updates the run progress and calls the progress callback."""
+        self.value = value
+        if maximum is not None:
+            self.maximum = maximum
+        if self.progress is not None:
+            self.progress(self.value, self.maximum)
+
+    def submit(self, meas, I2=False):
+        """Queues a copy of meas for background analysis and saving."""
+        self.pipeline.submit((_copy.copy(meas), I2))
+        self.publish(self.pipeline.results())
+
+    def publish(self, results):
+        """Reports the measurements processed by the analysis pipeline.
+
+        Args:
+            results (list): list of (item, result, error) tuples from the
+                            analysis pipeline.
+        """
+        for _item, _result, _error in results:
+            if _error is not None:
+                print('Failed to analyse or save {0}.'.format(_item[0].name))
+                continue
+            self.saved.append(_result)
+            if self.result is not None:
+                self.result(_result)
+
+    def analyse(self, meas, I2=False):
+        """Calculates the field integrals of meas."""
+        _integrals.integral_calculus_sw(meas, I2)
+        if meas.Iamb_id > 0:
+            _ambient.ambient_field_correction(
+                meas, self.database_name,
+                mongo=self.mongo, server=self.server)
+        return meas
+
+    def save(self, meas):
+        """Saves meas into the database."""
+        meas.db_update_database(self.database_name,
+                                mongo=self.mongo, server=self.server)
+        meas.db_save()
+        return meas
+
+    def analyse_and_save(self, item):
+        """Analyses and saves a measurement. Runs in the pipeline thread.
+
+        Args:
+            item (tuple): (measurement, I2) tuple.
+        Returns:
+            the saved measurement.
+        """
+        _meas, I2 = item
+        return self.save(self.analyse(_meas, I2))
+
+
+class StretchedWireScan(Run):
+    """Base class of the stretched wire runs.
+
+    Measures forward and backward sweeps of the wire around a position,
+    retrying up to 3 times when a move fails. If gather is set to a
+    configured GatherCapture, the motor positions of each sweep are
+    gathered by the controller and stored in meas.gather_data.
+
+    If compare is set to a PositionCompare, the multimeter is armed with an
+    external trigger and started by the compare output when the wire
+    leaves the sweep start position; the sweeps then last the move time
+    plus trigger_settle and the final interval (see sweep_duration).
+    """
+
+    max_retries = 3
+    trigger_settle = 0.1  # acquisition time after the estimated move end [s]
+
+    def __init__(self, ppmac_cfg, **kwargs):
+        """Create the run.
+
+        Args:
+            ppmac_cfg (PpmacConfig): ppmac configuration;
+            kwargs: Run arguments.
+        """
+        super().__init__(**kwargs)
+        self.ppmac_cfg = ppmac_cfg
+        self.stage = _Stage(ppmac_cfg, poll_interval=self.poll_interval,
+                            abort=self._abort)
+        self.estimator = _RunEstimator(ppmac_cfg)
+        self.preconfigure_moves = False
+        self.gather = None  # GatherCapture of the sweep positions
+        self.compare = None  # PositionCompare triggering the multimeter
+        self.last_capture = None
+
+    def move(self, axis, position, motor=None):
+        """Moves the stage and returns True if the move succeeded."""
+        self.check_abort()
+        if self.preconfigure_moves:
+            self.stage.configure_move(axis, position, motor=motor)
+            _result = self.stage.trigger_move(axis, motor=motor)
+        else:
+            _result = self.stage.move(axis, position, motor=motor)
+        return self._move_ok(_result, motor)
+
+    @staticmethod
+    def _move_ok(result, motor):
+        # a single motor move is only checked for faults and aborts
+        if motor is None:
+            return result.reached
+        return not any([result.faulted, result.aborted])
+
+    def trigger_motor(self, axis, motor=None):
+        """Returns the motor whose compare output triggers the sweeps of
+        axis (or of motor).
+
+        Raises:
+            RuntimeError if no moving motor has a wired compare output.
+        """
+        _motors = _Stage.motors[axis] if motor is None else [motor]
+        _motor = self.compare.select(_motors)
+        if _motor is None:
+            raise RuntimeError('No position compare output on motors '
+                               '{0}.'.format(_motors))
+        return _motor
+
+    def sweep_duration(self, axis, duration, acq_final_interval):
+        """Returns the sweep acquisition time [s].
+
+        Args:
+            axis (str): motion axis ('X' or 'Y');
+            duration (float): configured acquisition time [s], used by the
+                              software triggered sweeps;
+            acq_final_interval (float): time after the motion excluded from
+                                        the integrals [s].
+        """
+        if self.compare is None:
+            return duration
+        _sf = axis.lower()
+        return _move_time(
+            getattr(self.ppmac_cfg, _sf + '_step'),
+            getattr(self.ppmac_cfg, 'speed_' + _sf),
+            getattr(self.ppmac_cfg, 'accel_' + _sf),
+            getattr(self.ppmac_cfg, 'jerk_' + _sf)) + (
+                self.trigger_settle + acq_final_interval)
+
+    def use_trigger(self, meas, axis, motor=None):
+        """Sets the acquisition time of meas for hardware triggered
+        sweeps, which start with the motion. Does nothing without compare.
+
+        Raises:
+            RuntimeError if no moving motor has a wired compare output.
+        """
+        if self.compare is None:
+            return
+        self.trigger_motor(axis, motor)
+        meas.duration = self.sweep_duration(axis, meas.duration,
+                                            meas.acq_final_interval)
+        meas.acq_init_interval = 0
+
+    def _sweep(self, axis, position, motor, npoints, duration,
+               acq_init_interval, start=None):
+        self.last_capture = None
+        if self.preconfigure_moves:
+            self.stage.configure_move(axis, position, motor=motor)
+        if self.compare is not None:
+            self.compare.arm(self.trigger_motor(axis, motor),
+                             self.stage.to_counts(axis, start),
+                             self.stage.to_counts(axis, position))
+        if self.gather is not None:
+            self.gather.arm()
+        _volt.start_measurement(external=self.compare is not None)
+        _t0 = _time.time()
+        if self.compare is None:
+            self.sleep(acq_init_interval)
+        if self.preconfigure_moves:
+            _result = self.stage.trigger_move(axis, motor=motor)
+        else:
+            _result = self.stage.move(axis, position, motor=motor)
+        if not self._move_ok(_result, motor):
+            if self.gather is not None:
+                self.gather.stop()
+            return None
+        _data = _volt.read_sweep(
+            npoints, timeout=duration + self.volt_interval -
+            (_time.time() - _t0))
+        if self.gather is not None:
+            self.last_capture = self.capture()
+        return _data
+
+    def capture(self):
+        """Stops gathering and returns the gathered positions, None if
+        they could not be read."""
+        try:
+            self.gather.stop()
+            return self.gather.fetch()
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            return None
+
+    def _recover(self, axis, init_pos, motor, npoints, duration):
+        self.move(axis, init_pos, motor)
+        self.sleep(1)
+        self.move(axis, init_pos, motor)
+        _volt.wait_data_count(npoints, timeout=duration + 9)
+        _volt.get_readings_from_memory(5)
+
+    def sweep_pair(self, axis, init_pos, end_pos, motor, npoints, duration,
+                   acq_init_interval):
+        """Measures a forward and a backward sweep.
+
+        Args:
+            axis (str): motion axis ('X' or 'Y');
+            init_pos (float): sweep initial position [mm];
+            end_pos (float): sweep final position [mm];
+            motor (int): moves only this motor if not None;
+            npoints (int): readings per sweep;
+            duration (float): sweep acquisition time [s];
+            acq_init_interval (float): time between the acquisition and the
+                                       motion start of the software
+                                       triggered sweeps [s].
+        Returns:
+            (forward, backward) voltage arrays; with gather set, the
+            (forward, backward) gathered positions are left in
+            last_capture.
+        Raises:
+            RuntimeError after max_retries consecutive moving errors.
+        """
+        for _ in range(self.max_retries):
+            self.check_abort()
+            _frw = self._sweep(axis, end_pos, motor, npoints, duration,
+                               acq_init_interval, start=init_pos)
+            if _frw is None:
+                self._recover(axis, init_pos, motor, npoints, duration)
+                continue
+            self.check_abort()
+            _capture = self.last_capture
+            _bck = self._sweep(axis, init_pos, motor, npoints, duration,
+                               acq_init_interval, start=end_pos)
+            if _bck is None:
+                self._recover(axis, init_pos, motor, npoints, duration)
+                continue
+            self.last_capture = (_capture, self.last_capture)
+            return _frw, _bck
+        _ppmac.flag_abort = True
+        raise RuntimeError('Measurement aborted after {0} consecutive '
+                           'moving errors.'.format(self.max_retries))
+
+    def measure(self, meas, axis, init_pos, end_pos, motor=None):
+        """Measures meas.nmeasurements sweep pairs and stores the data.
+
+        Args:
+            meas (MeasurementDataSW/2): measurement data;
+            axis (str): motion axis ('X' or 'Y');
+            init_pos (float): sweep initial position [mm];
+            end_pos (float): sweep final position [mm];
+            motor (int): moves only this motor if not None.
+        """
+        npoints = int(_np.ceil(meas.duration/(meas.nplc/60)))
+        _frw = _data.sweepbuffer.SweepBuffer(meas.nmeasurements, npoints)
+        _bck = _data.sweepbuffer.SweepBuffer(meas.nmeasurements, npoints)
+        _captures = []
+        for i in range(meas.nmeasurements):
+            _data_frw, _data_bck = self.sweep_pair(
+                axis, init_pos, end_pos, motor, npoints, meas.duration,
+                meas.acq_init_interval)
+            _frw.append(_data_frw)
+            _bck.append(_data_bck)
+            if self.gather is not None:
+                _captures.append(self.last_capture)
+            self.sweeps += 2
+            self.report_sweep(i + 1, meas.nmeasurements)
+        if _frw.is_ragged() or _bck.is_ragged():
+            print('Sweeps with different lengths truncated to the '
+                  'shortest one.')
+        meas.data_frw = _frw.array()
+        meas.data_bck = _bck.array()
+        meas.gather_data = _captures if self.gather is not None else None
+
+    def report_sweep(self, count, nmeasurements):
+        """Reports the sweep pairs measured at the current position."""
+        self.report(count, nmeasurements)
+
+    @staticmethod
+    def stamp(meas):
+        """Updates the measurement name, date and hour."""
+        name = meas.name.split('_')[:-2]
+        meas.name = '_'.join(name) + _time.strftime('_%y%m%d_%H%M')
+        meas.date = _time.strftime('%Y-%m-%d')
+        meas.hour = _time.strftime('%H:%M:%S')
+
+
+class StretchedWireRun(StretchedWireScan):
+    """Stretched wire first or second field integral scan."""
+
+    def __init__(self, meas, cfg, ppmac_cfg, I2=False, **kwargs):
+        """Create the run.
+
+        Args:
+            meas (MeasurementDataSW/2): measurement data, with the
+                                        acquisition parameters set;
+            cfg (MeasurementConfig): measurement configuration (start_pos,
+                                     end_pos and step of the scan);
+            ppmac_cfg (PpmacConfig): ppmac configuration;
+            I2 (bool): True for the second field integral;
+            kwargs: Run arguments.
+        """
+        super().__init__(ppmac_cfg, **kwargs)
+        self.meas = meas
+        self.cfg = cfg
+        self.I2 = I2
+
+    def estimate_time(self):
+        _meas = self.meas
+        axis = 'X' if 'X' in _meas.motion_axis else 'Y'
+        return self.estimator.scan(
+            axis, position_array(self.cfg.start_pos, self.cfg.end_pos,
+                                 self.cfg.step),
+            self.sweep_duration(axis, _meas.duration,
+                                _meas.acq_final_interval),
+            _meas.acq_init_interval if self.compare is None else 0,
+            _meas.nplc, _meas.nmeasurements, self.I2)
+
+    def fraction(self):
+        # the progress is reported for each position
+        if self.predicted is None or self.predicted.sweeps == 0:
+            return super().fraction()
+        return self.sweeps/self.predicted.sweeps
+
+    def run(self):
+        _meas = self.meas
+        _meas.transversal_pos = position_array(
+            self.cfg.start_pos, self.cfg.end_pos, self.cfg.step)
+
+        if 'X' in _meas.motion_axis:
+            axis, other = 'X', 'Y'
+            _meas.speed = self.ppmac_cfg.speed_x  # [mm/s]
+            _meas.accel = self.ppmac_cfg.accel_x  # [mm/s^2]
+            _meas.jerk = self.ppmac_cfg.jerk_x  # [mm/s^3]
+            motion_step = self.ppmac_cfg.x_step
+        else:
+            axis, other = 'Y', 'X'
+            _meas.speed = self.ppmac_cfg.speed_y  # [mm/s]
+            _meas.accel = self.ppmac_cfg.accel_y  # [mm/s^2]
+            _meas.jerk = self.ppmac_cfg.jerk_y  # [mm/s^3]
+            motion_step = self.ppmac_cfg.y_step
+        _motors = _Stage.motors[axis]
+        moving_motor = _motors[0] if 'a' in _meas.motion_axis else _motors[1]
+        setattr(_meas, other.lower() + '_pos', self.stage.position(other))
+        _ppmac.enable_motors(_motors)
+
+        self.use_trigger(_meas, axis, moving_motor if self.I2 else None)
+        self.report(0, _meas.nmeasurements)
+        _volt.configure_volt(nplc=_meas.nplc, time=_meas.duration,
+                             mrange=_meas.range)
+        self.sleep(0.5)
+
+        for position in _meas.transversal_pos:
+            self.stamp(_meas)
+            _init_pos = position - motion_step/2  # [mm]
+            _end_pos = position + motion_step/2  # [mm]
+            _meas.start_pos = _init_pos
+            _meas.end_pos = _end_pos
+            _meas.step = motion_step
+            setattr(_meas, axis.lower() + '_pos', position)
+
+            # go to init pos
+            if not self.I2:
+                _motor = None
+                self.move(axis, _init_pos)
+                self.sleep(0.5)
+                self.move(axis, _init_pos)
+            else:
+                _motor = moving_motor
+                self.move(axis, position)
+                self.sleep(0.5)
+                self.move(axis, _init_pos, _motor)
+
+            self.measure(_meas, axis, _init_pos, _end_pos, _motor)
+
+            # data analisys and saving overlap with the next position
+            self.submit(_meas, self.I2)
+
+        self.move(axis, position)
+
+
+class FlipCoilRun(Run):
+    """Flip coil first field integral measurement."""
+
+    def __init__(self, meas, cfg, ppmac_cfg, fdi_mode=False,
+                 rm_backlash=True, **kwargs):
+        """Create the run.
+
+        Args:
+            meas (MeasurementDataFC): measurement data;
+            cfg (MeasurementConfig): flip coil measurement configuration;
+            ppmac_cfg (PpmacConfig): ppmac configuration;
+            fdi_mode (bool): True to acquire with the FDI integrator, False
+                             to acquire with the multimeter;
+            rm_backlash (bool): True to remove the backlash before each
+                                measurement if the coil is out of position;
+            kwargs: Run arguments.
+        """
+        super().__init__(**kwargs)
+        self.meas = meas
+        self.cfg = cfg
+        self.ppmac_cfg = ppmac_cfg
+        self.fdi_mode = fdi_mode
+        self.rm_backlash = rm_backlash
+
+    def estimate_time(self):
+        return _RunEstimator(self.ppmac_cfg).flip_coil(
+            self.cfg.nmeasurements)
+
+    def acquire(self, steps, counts):
+        """Rotates the coil by steps and returns the acquired data.
+
+        Args:
+            steps (list): motor 5 and 6 relative moves;
+            counts (int): expected number of readings.
+        Returns:
+            (data, initial positions, final positions) tuple.
+        """
+        if self.fdi_mode:
+            _fdi.start_measurement()
+        else:
+            _volt.start_measurement()
+        self.sleep(1)
+
+        _pos0 = _ppmac.read_motor_pos([7, 8])
+        _ppmac.write('#5j^' + str(steps[0]) + ';#6j^' + str(steps[1]))
+        if self.fdi_mode:
+            while _fdi.get_data_count() < counts - 1:
+                self.sleep(0.1)
+            _data_fc = _fdi.get_data()
+        else:
+            _volt.wait_data_count(counts, timeout=3 + self.volt_interval)
+            _data_fc = _volt.get_readings_from_memory(5)
+        return _data_fc, _pos0, _ppmac.read_motor_pos([7, 8])
+
+    def run(self):
+        _meas = self.meas
+        _cfg = self.cfg
+        _steps = self.ppmac_cfg.steps_per_turn
+        speed = _cfg.speed * _steps * 10**-3  # [turns/s]
+        ta = -1/_cfg.accel * 1/_steps * 10**6 if _cfg.accel != 0 else 0
+        ts = -1/_cfg.jerk * 1/_steps * 10**9 if _cfg.jerk != 0 else 0
+        start_pos = int(_cfg.start_pos*10**3)
+
+        StretchedWireScan.stamp(_meas)
+        self.report(0, _cfg.nmeasurements + 1)
+
+        _meas.pos7f = _np.zeros((2, _cfg.nmeasurements))
+        _meas.pos7b = _np.zeros((2, _cfg.nmeasurements))
+        _meas.pos8f = _np.zeros((2, _cfg.nmeasurements))
+        _meas.pos8b = _np.zeros((2, _cfg.nmeasurements))
+
+        _ppmac.write('#1..4k')
+        self.sleep(1)
+        _meas.x_pos = _ppmac.read_motor_pos([1, 3]) * self.ppmac_cfg.x_sf
+        _meas.y_pos = _ppmac.read_motor_pos([2, 4]) * self.ppmac_cfg.y_sf
+
+        for _motor in [5, 6]:
+            _ppmac.write('Motor[{0}].JogSpeed={1};'
+                         'Motor[{0}].JogTa={2};'
+                         'Motor[{0}].JogTs={3}'.format(_motor, speed, ta, ts))
+
+        if self.fdi_mode:
+            counts = _fdi.configure_integrator(time=_cfg.duration,
+                                               interval=50)
+            _fdi.send('INP:COUP DC')
+        else:
+            counts = int(_np.ceil(3/(_cfg.nplc/60)))
+            _volt.configure_volt(nplc=_cfg.nplc, time=_cfg.duration)
+        data_frw = _data.sweepbuffer.SweepBuffer(_cfg.nmeasurements, counts)
+        data_bck = _data.sweepbuffer.SweepBuffer(_cfg.nmeasurements, counts)
+        self.sleep(0.5)
+
+        for i in range(_cfg.nmeasurements):
+            self.check_abort()
+            if self.rm_backlash:
+                _pos = _ppmac.read_motor_pos([7, 8])
+                if any(abs(_p) % 360000 > _cfg.max_init_error
+                       for _p in _pos):
+                    _ppmac.remove_backlash(start_pos)
+
+            _data_frw, _pos0, _pos1 = self.acquire(_cfg.steps_f, counts)
+            data_frw.append(_data_frw)
+            _meas.pos7f[0, i], _meas.pos8f[0, i] = _pos0
+            _meas.pos7f[1, i], _meas.pos8f[1, i] = _pos1
+
+            self.sleep(5)
+
+            _data_bck, _pos0, _pos1 = self.acquire(_cfg.steps_b, counts)
+            if self.fdi_mode:
+                _fdi.send('INP:COUP GND')
+            data_bck.append(_data_bck)
+            _meas.pos7b[0, i], _meas.pos8b[0, i] = _pos0
+            _meas.pos7b[1, i], _meas.pos8b[1, i] = _pos1
+
+            self.report(i + 1)
+
+        _meas.data_frw = data_frw.array()
+        _meas.data_bck = data_bck.array()
+
+        self.submit(_meas)
+        self.report(_cfg.nmeasurements + 1)
+
+    def analyse(self, meas, I2=False):
+        """Calculates the flip coil field integral of meas.
+
+        A failed ambient field correction is reported and the measurement
+        is saved uncorrected.
+        """
+        _integrals.integral_calculus_fc(self.cfg, meas, self.fdi_mode)
+        if meas.Iamb_id > 0:
+            try:
+                _ambient.ambient_field_correction(
+                    meas, self.database_name,
+                    mongo=self.mongo, server=self.server)
+            except Exception:
+                _traceback.print_exc(file=_sys.stdout)
+        return meas
+
+
+class IntegralMapRun(StretchedWireScan):
+    """Stretched wire field integrals map.
+
+    Measures the selected integrals (I1/I2) and components (Ix/Iy) at each
+    (x, y) position, repeating measurements whose standard deviation is out
+    of the limits, and saves the IntegralMaps entry at the end.
+    """
+
+    # std limits: I1x=20 G.cm; I1y=10 G.cm; I2x= 5 kG.cm2; I2y=2.5 kG.cm2
+    std_limits = {'I1x': 20e-6, 'I1y': 10e-6, 'I2x': 5e-5, 'I2y': 2.5e-5}
+    # I2 moves only the motor at the entrance of each axis
+    i2_motors = {'Y': 3, 'X': 4}
+
+    def __init__(self, map_cfg, ppmac_cfg, sw_cfg, order='auto', **kwargs):
+        """Create the run.
+
+        Args:
+            map_cfg (IntegralMapsCfg): integral maps configuration;
+            ppmac_cfg (PpmacConfig): ppmac configuration;
+            sw_cfg (MeasurementConfig): stretched wire acquisition
+                                        configuration (gain, turns, length,
+                                        nplc, nmeasurements, range and
+                                        acquisition intervals);
+            order (str): map point order (see MapPlanner.order);
+            kwargs: Run arguments.
+        """
+        super().__init__(ppmac_cfg, **kwargs)
+        self.map_cfg = map_cfg
+        self.sw_cfg = sw_cfg
+        self.order = order
+        self.preconfigure_moves = True
+        self.map_data = None
+        self._count = 0
+        self._total = 0
+        self._aligned = {}
+
+    def _new_meas(self, name, axis):
+        """Returns a measurement data object for the name component."""
+        _cfg = self.map_cfg
+        _sw = self.sw_cfg
+        if name.startswith('I1'):
+            _meas = _data.measurement.MeasurementDataSW()
+            _meas.mode = 'SW_I1'
+        else:
+            _meas = _data.measurement.MeasurementDataSW2()
+            _meas.mode = 'SW_I2'
+        _meas.db_update_database(self.database_name,
+                                 mongo=self.mongo, server=self.server)
+        _prefix = '_'.join(_cfg.name.split('_')[:-2])
+        _meas.name = _prefix + '_' + name + _time.strftime('_%y%m%d_%H%M')
+        _meas.comments = _cfg.comments
+        _meas.motion_axis = axis
+        _sf = axis.lower()
+        _meas.step = getattr(self.ppmac_cfg, _sf + '_step')
+        _meas.duration = getattr(_cfg, _sf + '_duration')
+        _meas.speed = getattr(self.ppmac_cfg, 'speed_' + _sf)  # [mm/s]
+        _meas.accel = getattr(self.ppmac_cfg, 'accel_' + _sf)  # [mm/s^2]
+        _meas.jerk = getattr(self.ppmac_cfg, 'jerk_' + _sf)  # [mm/s^3]
+        _meas.Iamb_id = getattr(_cfg, name + '_amb_id')
+        _meas.gain = _sw.gain
+        _meas.turns = _sw.turns
+        _meas.length = _sw.length
+        _meas.nplc = _sw.nplc
+        _meas.nmeasurements = _sw.nmeasurements
+        _meas.range = _sw.range
+        _meas.acq_init_interval = _sw.acq_init_interval
+        _meas.acq_final_interval = _sw.acq_final_interval
+        return _meas
+
+    def _update_map_variables(self, map_data):
+        _cfg = self.map_cfg
+        name = _cfg.name.split('_')[:-2]
+        map_data.name = '_'.join(name) + _time.strftime('_%y%m%d_%H%M')
+        map_data.date = _time.strftime('%Y-%m-%d')
+        map_data.hour = _time.strftime('%H:%M:%S')
+        for _attr in ['comments', 'Ix', 'Iy', 'I1', 'I2',
+                      'I1x_amb_id', 'I1y_amb_id', 'I2y_amb_id',
+                      'x_start_pos', 'x_end_pos', 'x_step', 'x_duration',
+                      'y_start_pos', 'y_end_pos', 'y_step', 'y_duration',
+                      'repetitions']:
+            setattr(map_data, _attr, getattr(_cfg, _attr))
+        map_data.I2x_amb_id = _cfg.I1x_amb_id
+
+    def _last_id(self, meas_class):
+        _meas = meas_class()
+        _meas.db_update_database(self.database_name,
+                                 mongo=self.mongo, server=self.server)
+        return _meas.db_get_last_id()
+
+    def _go_to(self, axis, position):
+        """Moves and aligns both motors of axis at position, unless they
+        were aligned there and have not moved since."""
+        if self._aligned.get(axis) == position:
+            return
+        for _ in range(2):
+            self.stage.move(axis, position)
+            for _motor in _Stage.motors[axis]:
+                self.stage.move(axis, position, motor=_motor)
+        self._aligned[axis] = position
+
+    def points(self):
+        """Returns the map points in measurement order."""
+        _cfg = self.map_cfg
+        _planner = _MapPlanner(self.ppmac_cfg, Ix=_cfg.Ix, Iy=_cfg.Iy,
+                               I1=_cfg.I1, I2=_cfg.I2)
+        return _planner.order(
+            position_array(_cfg.x_start_pos, _cfg.x_end_pos, _cfg.x_step),
+            position_array(_cfg.y_start_pos, _cfg.y_end_pos, _cfg.y_step),
+            self.order)
+
+    def estimate_time(self):
+        _cfg = self.map_cfg
+        _sw = self.sw_cfg
+        return self.estimator.map(
+            _cfg, self.points(), _sw.nmeasurements, _sw.nplc,
+            self.sweep_duration('X', _cfg.x_duration,
+                                _sw.acq_final_interval),
+            self.sweep_duration('Y', _cfg.y_duration,
+                                _sw.acq_final_interval),
+            _sw.acq_init_interval if self.compare is None else 0)
+
+    def report_sweep(self, count, nmeasurements):
+        self.report(self._count*nmeasurements + count,
+                    self._total*nmeasurements)
+
+    def measure_component(self, meas, name, axis, position, motor=None):
+        """Measures one map component at position with repetitions.
+
+        Args:
+            meas (MeasurementDataSW/2): component measurement data;
+            name (str): component name (I1x, I1y, I2x or I2y);
+            axis (str): motion axis ('X' or 'Y');
+            position (float): center position on the motion axis [mm];
+            motor (int): moving motor for I2 measurements.
+        """
+        I2 = name.startswith('I2')
+        _init_pos = position - meas.step/2
+        _end_pos = position + meas.step/2
+        meas.start_pos = _init_pos
+        meas.end_pos = _end_pos
+        for _ in range(self.map_cfg.repetitions):
+            for _attempt in range(2):
+                self.check_abort()
+                self.stamp(meas)
+                self.move(axis, _init_pos, motor)
+                self.move(axis, _init_pos, motor)
+                self.measure(meas, axis, _init_pos, _end_pos, motor)
+                # the std check needs the integrals before the next sweep
+                _saved = self.save(self.analyse(meas, I2))
+                self.publish([((meas, I2), _copy.copy(_saved), None)])
+                _std = meas.I2_std if I2 else meas.I1_std
+                if _std <= self.std_limits[name]:
+                    break
+                print('{0} std_error'.format(name))
+            self._count += 1
+
+    def run(self):
+        _cfg = self.map_cfg
+        _sw = self.sw_cfg
+        _map_data = _data.measurement.IntegralMaps()
+        self._update_map_variables(_map_data)
+
+        _components = []
+        if _cfg.Ix:
+            _components += [_n + 'x' for _n in ['I1', 'I2'] if getattr(
+                _cfg, _n)]
+        if _cfg.Iy:
+            _components += [_n + 'y' for _n in ['I1', 'I2'] if getattr(
+                _cfg, _n)]
+        _meas = {}
+        for _name in _components:
+            _axis = 'Y' if _name.endswith('x') else 'X'
+            _meas[_name] = self._new_meas(_name, _axis)
+            self.use_trigger(_meas[_name], _axis, self.i2_motors[_axis]
+                             if _name.startswith('I2') else None)
+
+        if _cfg.I1:
+            _map_data.I1_start_id = self._last_id(
+                _data.measurement.MeasurementDataSW) + 1
+        if _cfg.I2:
+            _map_data.I2_start_id = self._last_id(
+                _data.measurement.MeasurementDataSW2) + 1
+
+        _points = self.points()
+
+        self._count = 0
+        self._total = len(_points)*len(_components)*_cfg.repetitions
+        self._aligned = {}
+        self.report(0, self._total*_sw.nmeasurements)
+
+        for x, y in _points:
+            # Ix is measured moving the wire along Y and Iy along X
+            for _static, _axis, _pos in [('x', 'Y', y), ('y', 'X', x)]:
+                _names = [_n for _n in _components
+                          if _n.endswith(_static)]
+                if len(_names) == 0:
+                    continue
+                self._go_to(_static.upper(), x if _static == 'x' else y)
+                # the sweeps leave the moving axis out of alignment
+                self._aligned.pop(_axis, None)
+                _volt.configure_volt(
+                    _sw.nplc, self.sweep_duration(
+                        _axis, getattr(_cfg, _axis.lower() + '_duration'),
+                        _sw.acq_final_interval), _sw.range)
+                for _name in _names:
+                    _m = _meas[_name]
+                    _m.x_pos = x
+                    _m.y_pos = y
+                    if _name.startswith('I2'):
+                        _m.moving_motor = self.i2_motors[_axis]
+                        self.move(_axis, _pos)
+                        self.move(_axis, _pos)
+                        self.measure_component(_m, _name, _axis, _pos,
+                                               _m.moving_motor)
+                    else:
+                        self.measure_component(_m, _name, _axis, _pos)
+
+        if _cfg.I1:
+            _map_data.I1_end_id = self._last_id(
+                _data.measurement.MeasurementDataSW)
+        else:
+            _map_data.I1_start_id = 0
+            _map_data.I1_end_id = 0
+        if _cfg.I2:
+            _map_data.I2_end_id = self._last_id(
+                _data.measurement.MeasurementDataSW2)
+        else:
+            _map_data.I2_start_id = 0
+            _map_data.I2_end_id = 0
+
+        _maps.update_map_arrays(_map_data)
+        self.save(_map_data)
+        self.map_data = _map_data
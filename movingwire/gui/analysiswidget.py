@@ -17,12 +17,18 @@ from qtpy.QtCore import Qt as _Qt
 import qtpy.uic as _uic
 
 import movingwire.data as _data
+from movingwire.analysis import integrals as _integrals
+from movingwire.analysis import ambient as _ambient
+from movingwire.analysis import maps as _maps
+from movingwire.analysis import cache as _cache
+from movingwire.tracing import traced as _traced
 from movingwire.gui.utils import (
     get_ui_file as _get_ui_file,
     sleep as _sleep,
     update_db_name_list as _update_db_name_list,
-    pandas_load_db_measurements as _pandas_load_db_measurements,
+    pandas_load_map_measurements as _pandas_load_map_measurements,
     pandas_load_db_maps as _pandas_load_db_maps,
+    select_id_range as _select_id_range,
     json_to_array as _json_to_array
     )
 
@@ -230,32 +236,34 @@ class AnalysisWidget(_QWidget):
             self.meas.db_update_database(
                 self.database_name,
                 mongo=self.mongo, server=self.server)
-            meas_list = []
-            for i in range(self.ui.cmb_meas_name.count()):
-                meas_list.append(self.ui.cmb_meas_name.itemText(i))
-            meas_name = self.ui.cmb_meas_name.currentText()
-            meas_cmb_idx = self.ui.cmb_meas_name.currentIndex()
-            if all([meas_list.count(meas_name) > 1,
-                    meas_cmb_idx > 0]):
-                idx = -1
-                for i in range(len(meas_list)):
-                    if meas_name == meas_list[i]:
-                        idx += 1
-            else:
-                idx = 0
-            _id = self.meas.db_search_field('name', meas_name)[idx]['id']
+            # the summary list keeps the measurement id of each item
+            idx = 0
+            _id = self.ui.cmb_meas_name.currentData()
+            if _id is None:
+                meas_list = []
+                for i in range(self.ui.cmb_meas_name.count()):
+                    meas_list.append(self.ui.cmb_meas_name.itemText(i))
+                meas_name = self.ui.cmb_meas_name.currentText()
+                meas_cmb_idx = self.ui.cmb_meas_name.currentIndex()
+                if all([meas_list.count(meas_name) > 1,
+                        meas_cmb_idx > 0]):
+                    idx = -1
+                    for i in range(len(meas_list)):
+                        if meas_name == meas_list[i]:
+                            idx += 1
+                _id = self.meas.db_search_field('name', meas_name)[idx]['id']
             self.meas.db_read(_id)
             self.ui.le_comments.setText(self.meas.comments)
 
             if self.ui.rdb_sw.isChecked():
-                self.integral_calculus_sw(self.meas)
+                self.cached_integral_calculus(self.meas)
                 self.ui.le_cfg_name.setText('')
             elif self.ui.rdb_sw_I2.isChecked():
-                self.integral_calculus_sw(self.meas, I2=True)
+                self.cached_integral_calculus(self.meas, I2=True)
                 self.ui.le_cfg_name.setText('')
             else:
                 self.cfg.db_read(self.meas.cfg_id)
-                self.integral_calculus_fc(cfg=self.cfg, meas=self.meas)
+                self.cached_integral_calculus(self.meas, cfg=self.cfg)
 
                 cfg_name = self.cfg.name + ' / ' + str(self.cfg.idn)
                 self.ui.le_cfg_name.setText(cfg_name)
@@ -366,6 +374,44 @@ class AnalysisWidget(_QWidget):
                                  _QMessageBox.Ok)
             return False
 
+    def cached_integral_calculus(self, meas, cfg=None, I2=False):
+        """Calculates the integrals of a saved measurement, reusing the
+        results cached by a previous calculation with the same parameters.
+
+        Args:
+            meas (MeasurementDataFC/SW/SW2): measurement data read from the
+                                             database;
+            cfg (MeasurementConfig): flip coil measurement configuration,
+                                     None for stretched wire measurements;
+            I2 (bool): True for second integral calculus.
+
+        Returns:
+            MeaseurementData instance if the calculations were successfull;
+            None otherwise
+        """
+        _key = _cache.result_key(meas, self.database_name, cfg=cfg, I2=I2,
+                                 ambient=_cache.ambient_values(meas, I2))
+        _results = _cache.results_cache.get(_key)
+        if _results is not None:
+            _cache.restore(meas, _results, I2)
+            self.ui.le_Imeas.setText(str(_results.get('Imeas', '')))
+            self.ui.le_Iamb.setText(str(_results.get('Iamb', '')))
+            self.ui.le_Iamb_name.setText(str(_results.get('Iamb_name', '')))
+            return meas
+
+        self.ui.le_Iamb_name.setText('')
+        if cfg is None:
+            _meas = self.integral_calculus_sw(meas, I2)
+        else:
+            _meas = self.integral_calculus_fc(cfg, meas)
+        _amb_name = self.ui.le_Iamb_name.text()
+        # failed ambient field corrections are not cached
+        if _meas is not None and (meas.Iamb_id == 0 or _amb_name != ''):
+            _cache.results_cache.put(_key, _cache.results(
+                meas, I2, Imeas=self.ui.le_Imeas.text(),
+                Iamb=self.ui.le_Iamb.text(), Iamb_name=_amb_name))
+        return _meas
+
     def integral_calculus_fc(self, cfg, meas, fdi_mode=False):
         """Calculates first field integral from raw data.
 
@@ -378,49 +424,7 @@ class AnalysisWidget(_QWidget):
             None otherwise
         """
         try:
-            # _width = 12.5e-3  # [m]
-            _width = cfg.width
-            _turns = cfg.turns  # number of coil turns
-            #_gain = _meas.gain  # gain
-            _dt = cfg.nplc/60
-            # I = flux/(2*N*width)
-            if not fdi_mode:
-                for i in range(meas.data_frw.shape[1]):
-                    _offset_f = meas.data_frw[:40, i].mean()
-                    _offset_b = meas.data_bck[:40, i].mean()
-                    _f_f = _np.array([0])
-                    _f_b = _np.array([0])
-                    for idx in range(meas.data_frw[:, i].shape[0]-1):
-                        # dv = ((v[i+1] - v[i])/2)/0.05
-                        # f = np.append(f, f[i]+dv)
-                        _f_f_part = meas.data_frw[:idx, i] - _offset_f
-                        _f_b_part = meas.data_bck[:idx, i] - _offset_b
-                        _f_f = _np.append(_f_f, _np.trapz(_f_f_part, dx=_dt))
-                        _f_b = _np.append(_f_b, _np.trapz(_f_b_part, dx=_dt))
-                    if i == 0:
-                        meas.flx_f = _f_f
-                        meas.flx_b = _f_b
-                    else:
-                        meas.flx_f = _np.vstack([meas.flx_f, _f_f])
-                        meas.flx_b = _np.vstack([meas.flx_b, _f_b])
-                meas.flx_f = meas.flx_f.transpose()
-                meas.flx_b = meas.flx_b.transpose()
-            else:
-                meas.flx_f = _np.copy(meas.data_frw)
-                meas.flx_b = _np.copy(meas.data_bck)
-
-            meas.I_f = meas.flx_f * 1/(2*_turns*_width)
-            meas.I_b = meas.flx_b * 1/(2*_turns*_width)
-            meas.I = (meas.flx_f - meas.flx_b)/2 * 1/(2*_turns*_width)
-
-            meas.If = meas.I_f[61, :] - meas.I_f[40, :]
-            meas.If_std = meas.If.std(ddof=1)
-
-            meas.Ib = meas.I_b[61, :] - meas.I_b[40, :]
-            meas.Ib_std = meas.Ib.std(ddof=1)
-
-            meas.I_mean = (meas.If.mean() - meas.Ib.mean())/2
-            meas.I_std = 1/2*(meas.If_std**2 + meas.Ib_std**2)**0.5
+            _integrals.integral_calculus_fc(cfg, meas, fdi_mode)
 
             if meas.Iamb_id > 0:
                 self.amb_cfg.db_update_database(
@@ -456,94 +460,11 @@ class AnalysisWidget(_QWidget):
             None otherwise
         """
         try:
-            # _width = 12.5e-3  # [m]
-            _step = meas.step*1e-3  # [m]
-            _turns = meas.turns  # number of coil turns
-            _gain = meas.gain  # gain
-            _dt = meas.nplc/60  # [s]
-            _duration = meas.duration  # [s]
-
-            if not hasattr(meas, 'acq_init_interval'):
-                _acq_init_interval = 1  # [s]
-            else:
-                _acq_init_interval = meas.acq_init_interval - 0.1  # [s]
-
-            if not hasattr(meas, 'acq_init_interval'):
-                _acq_final_interval = 1  # [s]
-            else:
-                _acq_final_interval = meas.acq_final_interval  # [s]
-            # initial integral index
-            _idx_0 = int(_acq_init_interval // _dt)
-            if _idx_0 < 0:
-                _idx_0 = 0
-            # final integral index
-            _idx_f = int((_duration - _acq_final_interval) // _dt)
-
-            shape = meas.data_frw.shape
-
-            if not I2:
-                # first field integral coefficient
-                _coef = 1 / (_gain * _turns * _step)
-            else:
-                # second field integral coefficient
-                _length = meas.length
-                _coef = _length / (_gain * _turns * _step)
-            # I = flux/step
-
-            # data[i, j]
-            # i: measurement voltage array index
-            # j: measurement number index
-
-            for j in range(shape[1]):
-                _f_f = _np.array([])
-                _f_b = _np.array([])
-#                 _offset_f = (meas.data_frw[:_idx_0].mean() +
-#                              meas.data_frw[_idx_f:].mean())/2
-#                 _offset_b = (meas.data_bck[:_idx_0].mean() +
-#                              meas.data_bck[_idx_f:].mean())/2
-                for idx in range(shape[0]):
-                    # dv = ((v[i+1] - v[i])/2)/0.05
-                    # f = np.append(f, f[i]+dv)
-                    _f_f_part = meas.data_frw[:idx, j]
-                    _f_b_part = meas.data_bck[:idx, j]
-                    _f_f = _np.append(_f_f, _np.trapz(_f_f_part, dx=_dt))
-                    _f_b = _np.append(_f_b, _np.trapz(_f_b_part, dx=_dt))
-                if j == 0:
-                    flx_f = _f_f
-                    flx_b = _f_b
-                else:
-                    flx_f = _np.vstack([flx_f, _f_f])
-                    flx_b = _np.vstack([flx_b, _f_b])
-            meas.flx_f = flx_f.transpose()
-            meas.flx_b = flx_b.transpose()
-
-            meas.I_f = meas.flx_f * _coef
-            meas.I_b = meas.flx_b * _coef
-#             meas.I_f = meas.flx_f / (_gain * _turns * _step)
-#             meas.I_b = meas.flx_b / (_gain * _turns * _step)
-            meas.I = (meas.I_f - meas.I_b) / 2
-
-            meas.If = meas.I_f[_idx_f, :] - meas.I_f[_idx_0, :]
-            meas.If_std = meas.If.std(ddof=1)
-
-            meas.Ib = meas.I_b[_idx_f, :] - meas.I_b[_idx_0, :]
-            meas.Ib_std = meas.Ib.std(ddof=1)
-
-            if meas.motion_axis == 'X':
-                _signal = 1
-            elif meas.motion_axis == 'Y':
-                _signal = 1
-
-            integrals = _signal*(meas.I[_idx_f, :] - meas.I[_idx_0, :])
-            meas.max_integral_diff = integrals.max() - integrals.min()
+            _integrals.integral_calculus_sw(meas, I2)
 
             if not I2:
-                meas.I1_mean = integrals.mean()
-                meas.I1_std = integrals.std(ddof=1)
                 _amb_meas = self.amb_meas_sw
-            elif I2:
-                meas.I2_mean = integrals.mean()
-                meas.I2_std = integrals.std(ddof=1)
+            else:
                 _amb_meas = self.amb_meas_sw2
 
             if meas.Iamb_id > 0:
@@ -557,6 +478,8 @@ class AnalysisWidget(_QWidget):
                 self.ui.le_Iamb.setText('')
                 self.ui.le_Iamb_name.setText('')
 
+            return meas
+
         except Exception:
             _traceback.print_exc(file=_sys.stdout)
             return None
@@ -564,52 +487,12 @@ class AnalysisWidget(_QWidget):
     def ambient_field_calculus(self, meas):
         """Discounts ambient field from measurement and prints results."""
         try:
+            (I_mean, I_std, Iamb_mean, Iamb_std,
+             _amb_meas) = _ambient.ambient_field_correction(
+                meas, self.database_name, mongo=self.mongo, server=self.server)
             if meas.mode == 'FC_I1' or meas.mode is None:
-                _amb_meas = _data.measurement.MeasurementDataFC()
-                _amb_meas.db_update_database(self.database_name,
-                    mongo=self.mongo, server=self.server)
-                _amb_meas.db_read(meas.Iamb_id)
                 self.amb_cfg.db_read(_amb_meas.cfg_id)
 
-                I_mean = meas.I1_mean*10**6   # T.m to G.cm
-                I_std = meas.I1_std*10**6   # T.m to G.cm
-
-                meas.I1_mean = meas.I1_mean - _amb_meas.I1_mean
-                meas.I1_std = (meas.I1_std**2 + _amb_meas.I1_std**2)**0.5
-
-                Iamb_mean = _amb_meas.I1_mean*10**6   # T.m to G.cm
-                Iamb_std = _amb_meas.I1_std*10**6   # T.m to G.cm
-
-            if meas.mode == 'SW_I1' or meas.mode == 'sw':
-                _amb_meas = _data.measurement.MeasurementDataSW()
-                _amb_meas.db_update_database(self.database_name,
-                    mongo=self.mongo, server=self.server)
-                _amb_meas.db_read(meas.Iamb_id)
-
-                I_mean = meas.I1_mean*10**6   # T.m to G.cm
-                I_std = meas.I1_std*10**6   # T.m to G.cm
-
-                meas.I1_mean = meas.I1_mean - _amb_meas.I1_mean
-                meas.I1_std = (meas.I1_std**2 + _amb_meas.I1_std**2)**0.5
-
-                Iamb_mean = _amb_meas.I1_mean*10**6   # T.m to G.cm
-                Iamb_std = _amb_meas.I1_std*10**6   # T.m to G.cm
-
-            elif meas.mode == 'SW_I2':
-                _amb_meas = _data.measurement.MeasurementDataSW2()
-                _amb_meas.db_update_database(self.database_name,
-                    mongo=self.mongo, server=self.server)
-                _amb_meas.db_read(meas.Iamb_id)
-
-                I_mean = meas.I2_mean*10**5  # T.m2 to kG.cm2
-                I_std = meas.I2_std*10**5  # T.m2 to kG.cm2
-
-                meas.I2_mean = meas.I2_mean - _amb_meas.I2_mean
-                meas.I2_std = (meas.I2_std**2 + _amb_meas.I2_std**2)**0.5
-
-                Iamb_mean = _amb_meas.I2_mean*10**5  # T.m2 to kG.cm2
-                Iamb_std = _amb_meas.I2_std*10**5  # T.m2 to kG.cm2
-
             _result = '{:.2f} +/- {:.2f}'.format(I_mean,
                                                  I_std)
             _result1 = '{:.2f} +/- {:.2f}'.format(Iamb_mean,
@@ -623,6 +506,7 @@ class AnalysisWidget(_QWidget):
             _traceback.print_exc(file=_sys.stdout)
             return None
 
+    @_traced('gui')
     def plot(self):
         """Plots measurement data.
 
@@ -830,10 +714,9 @@ class AnalysisWidget(_QWidget):
                 if _hor_axis == 'Y [mm]':
                     _transv_axis = 'x_pos'
 
-            _maps = _pandas_load_db_maps()
-            _meas_I1, _meas_I2 = _pandas_load_db_measurements()
-
-            _map = _maps.loc[_maps['name'] == _map_name]
+            _map = _pandas_load_db_maps(_map_name)
+            _meas_I1, _meas_I2 = _pandas_load_map_measurements(
+                _map.iloc[0])
 
             _repetitions = _map['repetitions'].iloc[-1]
             if _repetitions == 1:
@@ -847,7 +730,7 @@ class AnalysisWidget(_QWidget):
             _I2_idf = _map['I2_end_id'].values[0]
 
             if _I1_idf != 0:
-                _I1 = _meas_I1.iloc[_I1_id0:_I1_idf]
+                _I1 = _select_id_range(_meas_I1, _I1_id0 + 1, _I1_idf)
                 if _hor_axis != 'Meas #':
                     _I1x = _I1.loc[(_I1['motion_axis'] == 'Y') &
                                    (_I1[_transv_axis] == _transv_pos)]
@@ -866,7 +749,7 @@ class AnalysisWidget(_QWidget):
                 _I1y = None
 
             if _I2_idf != 0:
-                _I2 = _meas_I2.iloc[_I2_id0:_I2_idf]
+                _I2 = _select_id_range(_meas_I2, _I2_id0 + 1, _I2_idf)
                 if _hor_axis != 'Meas #':
                     _I2x = _I2.loc[(_I2['motion_axis'] == 'Y') &
                                    (_I2[_transv_axis] == _transv_pos)]
@@ -888,6 +771,7 @@ class AnalysisWidget(_QWidget):
         except Exception:
             _traceback.print_exc(file=_sys.stdout)
 
+    @_traced('gui')
     def plot_map(self):
         """Plots map data."""
         try:
@@ -901,10 +785,9 @@ class AnalysisWidget(_QWidget):
                 if _hor_axis == 'Y [mm]':
                     _transv_axis = 'x_pos'
 
-            _maps = _pandas_load_db_maps()
-            _meas_I1, _meas_I2 = _pandas_load_db_measurements()
-
-            _map = _maps.loc[_maps['name'] == _map_name]
+            _map = _pandas_load_db_maps(_map_name)
+            _meas_I1, _meas_I2 = _pandas_load_map_measurements(
+                _map.iloc[0])
 
             _repetitions = _map['repetitions'].iloc[-1]
             if _repetitions == 1:
@@ -918,7 +801,7 @@ class AnalysisWidget(_QWidget):
             _I2_idf = _map['I2_end_id'].values[0]
 
             if _I1_idf != 0:
-                _I1 = _meas_I1.iloc[_I1_id0:_I1_idf]
+                _I1 = _select_id_range(_meas_I1, _I1_id0 + 1, _I1_idf)
                 if _hor_axis != 'Meas #':
                     _I1x = _I1.loc[(_I1['motion_axis'] == 'Y') &
                                    (_I1[_transv_axis] == _transv_pos)]
@@ -937,7 +820,7 @@ class AnalysisWidget(_QWidget):
                 _I1y = None
 
             if _I2_idf != 0:
-                _I2 = _meas_I2.iloc[_I2_id0:_I2_idf]
+                _I2 = _select_id_range(_meas_I2, _I2_id0 + 1, _I2_idf)
                 if _hor_axis != 'Meas #':
                     _I2x = _I2.loc[(_I2['motion_axis'] == 'Y') &
                                    (_I2[_transv_axis] == _transv_pos)]
@@ -1034,10 +917,9 @@ class AnalysisWidget(_QWidget):
         try:
             _map_name = self.ui.cmb_map_name.currentText()
 
-            _maps = _pandas_load_db_maps()
-            _meas_I1, _meas_I2 = _pandas_load_db_measurements()
-
-            _map = _maps.loc[_maps['name'] == _map_name]
+            _map = _pandas_load_db_maps(_map_name)
+            _meas_I1, _meas_I2 = _pandas_load_map_measurements(
+                _map.iloc[0])
 
             _I1_id0 = _map['I1_start_id'].values[0] - 1
             _I1_idf = _map['I1_end_id'].values[0]
@@ -1045,7 +927,7 @@ class AnalysisWidget(_QWidget):
             _I2_idf = _map['I2_end_id'].values[0]
 
             if _I1_idf != 0:
-                _I1 = _meas_I1.iloc[_I1_id0:_I1_idf]
+                _I1 = _select_id_range(_meas_I1, _I1_id0 + 1, _I1_idf)
                 _I1x = _I1.loc[_I1['motion_axis'] == 'Y']
                 if len(_I1x) == 0:
                     _I1x = None
@@ -1058,7 +940,7 @@ class AnalysisWidget(_QWidget):
                 _I1y = None
 
             if _I2_idf != 0:
-                _I2 = _meas_I2.iloc[_I2_id0:_I2_idf]
+                _I2 = _select_id_range(_meas_I2, _I2_id0 + 1, _I2_idf)
                 _I2x = _I2.loc[_I2['motion_axis'] == 'Y']
                 if len(_I2x) == 0:
                     _I2x = None
@@ -1197,127 +1079,7 @@ class AnalysisWidget(_QWidget):
             map_data (IntegralMaps): Integral maps database class to be
                                      updated."""
         try:
-            _meas_I1, _meas_I2 = _pandas_load_db_measurements()
-
-            _map = map_data
-
-            _I1x_mean = _np.array([])
-            _I1x_std = _np.array([])
-            _I1y_mean = _np.array([])
-            _I1y_std = _np.array([])
-            _I2x_mean = _np.array([])
-            _I2x_std = _np.array([])
-            _I2y_mean = _np.array([])
-            _I2y_std = _np.array([])
-
-            _I1_id0 = _map.I1_start_id - 1
-            _I1_idf = _map.I1_end_id
-            _I2_id0 = _map.I2_start_id - 1
-            _I2_idf = _map.I2_end_id
-
-            if _I1_idf != 0:
-                _I1 = _meas_I1.iloc[_I1_id0:_I1_idf]
-                _I1x = _I1.loc[_I1['motion_axis'] == 'Y']
-                if len(_I1x) == 0:
-                    _I1x = None
-                _I1y = _I1.loc[_I1['motion_axis'] == 'X']
-                if len(_I1y) == 0:
-                    _I1y = None
-            else:
-                _I1 = None
-                _I1x = None
-                _I1y = None
-
-            if _I2_idf != 0:
-                _I2 = _meas_I2.iloc[_I2_id0:_I2_idf]
-                _I2x = _I2.loc[_I2['motion_axis'] == 'Y']
-                if len(_I2x) == 0:
-                    _I2x = None
-                _I2y = _I2.loc[_I2['motion_axis'] == 'X']
-                if len(_I2y) == 0:
-                    _I2y = None
-            else:
-                _I2 = None
-                _I2x = None
-                _I2y = None
-
-            if _I1 is not None:
-                _x_array = _I1['x_pos'].drop_duplicates(keep='last').values
-                _y_array = _I1['y_pos'].drop_duplicates(keep='last').values
-            elif _I2 is not None:
-                _x_array = _I2['x_pos'].drop_duplicates(keep='last').values
-                _y_array = _I2['y_pos'].drop_duplicates(keep='last').values
-
-            _cols = cols = ['X [mm]', 'Y [mm]',
-                            'I1x [G.cm]', 'I1x_std [G.cm]',
-                            'I1y [G.cm]', 'I1y_std [G.cm]',
-                            'I2x [kG.cm^2]', 'I2x_std [kG.cm^2]',
-                            'I2y [kG.cm^2]', 'I2y_std [kG.cm^2]']
-            _map_df = _pd.DataFrame(columns=cols)
-            for _y in _y_array:
-                for _x in _x_array:
-                    if _I1x is not None:
-                        _I1x_item = _I1x.loc[(_I1x['x_pos'] == _x) &
-                                             (_I1x['y_pos'] == _y)]
-                        _I1x_item = _I1x_item.sort_values('I1_std').drop_duplicates('x_pos')
-                        _I1x_mean = _np.append(
-                            _I1x_mean, _I1x_item['I1_mean'].iloc[0]*10**6)
-                        _I1x_std = _np.append(
-                            _I1x_std, _I1x_item['I1_std'].iloc[0]*10**6)
-                    else:
-                        _I1x_mean = _np.append(_I1x_mean, 0)
-                        _I1x_std = _np.append(_I1x_std,  0)
-
-                    if _I1y is not None:
-                        _I1y_item = _I1y.loc[(_I1y['x_pos'] == _x) &
-                                             (_I1y['y_pos'] == _y)]
-                        _I1y_item = _I1y_item.sort_values('I1_std').drop_duplicates('x_pos')
-                        _I1y_mean = _np.append(
-                            _I1y_mean, _I1y_item['I1_mean'].iloc[0]*10**6)
-                        _I1y_std = _np.append(
-                            _I1y_std, _I1y_item['I1_std'].iloc[0]*10**6)
-                    else:
-                        _I1y_mean = _np.append(_I1y_mean, 0)
-                        _I1y_std = _np.append(_I1y_std,  0)
-
-                    if _I2x is not None:
-                        _I2x_item = _I2x.loc[(_I2x['x_pos'] == _x) &
-                                             (_I2x['y_pos'] == _y)]
-                        _I2x_item = _I2x_item.sort_values('I2_std').drop_duplicates('x_pos')
-                        _I2x_mean = _np.append(
-                            _I2x_mean, _I2x_item['I2_mean'].iloc[-1]*10**5)
-                        _I2x_std = _np.append(
-                            _I2x_std, _I2x_item['I2_std'].iloc[-1]*10**5)
-                    else:
-                        _I2x_mean = _np.append(_I2x_mean, 0)
-                        _I2x_std = _np.append(_I2x_std, 0)
-
-                    if _I2y is not None:
-                        _I2y_item = _I2y.loc[(_I2y['x_pos'] == _x) &
-                                             (_I2y['y_pos'] == _y)]
-                        _I2y_item = _I2y_item.sort_values('I2_std').drop_duplicates('x_pos')
-                        _I2y_mean = _np.append(
-                            _I2y_mean, _I2y_item['I2_mean'].iloc[-1]*10**5)
-                        _I2y_std = _np.append(
-                            _I2y_std, _I2y_item['I2_std'].iloc[-1]*10**5)
-                    else:
-                        _I2y_mean = _np.append(_I2y_mean, 0)
-                        _I2y_std = _np.append(_I2y_std, 0)
-
-            print(_x_array)
-            print(_I1x_mean)
-            _map.x_pos_array = _x_array
-            _map.y_pos_array = _y_array
-            _map.I1x = _I1x_mean
-            print(_map.I1x)
-            _map.I1x_std = _I1x_std
-            _map.I1y = _I1y_mean
-            _map.I1y_std = _I1y_std
-            _map.I2x = _I2x_mean
-            _map.I2x_std = _I2x_std
-            _map.I2y = _I2y_mean
-            _map.I2y_std = _I2y_std
-
+            _maps.update_map_arrays(map_data)
             return True
 
         except Exception:
@@ -1333,11 +1095,9 @@ class AnalysisWidget(_QWidget):
             _map_name = self.ui.cmb_map_name.currentText()
             _hor_axis = self.ui.cmb_hor.currentText()
 
-            _maps = _pandas_load_db_maps()
+            _map = _pandas_load_db_maps(_map_name)
             # _meas_I1, _meas_I2 = _pandas_load_db_measurements()
             #
-            _map = _maps.loc[_maps['name'] == _map_name]
-            #
             # _I1_id0 = _map['I1_start_id'].values[0] - 1
             # _I1_idf = _map['I1_end_id'].values[0]
             # _I2_id0 = _map['I2_start_id'].values[0] - 1
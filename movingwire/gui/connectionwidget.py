@@ -17,10 +17,16 @@ from imautils.devices import PmacLV_IMS
 from imautils.devices import FDI2056
 # from imautils.devices import pydrs
 
-from movingwire.gui.utils import get_ui_file as _get_ui_file
+from movingwire.gui.utils import (
+    get_ui_file as _get_ui_file,
+    MONITOR_INTERVAL as _MONITOR_INTERVAL,
+    GATHER_POSITIONS as _GATHER_POSITIONS,
+    )
 
 from movingwire.devices import (
     ppmac as _ppmac,
+    monitor as _monitor,
+    gather as _gather,
     fdi as _fdi,
     ps as _ps,
     volt as _volt,
@@ -111,6 +117,10 @@ class ConnectionWidget(_QWidget):
                     _ppmac.ppmac.timeout = 3
                     _ppmac.ppmac_ssh = _ppmac.ssh.invoke_shell(term='vt100')
                     _ppmac.ftp = _ppmac.ssh.open_sftp()
+                    _ppmac.mux.start()
+                    _monitor.start(_MONITOR_INTERVAL)
+                    if _GATHER_POSITIONS and not _gather.configure():
+                        print('PPMAC gather configuration failed.')
 
                     #Check if the motors are homed
                     if _ppmac.motor_homed(1) and _ppmac.motor_homed(3) == True:
@@ -170,6 +180,9 @@ class ConnectionWidget(_QWidget):
         try:
 #             _fdi.disconnect()
             if self.ui.chb_ppmac_en.isChecked():
+                _monitor.stop()
+                _ppmac.mux.stop()
+                _gather.configured = False
                 _ppmac.disconnect()
             if self.ui.chb_ps_en.isChecked():
                 _ps.turn_off()
@@ -98,7 +98,8 @@ class FiducialDialog(_QDialog):
             self.motors.update_flag = False
             if hasattr(_ppmac, 'ppmac'):
                 if not _ppmac.ppmac.closed:
-                    self.pos = _ppmac.read_motor_pos([1, 2, 3, 4, 7, 8])
+                    self.pos = self.motors.read_positions(
+                        [1, 2, 3, 4, 7, 8])
                     self.ui.lcd_pos1.display(self.pos[1]*self.motors.cfg.x_sf -
                                              self.motors.cfg.x_offset)
                     self.ui.lcd_pos2.display(self.pos[0]*self.motors.cfg.y_sf -
@@ -20,6 +20,8 @@ from movingwire.gui.utils import (
     sleep as _sleep,
     update_db_name_list as _update_db_name_list,
     pandas_load_db_measurements as _pandas_load_db_measurements,
+    MAP_COLUMNS as _MAP_COLUMNS,
+    show_estimate as _show_estimate,
     )
 
 
@@ -43,6 +45,10 @@ class MapDialog(_QDialog):
         self.meas_sw = _data.measurement.MeasurementDataSW()
         self.meas_sw2 = _data.measurement.MeasurementDataSW2()
 
+        # function returning the calibrated Estimate of a map
+        # configuration, set by the measurement widget
+        self.estimate_time = None
+
         self.connect_signal_slots()
 
         self.update_cfg_list()
@@ -73,6 +79,7 @@ class MapDialog(_QDialog):
         self.ui.pbt_load_cfg.clicked.connect(self.load_cfg)
         self.ui.pbt_update_cfg.clicked.connect(self.update_cfg_list)
         self.ui.pbt_save_cfg.clicked.connect(self.save_cfg)
+        self.ui.pbt_estimate.clicked.connect(self.update_estimate)
 
     def load_cfg(self):
         """Load configuration from database."""
@@ -85,6 +92,7 @@ class MapDialog(_QDialog):
             self.cfg.db_read(_id)
             self.update_iamb_list()
             self.load_cfg_into_ui()
+            self.update_estimate()
             # _QMessageBox.information(self, 'Information',
             #                          'Configuration Loaded.',
             #                          _QMessageBox.Ok)
@@ -234,10 +242,7 @@ class MapDialog(_QDialog):
                              _time.strftime('_%y%m%d_%H%M'))
             self.cfg.comments = self.ui.le_comments.text()
 
-            self.cfg.Ix = 1*self.ui.chb_Ix.isChecked()
-            self.cfg.Iy = 1*self.ui.chb_Iy.isChecked()
-            self.cfg.I1 = 1*self.ui.chb_I1.isChecked()
-            self.cfg.I2 = 1*self.ui.chb_I2.isChecked()
+            self.update_scan_from_ui(self.cfg)
 
             if self.ui.chb_Iamb.isChecked():
                 self.cfg.I1x_amb_id = 0
@@ -259,18 +264,6 @@ class MapDialog(_QDialog):
                 self.cfg.I2y_amb_id = self.get_Iamb_id(self.meas_sw2,
                                                        _I2y_amb_name)
 
-            self.cfg.x_start_pos = self.ui.dsb_x_start_pos.value()
-            self.cfg.x_end_pos = self.ui.dsb_x_end_pos.value()
-            self.cfg.x_step = self.ui.dsb_x_step.value()
-            self.cfg.x_duration = self.ui.dsb_x_duration.value()
-
-            self.cfg.y_start_pos = self.ui.dsb_y_start_pos.value()
-            self.cfg.y_end_pos = self.ui.dsb_y_end_pos.value()
-            self.cfg.y_step = self.ui.dsb_y_step.value()
-            self.cfg.y_duration = self.ui.dsb_y_duration.value()
-
-            self.cfg.repetitions = self.ui.sb_repetitions.value()
-
             self.cfg.und_ctrl = self.undctrl.ui.chb_enable_und.isChecked()
 
             if self.cfg.und_ctrl:
@@ -283,9 +276,42 @@ class MapDialog(_QDialog):
             _traceback.print_exc(file=_sys.stdout)
             return False
 
+    def update_scan_from_ui(self, cfg):
+        """Updates the measured integrals, the map positions and the
+        repetitions of cfg from ui widgets."""
+        cfg.Ix = 1*self.ui.chb_Ix.isChecked()
+        cfg.Iy = 1*self.ui.chb_Iy.isChecked()
+        cfg.I1 = 1*self.ui.chb_I1.isChecked()
+        cfg.I2 = 1*self.ui.chb_I2.isChecked()
+
+        cfg.x_start_pos = self.ui.dsb_x_start_pos.value()
+        cfg.x_end_pos = self.ui.dsb_x_end_pos.value()
+        cfg.x_step = self.ui.dsb_x_step.value()
+        cfg.x_duration = self.ui.dsb_x_duration.value()
+
+        cfg.y_start_pos = self.ui.dsb_y_start_pos.value()
+        cfg.y_end_pos = self.ui.dsb_y_end_pos.value()
+        cfg.y_step = self.ui.dsb_y_step.value()
+        cfg.y_duration = self.ui.dsb_y_duration.value()
+
+        cfg.repetitions = self.ui.sb_repetitions.value()
+
+    def update_estimate(self):
+        """Shows the estimated time of the map set in the ui."""
+        if self.estimate_time is None:
+            return
+        try:
+            self.update_scan_from_ui(self.cfg_aux)
+            _estimate = self.estimate_time(self.cfg_aux)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _estimate = None
+        _show_estimate(self.ui.lbl_estimate, _estimate)
+
     def update_iamb_list(self):
         """Updates Iamb list on integrals map dialog."""
-        _meas_I1, _meas_I2 = _pandas_load_db_measurements()
+        _meas_I1, _meas_I2 = _pandas_load_db_measurements(
+            columns=_MAP_COLUMNS)
 
         _I1x_amb = _meas_I1.loc[(_meas_I1['Iamb_id'] == 0) &
                                 (_meas_I1['motion_axis'] == 'Y')]
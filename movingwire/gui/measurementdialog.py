@@ -3,6 +3,7 @@
 import os as _os
 import sys as _sys
 import traceback as _traceback
+import numpy as _np
 from qtpy.QtCore import Qt as _Qt
 from qtpy.QtWidgets import (
     QApplication as _QApplication,
@@ -13,7 +14,10 @@ from qtpy.QtWidgets import (
 
 import qtpy.uic as _uic
 
-from movingwire.gui.utils import get_ui_file as _get_ui_file
+from movingwire.gui.utils import (
+    get_ui_file as _get_ui_file,
+    show_estimate as _show_estimate,
+    )
 from imautils.gui.undconfigwidget import UndConfigWidget
 
 
@@ -32,13 +36,41 @@ class MeasurementDialog(_QDialog):
 
         self.ui.wdg_und.setLayout(self.undctrl.wdg_und)
 
+        # function returning the calibrated Estimate of one measurement,
+        # set by the measurement widget
+        self.estimate_time = None
+
         self.connect_signal_slots()
 
     def connect_signal_slots(self):
-        pass
+        self.ui.pbt_estimate.clicked.connect(self.update_estimate)
         #self.ui.pbt_cancel.clicked.connect()
         #self.ui.pbt_close.clicked.connect()
 
+    def measurements(self):
+        """Returns the number of measurements of the dialog settings."""
+        _count = self.ui.sb_repetitions.value()
+        if self.ui.chb_scan.isChecked():
+            _start = self.ui.dsb_scan_start.value()
+            _end = self.ui.dsb_scan_end.value()
+            _step = self.ui.dsb_scan_step.value()
+            if _step != 0:
+                _count *= int(1 + _np.ceil((_end - _start)/_step))
+        return _count
+
+    def update_estimate(self):
+        """Shows the estimated time of the measurements."""
+        if self.estimate_time is None:
+            return
+        try:
+            _estimate = self.estimate_time()
+            if _estimate is not None:
+                _estimate = _estimate.scaled(self.measurements())
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _estimate = None
+        _show_estimate(self.ui.lbl_estimate, _estimate)
+
     def update_postions(self):
         pass
 
@@ -2,7 +2,10 @@ from qtpy.QtWidgets import (
     QDialog as _QDialog,
     )
 from PyQt5 import uic as _uic
-from movingwire.devices import ppmac as _ppmac
+from movingwire.devices import (
+    ppmac as _ppmac,
+    monitor as _monitor,
+    )
 
 from movingwire.gui.utils import (
     get_ui_file as _get_ui_file,
@@ -73,49 +76,54 @@ class MotorStatus(_QDialog):
         try:
             self.parent().update_flag = False
             # time.sleep(0.5)
+            _snapshot = _monitor.snapshot()
+            if _snapshot is not None:
+                _status = _snapshot.status
+            else:
+                _status = _ppmac.motor_status([1, 2, 3, 4])
             for i in range(1, 5):
 
-                if _ppmac.query_motor_param(i, 'AmpEna') == '1':
+                if _status[(i, 'AmpEna')] == 1:
                     motors[i-1].setStyleSheet("background-color: limegreen")
                     ampEna[i-1].setStyleSheet("background-color: limegreen")
-                elif _ppmac.query_motor_param(i, 'AmpEna') == '0':
+                elif _status[(i, 'AmpEna')] == 0:
                     motors[i-1].setStyleSheet("background-color: light gray")
                     ampEna[i-1].setStyleSheet("background-color: light gray")
 
-                if _ppmac.query_motor_param(i, 'FeFatal') == '1':
+                if _status[(i, 'FeFatal')] == 1:
                     feFatal[i-1].setStyleSheet("background-color: red")
                     motors[i-1].setStyleSheet("background-color: orange")
-                if _ppmac.query_motor_param(i, 'FeFatal') == '0':
+                if _status[(i, 'FeFatal')] == 0:
                     feFatal[i-1].setStyleSheet("background-color: light gray")
-                    if _ppmac.query_motor_param(i, 'AmpEna') == '1':
+                    if _status[(i, 'AmpEna')] == 1:
                         motors[i-1].setStyleSheet("background-color: limegreen")
 
-                if _ppmac.motor_homed(i):
+                if _status[(i, 'Homed')]:
                     homed[i-1].setStyleSheet("background-color: limegreen")
-                elif not _ppmac.motor_homed(i):
+                else:
                     homed[i-1].setStyleSheet("background-color: light gray")
 
-                if _ppmac.query_motor_param(i, 'AmpFault') == '1':
+                if _status[(i, 'AmpFault')] == 1:
                     ampFault[i-1].setStyleSheet("background-color: red")
                     motors[i-1].setStyleSheet("background-color: orange")
-                elif _ppmac.query_motor_param(i, 'AmpFault') == '0':
+                elif _status[(i, 'AmpFault')] == 0:
                     ampFault[i-1].setStyleSheet("background-color: light gray")
-                    if _ppmac.query_motor_param(i, 'AmpEna') == '1':
+                    if _status[(i, 'AmpEna')] == 1:
                         motors[i-1].setStyleSheet("background-color: limegreen")
 
-                if _ppmac.query_motor_param(i, 'LimitStop') == '1':
+                if _status[(i, 'LimitStop')] == 1:
                     limitstop[i-1].setStyleSheet("background-color: yellow")
-                elif _ppmac.query_motor_param(i, 'LimitStop') == '0':
+                elif _status[(i, 'LimitStop')] == 0:
                     limitstop[i-1].setStyleSheet("background-color: light gray")
 
-                if _ppmac.query_motor_param(i, 'PlusLimit') == '1':
+                if _status[(i, 'PlusLimit')] == 1:
                     pluslimit[i-1].setStyleSheet("background-color: red")
-                elif _ppmac.query_motor_param(i, 'PlusLimit') == '0':
+                elif _status[(i, 'PlusLimit')] == 0:
                     pluslimit[i-1].setStyleSheet("background-color: light gray")
 
-                if _ppmac.query_motor_param(i, 'MinusLimit') == '1':
+                if _status[(i, 'MinusLimit')] == 1:
                     minuslimit[i-1].setStyleSheet("background-color: red")
-                elif _ppmac.query_motor_param(i, 'MinusLimit') == '0':
+                elif _status[(i, 'MinusLimit')] == 0:
                     minuslimit[i-1].setStyleSheet("background-color: light gray")
 
             self.parent().update_flag = True
@@ -29,7 +29,11 @@ from movingwire.gui.utils import (
     update_db_name_list as _update_db_name_list,
     load_db_from_name as _load_db_from_name,
     )
-from movingwire.devices import ppmac as _ppmac
+from movingwire.devices import (
+    ppmac as _ppmac,
+    monitor as _monitor,
+    )
+from movingwire.tracing import traced as _traced
 import movingwire.data as _data
 from movingwire.gui.motorstatusdialog import MotorStatus as _MotorStatus
 
@@ -60,6 +64,7 @@ class PpmacWidget(_QWidget):
         self.pos = _np.zeros(6)
 
         self.update_flag = True
+        self.motion_poll_interval = 0.05  # [s]
         self.timer = _QTimer()
         self.timer.start(1000)
 
@@ -142,6 +147,22 @@ class PpmacWidget(_QWidget):
                                  'PPMAC configured.',
                                  _QMessageBox.Ok)
 
+    def read_positions(self, motors):
+        """Returns the motor positions [counts] from the monitor snapshot,
+        or reads them from the controller if the monitor is not running.
+
+        Args:
+            motors (list): list of motor numbers (int), in ascending order.
+        Returns:
+            positions (numpy array), None if they could not be read."""
+        if _monitor.running:
+            _pos = _monitor.read_motor_pos(motors,
+                                           max_age=5*_monitor.interval)
+            if _pos is not None:
+                return _pos
+        return _ppmac.read_motor_pos(motors)
+
+    @_traced('gui')
     def update_position(self):
         """Updates position displays on ui."""
         try:
@@ -150,7 +171,7 @@ class PpmacWidget(_QWidget):
                         not _ppmac.ppmac.closed,
                         self.parent().currentWidget() == self]):
                     if self.update_flag:
-                        self.pos = _ppmac.read_motor_pos([1, 2, 3, 4])
+                        self.pos = self.read_positions([1, 2, 3, 4])
                     self.ui.lcd_pos1.display(
                         self.pos[1]*self.cfg.x_sf - self.cfg.x_offset)
                     self.ui.lcd_pos2.display(
@@ -368,37 +389,37 @@ class PpmacWidget(_QWidget):
             self.update_flag = False
             self.timer.stop()
             _sleep(0.2)
-            # Configures rotation motors:
-            for i in [5, 6]:
-                if i == 5:
-                    _home_offset = self.cfg.home_offset5
-                else:
-                    _home_offset = self.cfg.home_offset6
-                msg = ('Motor[{0}].JogSpeed={1};'
-                       'Motor[{0}].JogTa={2};'
-                       'Motor[{0}].JogTs={3};'
-                       'Motor[{0}].HomeOffset={4}'.format(i, _spd, _ta, _ts,
-                                                          _home_offset))
-#                 with _ppmac.lock_ppmac:
-                _ppmac.write(msg)
-
-            # Configures X motors:
-            for i in [2, 4]:
-                msg = ('Motor[{0}].JogSpeed={1};'
-                       'Motor[{0}].JogTa={2};'
-                       'Motor[{0}].JogTs={3}'.format(i, _spd_x, _ta_x, _ts_x))
-#                 with _ppmac.lock_ppmac:
-                _ppmac.write(msg)
-
-            # Configures Y motors:
-            for i in [1, 3]:
-                msg = ('Motor[{0}].JogSpeed={1};'
-                       'Motor[{0}].JogTa={2};'
-                       'Motor[{0}].JogTs={3}'.format(i, _spd_y, _ta_y, _ts_y))
-#                 with _ppmac.lock_ppmac:
-                _ppmac.write(msg)
-            _sleep(0.1)
-            _ppmac.read()
+            with _ppmac.lock_ppmac:
+                # Configures rotation motors:
+                for i in [5, 6]:
+                    if i == 5:
+                        _home_offset = self.cfg.home_offset5
+                    else:
+                        _home_offset = self.cfg.home_offset6
+                    msg = ('Motor[{0}].JogSpeed={1};'
+                           'Motor[{0}].JogTa={2};'
+                           'Motor[{0}].JogTs={3};'
+                           'Motor[{0}].HomeOffset={4}'.format(
+                               i, _spd, _ta, _ts, _home_offset))
+                    _ppmac.write(msg)
+
+                # Configures X motors:
+                for i in [2, 4]:
+                    msg = ('Motor[{0}].JogSpeed={1};'
+                           'Motor[{0}].JogTa={2};'
+                           'Motor[{0}].JogTs={3}'.format(
+                               i, _spd_x, _ta_x, _ts_x))
+                    _ppmac.write(msg)
+
+                # Configures Y motors:
+                for i in [1, 3]:
+                    msg = ('Motor[{0}].JogSpeed={1};'
+                           'Motor[{0}].JogTa={2};'
+                           'Motor[{0}].JogTs={3}'.format(
+                               i, _spd_y, _ta_y, _ts_y))
+                    _ppmac.write(msg)
+                _sleep(0.1)
+                _ppmac.read()
 
             # Checks fiducialization parameters
             # xa_comp_pos = int(_ppmac.query_motor_param(2, 'CompPos'))
@@ -438,11 +459,11 @@ class PpmacWidget(_QWidget):
             _home6 = self.cfg.home_offset6
             _msg = 'Motor[7].HomeOffset={0};Motor[8].HomeOffset={1}'.format(
                 _home5, _home6)
-#             with _ppmac.lock_ppmac:
-            _ppmac.write(_msg)
-            _ppmac.write('enable plc HomeA')
-            _sleep(0.1)
-            _ppmac.read()
+            with _ppmac.lock_ppmac:
+                _ppmac.write(_msg)
+                _ppmac.write('enable plc HomeA')
+                _sleep(0.1)
+                _ppmac.read()
             _sleep(3)
             while (all([not _ppmac.motor_homed(5),
                         not _ppmac.motor_homed(6)])):
@@ -510,11 +531,11 @@ class PpmacWidget(_QWidget):
                 # Clears fiducialization offsets
                 _ppmac.set_motor_param(2, 'CompPos', 0)
                 _ppmac.set_motor_param(4, 'CompPos', 0)
-    #             with _ppmac.lock_ppmac:
-                _ppmac.write('#2,4j/')
-                _ppmac.write('enable plc HomeX')
-                _sleep(0.1)
-                _ppmac.read()
+                with _ppmac.lock_ppmac:
+                    _ppmac.write('#2,4j/')
+                    _ppmac.write('enable plc HomeX')
+                    _sleep(0.1)
+                    _ppmac.read()
                 _sleep(3)
 
                 xactualstep += 1
@@ -644,11 +665,11 @@ class PpmacWidget(_QWidget):
                     self.stop_motors()
                     raise RuntimeError('Homing Aborted')
 
-    #             with _ppmac.lock_ppmac:
-                _ppmac.write('#1,3j/')
-                _ppmac.write('enable plc HomeY')
-                _sleep(0.1)
-                _ppmac.read()
+                with _ppmac.lock_ppmac:
+                    _ppmac.write('#1,3j/')
+                    _ppmac.write('enable plc HomeY')
+                    _sleep(0.1)
+                    _ppmac.read()
                 _sleep(3)
 
                 yactualstep += 1
@@ -731,13 +752,13 @@ class PpmacWidget(_QWidget):
                 _mode = '='
             else:
                 _mode = '^'
-#             with _ppmac.lock_ppmac:
             self.update_flag = False
             self.timer.stop()
-            _ppmac.write('#5j' + _mode + str(_steps[0]) +
-                         ';#6j' + _mode + str(_steps[1]))
-            _sleep(0.1)
-            _ppmac.read()
+            with _ppmac.lock_ppmac:
+                _ppmac.write('#5j' + _mode + str(_steps[0]) +
+                             ';#6j' + _mode + str(_steps[1]))
+                _sleep(0.1)
+                _ppmac.read()
             self.update_flag = True
             self.timer.start(1000)
         except Exception:
@@ -746,6 +767,7 @@ class PpmacWidget(_QWidget):
             self.update_flag = True
             self.timer.start(1000)
 
+    @_traced('move')
     def move_x(self, position, absolute=True, motor=None, m_mode=1):
         """Move X motors and returns only after they stop.
 
@@ -787,11 +809,12 @@ class PpmacWidget(_QWidget):
             if not (motor in [2, 4]):
                 if m_mode == 1:
                     # Normal operating mode
-                    _ppmac.write('#1,3,5,6k')
-                    _ppmac.write('#2,4j/')
-                    _msg_x = '#2,4j' + _mode + str(_pos_x)
-                    _ppmac.write(_msg_x)
-                    _ppmac.read()
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#1,3,5,6k')
+                        _ppmac.write('#2,4j/')
+                        _msg_x = '#2,4j' + _mode + str(_pos_x)
+                        _ppmac.write(_msg_x)
+                        _ppmac.read()
                 elif m_mode == 2:
                     # Only configures the motor
                     _ppmac.set_motor_param(2, 'ProgJogPos', _pos_x)
@@ -811,11 +834,12 @@ class PpmacWidget(_QWidget):
                         _ppmac.read_motor_pos([2, 4])*self.cfg.x_sf
 
                     # Triggers movement with previously configured steps
-                    _ppmac.write('#1,3,5,6k')
-                    _ppmac.write('#2,4j/')
-                    _msg_x = '#2,4j{0}*'.format(_mode)
-                    _ppmac.write(_msg_x)
-                    _ppmac.read()
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#1,3,5,6k')
+                        _ppmac.write('#2,4j/')
+                        _msg_x = '#2,4j{0}*'.format(_mode)
+                        _ppmac.write(_msg_x)
+                        _ppmac.read()
 
                     # reads setpoints [mm]
                     _sp_pos_m2 = self.cfg.x_sf*int(
@@ -844,11 +868,8 @@ class PpmacWidget(_QWidget):
                     _delta_m2 = abs(_limit_m2 - _initial_pos_m2)
                     _delta_m4 = abs(_limit_m4 - _initial_pos_m4)
 
-                _sleep(0.2)
-
-                while (not all([self.ppmac.motor_stopped(2),
-                                self.ppmac.motor_stopped(4)])):
-                    self.pos = _ppmac.read_motor_pos([1, 2, 3, 4, 7, 8])
+                def _check_motion(status):
+                    self.pos = self.read_positions([1, 2, 3, 4, 7, 8])
                     self.update_position()
                     if m_mode == 3:
                         # checks if the stages are not out of bounds:
@@ -871,14 +892,11 @@ class PpmacWidget(_QWidget):
                             print(_pos_x, _rb_sp_m2, _rb_sp_m4)
                             raise RuntimeError('move_x: positions out of '
                                                'limits. Motors stopped.')
-                    _sleep(0.1)
 
-                if not any([_ppmac.motor_fault(2),
-                            _ppmac.motor_fault(4),
-                            _ppmac.motor_limits(2),
-                            _ppmac.motor_limits(4),
-                            _ppmac.motor_fefatal(2),
-                            _ppmac.motor_fefatal(4)]):
+                _result = _ppmac.wait_in_position(
+                    [2, 4], interval=self.motion_poll_interval,
+                    callback=_check_motion)
+                if _result.reached:
                     _status = True
 
             else:
@@ -889,11 +907,12 @@ class PpmacWidget(_QWidget):
                 # _ppmac.read()
                 if m_mode == 1:
                     # Normal operating mode
-                    _ppmac.write('#1,3,5,6k')
-                    _ppmac.write('#{0}j/'.format(motor))
-                    _msg_x = '#{0}j'.format(motor) + _mode + str(_pos_x)
-                    _ppmac.write(_msg_x)
-                    _ppmac.read()
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#1,3,5,6k')
+                        _ppmac.write('#{0}j/'.format(motor))
+                        _msg_x = '#{0}j'.format(motor) + _mode + str(_pos_x)
+                        _ppmac.write(_msg_x)
+                        _ppmac.read()
                 elif m_mode == 2:
                     # Only configures the motor
                     _ppmac.set_motor_param(2, 'ProgJogPos', _pos_x)
@@ -909,19 +928,21 @@ class PpmacWidget(_QWidget):
                     return True
                 elif m_mode == 3:
                     # Triggers movement with previously configured steps
-                    _ppmac.write('#1,3,5,6k')
-                    _ppmac.write('#2,4j/')
-                    _msg_x = '#{0}j{1}*'.format(motor, _mode)
-                    _ppmac.write(_msg_x)
-                    _ppmac.read()
-
-                _sleep(0.2)
-                while not self.ppmac.motor_stopped(motor):
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#1,3,5,6k')
+                        _ppmac.write('#2,4j/')
+                        _msg_x = '#{0}j{1}*'.format(motor, _mode)
+                        _ppmac.write(_msg_x)
+                        _ppmac.read()
+
+                def _update_position(status):
                     self.update_flag = True
                     self.update_position()
-                    _sleep(0.5)
 
-                if not _ppmac.motor_fault(motor):
+                _result = _ppmac.wait_in_position(
+                    [motor], interval=self.motion_poll_interval,
+                    callback=_update_position)
+                if not any([_result.faulted, _result.aborted]):
                     _status = True
 
             if _status:
@@ -941,6 +962,7 @@ class PpmacWidget(_QWidget):
             self.timer.start(1000)
             return False
 
+    @_traced('move')
     def move_y(self, position, absolute=True, motor=None, m_mode=1):
         """Move Y motors and returns only after they stop.
 
@@ -982,11 +1004,12 @@ class PpmacWidget(_QWidget):
             if not (motor in [1, 3]):
                 if m_mode == 1:
                     # Normal operating mode
-                    _ppmac.write('#2,4,5,6k')
-                    _ppmac.write('#1,3j/')
-                    _msg_y = '#1,3j' + _mode + str(_pos_y)
-                    _ppmac.write(_msg_y)
-                    _ppmac.read()
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#2,4,5,6k')
+                        _ppmac.write('#1,3j/')
+                        _msg_y = '#1,3j' + _mode + str(_pos_y)
+                        _ppmac.write(_msg_y)
+                        _ppmac.read()
                 elif m_mode == 2:
                     # Only configures the motor
                     _ppmac.set_motor_param(1, 'ProgJogPos', _pos_y)
@@ -1006,11 +1029,12 @@ class PpmacWidget(_QWidget):
                         _ppmac.read_motor_pos([1, 3])*self.cfg.x_sf
 
                     # Triggers movement with previously configured steps
-                    _ppmac.write('#2,4,5,6k')
-                    _ppmac.write('#1,3j/')
-                    _msg_y = '#1,3j{0}*'.format(_mode)
-                    _ppmac.write(_msg_y)
-                    _ppmac.read()
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#2,4,5,6k')
+                        _ppmac.write('#1,3j/')
+                        _msg_y = '#1,3j{0}*'.format(_mode)
+                        _ppmac.write(_msg_y)
+                        _ppmac.read()
 
                     # reads setpoints [mm]
                     _sp_pos_m1 = self.cfg.x_sf*int(
@@ -1039,10 +1063,8 @@ class PpmacWidget(_QWidget):
                     _delta_m1 = abs(_limit_m1 - _initial_pos_m1)
                     _delta_m3 = abs(_limit_m3 - _initial_pos_m3)
 
-                _sleep(0.2)
-                while (not all([self.ppmac.motor_stopped(1),
-                                self.ppmac.motor_stopped(3)])):
-                    self.pos = _ppmac.read_motor_pos([1, 2, 3, 4])
+                def _check_motion(status):
+                    self.pos = self.read_positions([1, 2, 3, 4])
                     self.update_position()
                     if m_mode == 3:
                         # checks if the stages are not out of bounds:
@@ -1065,14 +1087,11 @@ class PpmacWidget(_QWidget):
                             print(_pos_y, _rb_sp_m1, _rb_sp_m3)
                             raise RuntimeError('move_y: positions out of '
                                                'limits. Motors stopped.')
-                    _sleep(0.1)
 
-                if not any([_ppmac.motor_fault(1),
-                            _ppmac.motor_fault(3),
-                            _ppmac.motor_limits(1),
-                            _ppmac.motor_limits(3),
-                            _ppmac.motor_fefatal(1),
-                            _ppmac.motor_fefatal(3)]):
+                _result = _ppmac.wait_in_position(
+                    [1, 3], interval=self.motion_poll_interval,
+                    callback=_check_motion)
+                if _result.reached:
                     _status = True
 
             else:
@@ -1083,11 +1102,12 @@ class PpmacWidget(_QWidget):
                 # _ppmac.read()
                 if m_mode == 1:
                     # Normal operating mode
-                    _ppmac.write('#2,4,5,6k')
-                    _ppmac.write('#{0}j/'.format(motor))
-                    _msg_y = '#{0}j'.format(motor) + _mode + str(_pos_y)
-                    _ppmac.write(_msg_y)
-                    _ppmac.read()
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#2,4,5,6k')
+                        _ppmac.write('#{0}j/'.format(motor))
+                        _msg_y = '#{0}j'.format(motor) + _mode + str(_pos_y)
+                        _ppmac.write(_msg_y)
+                        _ppmac.read()
                 elif m_mode == 2:
                     # Only configures the motor
                     _ppmac.set_motor_param(1, 'ProgJogPos', _pos_y)
@@ -1103,19 +1123,21 @@ class PpmacWidget(_QWidget):
                     return True
                 elif m_mode == 3:
                     # Triggers movement with previously configured steps
-                    _ppmac.write('#2,4,5,6k')
-                    _ppmac.write('#1,3j/')
-                    _msg_y = '#{0}j{1}*'.format(motor, _mode)
-                    _ppmac.write(_msg_y)
-                    _ppmac.read()
-
-                _sleep(0.2)
-                while not self.ppmac.motor_stopped(motor):
+                    with _ppmac.lock_ppmac:
+                        _ppmac.write('#2,4,5,6k')
+                        _ppmac.write('#1,3j/')
+                        _msg_y = '#{0}j{1}*'.format(motor, _mode)
+                        _ppmac.write(_msg_y)
+                        _ppmac.read()
+
+                def _update_position(status):
                     self.update_flag = True
                     self.update_position()
-                    _sleep(0.5)
 
-                if not _ppmac.motor_fault(motor):
+                _result = _ppmac.wait_in_position(
+                    [motor], interval=self.motion_poll_interval,
+                    callback=_update_position)
+                if not any([_result.faulted, _result.aborted]):
                     _status = True
 
             if _status:
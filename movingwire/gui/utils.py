@@ -9,7 +9,6 @@ import time as _time
 import sqlite3 as _sqlite3
 import os.path as _path
 import traceback as _traceback
-import json as _json
 # import pyqtgraph as _pyqtgraph
 from qtpy.QtGui import (
     QFont as _QFont,
@@ -19,7 +18,23 @@ from qtpy.QtGui import (
 from qtpy.QtWidgets import (
     QApplication as _QApplication,
     )
-from qtpy.QtCore import QSize as _QSize
+from qtpy.QtCore import (
+    QSize as _QSize,
+    QThread as _QThread,
+    )
+
+from movingwire.data import arraycodec as _arraycodec
+from movingwire.data import summary as _data_summary
+from movingwire.data.loaders import (
+    MEAS_TABLES,
+    MAP_COLUMNS,
+    create_db_indexes,
+    pandas_load_db_table,
+    pandas_load_db_measurements,
+    pandas_load_map_measurements,
+    select_id_range,
+    pandas_load_db_maps,
+    )
 
 
 # GUI configurations
@@ -31,6 +46,9 @@ ICON_SIZE = 24
 DATABASE_NAME = 'moving_wire_measurements.db'
 MONGO = False
 SERVER = 'localhost'
+MONITOR_INTERVAL = 0.2  # ppmac position and status polling interval [s]
+GATHER_POSITIONS = False  # gather the motor positions of each sweep
+HARDWARE_TRIGGER = False  # start the sweeps with the ppmac compare output
 UPDATE_POSITIONS_INTERVAL = 0.5  # [s]
 UPDATE_PLOT_INTERVAL = 0.1  # [s]
 TABLE_NUMBER_ROWS = 1000
@@ -120,9 +138,16 @@ def get_value_from_string(text):
 def sleep(time):
     """Halts the program while processing UI events.
 
+    UI events are only processed from the GUI thread, other threads (e.g.
+    the measurement engine workers) just sleep.
+
     Args:
         time (float): time to halt the program in seconds."""
     try:
+        _app = _QApplication.instance()
+        if _app is None or _app.thread() != _QThread.currentThread():
+            _time.sleep(max(time, 0))
+            return
         _dt = 0.02
         _tf = _time.time() + time
         while _time.time() < _tf:
@@ -132,6 +157,23 @@ def sleep(time):
         _traceback.print_exc(file=_sys.stdout)
 
 
+def show_estimate(label, estimate):
+    """Shows a run time estimate on a label.
+
+    Args:
+        label (QLabel): label showing the total and finish times, with the
+                        phase breakdown as tool tip;
+        estimate (Estimate): run time estimate (see engine.estimator),
+                             None if unknown.
+    """
+    if estimate is None:
+        label.setText('Estimated time: -')
+        label.setToolTip('')
+    else:
+        label.setText('Estimated time: ' + estimate.describe())
+        label.setToolTip(estimate.format())
+
+
 def update_db_name_list(db, cmb):
     """Updates a db name list on a combobox.
 
@@ -144,11 +186,19 @@ def update_db_name_list(db, cmb):
             database_name=_QApplication.instance().database_name,
             mongo=_QApplication.instance().mongo,
             server=_QApplication.instance().server)
-        names = db.db_get_values('name')
+        # measurement documents are listed from the summary table, with
+        # their ids as item data
+        _summary = _data_summary.names(db)
+        if _summary is not None:
+            names, ids = _summary
+        else:
+            names = db.db_get_values('name')
+            ids = [None]*len(names)
 
         current_text = cmb.currentText()
         cmb.clear()
-        cmb.addItems([name for name in names])
+        for name, idn in zip(names, ids):
+            cmb.addItem(name, idn)
         if len(current_text) == 0:
             cmb.setCurrentIndex(cmb.count()-1)
         else:
@@ -320,35 +370,7 @@ def table_to_data_frame(table):
     return df
 
 
-def pandas_load_db_measurements():
-    """Loads Database measurements using pandas.
-
-    Returns:
-        meas_I1 (pd.DataFrame): DataFrame containing sw I1 measurements;
-        meas_I2 (pd.DataFrame): DataFrame containing sw I2 measurements.
-    """
-
-    con = _sqlite3.connect('moving_wire_measurements.db')
-    meas_I1 = _pd.read_sql('SELECT * from measurements_sw_I1', con)
-    meas_I2 = _pd.read_sql('SELECT * from measurements_sw_I2', con)
-    con.close()
-    return meas_I1, meas_I2
-
-
-def pandas_load_db_maps():
-    """Loads Database measurements using pandas.
-
-    Returns:
-        maps (pd.DataFrame): DataFrame containing field integral maps data.
-    """
-
-    con = _sqlite3.connect('moving_wire_measurements.db')
-    maps = _pd.read_sql('SELECT * from integral_maps', con)
-    con.close()
-    return maps
-
-
 def json_to_array(value):
-    """Returns a numpy array from a json entry."""
-    array = _np.array(_json.loads(value))
+    """Returns a numpy array from a json or array codec entry."""
+    array = _arraycodec.decode(value)
     return array
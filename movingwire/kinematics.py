@@ -0,0 +1,91 @@
+"""Jerk limited point to point moves.
+
+The acceleration rises at the jerk limit, stays at the acceleration limit
+(if the speed is high enough to reach it) and falls back to zero; the
+deceleration ramp mirrors it. Moves too short to reach the maximum speed
+peak at a lower speed with no cruise. The same model gives the move
+times of the run estimates (engine.planner) and the trajectories of the
+simulated controller (simulation.ppmac), so both agree.
+
+Limits that are None or not positive are unlimited. Distances, speeds,
+accelerations and jerks may be in any consistent units, e.g. mm, mm/s,
+mm/s^2 and mm/s^3.
+"""
+
+import numpy as _np
+
+
+def _limit(value):
+    return value if value is not None and value > 0 else _np.inf
+
+
+def ramp_time(speed, accel=None, jerk=None):
+    """Returns the duration of the ramp from rest to speed [s]."""
+    accel = _limit(accel)
+    jerk = _limit(jerk)
+    if speed*jerk < accel**2:
+        return 2*_np.sqrt(speed/jerk)
+    return speed/accel + (accel/jerk if _np.isfinite(accel) else 0.0)
+
+
+def ramp_distance(t, speed, accel=None, jerk=None):
+    """Returns the distance covered t seconds into the ramp from rest to
+    speed, clipped to the ramp duration."""
+    _ramp = ramp_time(speed, accel, jerk)
+    t = min(max(t, 0), _ramp)
+    if _ramp == 0:
+        return 0.0
+    if t > _ramp/2:
+        # the velocity is point symmetric about the middle of the ramp
+        return speed*(t - _ramp/2) + ramp_distance(
+            _ramp - t, speed, accel, jerk)
+    accel = _limit(accel)
+    jerk = _limit(jerk)
+    if not _np.isfinite(jerk):
+        return accel*t**2/2
+    # duration of the rising acceleration phase
+    _tj = min(_np.sqrt(speed/jerk), accel/jerk)
+    if t <= _tj:
+        return jerk*t**3/6
+    _peak = jerk*_tj
+    return (jerk*_tj**3/6 + _peak*_tj/2*(t - _tj) +
+            _peak*(t - _tj)**2/2)
+
+
+def peak_speed(distance, speed, accel=None, jerk=None):
+    """Returns the peak speed of a move, lower than speed on moves too
+    short to reach it."""
+    distance = abs(distance)
+    # the ramp distance (from rest to v and back) is v*ramp_time(v)
+    if speed*ramp_time(speed, accel, jerk) <= distance:
+        return speed
+    _low, _high = 0.0, speed
+    for _ in range(60):
+        _v = (_low + _high)/2
+        if _v*ramp_time(_v, accel, jerk) > distance:
+            _high = _v
+        else:
+            _low = _v
+    return _low
+
+
+def move_time(distance, speed, accel=None, jerk=None):
+    """Returns the duration of a jerk limited point to point move.
+
+    Args:
+        distance (float): move distance [mm];
+        speed (float): maximum speed [mm/s];
+        accel (float): maximum acceleration [mm/s^2], unlimited if None or
+                       not positive;
+        jerk (float): maximum jerk [mm/s^3], unlimited if None or not
+                      positive.
+    Returns:
+        move duration [s].
+    """
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+    _v = peak_speed(distance, speed, accel, jerk)
+    if _v <= 0:
+        return 0.0
+    return distance/_v + ramp_time(_v, accel, jerk)
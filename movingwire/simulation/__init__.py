@@ -0,0 +1,4 @@
+"""Simulated instruments for offline tests and benchmarks."""
+
+from . import ppmac
+from . import instruments
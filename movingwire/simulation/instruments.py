@@ -0,0 +1,401 @@
+"""Simulated Agilent 3458A and 34970A GPIB instruments.
+
+The simulators replace the GPIB resource (the inst attribute) of the
+devices.Multimeter and devices.MultiChannel objects and accept the
+commands sent by the application. Multimeter readings are generated from a
+field model when they become due, with one reading every NPLC/60 s after
+TRIG SGL, or after the first external trigger edge following TRIG EXT, so
+MCOUNT? and the memory transfers follow the real timing.
+
+Usage:
+    from movingwire.devices import ppmac, volt
+    from movingwire.simulation import ppmac as sim_ppmac
+    from movingwire.simulation import instruments as sim
+
+    server = sim_ppmac.start_server()
+    sim_ppmac.attach(ppmac, server.address)
+    field = sim.FieldModel(I1=100e-6, gain=100, turns=1,
+                           motion=sim.StageMotion(server.controller, 'Y'))
+    sim.attach(volt, sim.Multimeter3458A(
+        field, trigger=server.controller.trigger_time))
+"""
+
+import re as _re
+import time as _time
+import threading as _threading
+import numpy as _np
+
+
+class PulseMotion():
+    """Wire motion without a motion simulator.
+
+    Both wire ends move step [m] with a smooth velocity pulse starting
+    delay [s] after each trigger, alternating the direction (forward and
+    backward sweeps).
+    """
+
+    def __init__(self, step=1e-3, delay=1, duration=1):
+        self.step = step
+        self.delay = delay
+        self.duration = duration
+
+    def __call__(self, t, t_trigger, trigger_count):
+        _u = _np.clip((t - t_trigger - self.delay)/self.duration, 0, 1)
+        _x = self.step*(3*_u**2 - 2*_u**3)
+        if trigger_count % 2 == 1:
+            _x = self.step - _x
+        return _x, _x
+
+
+class StageMotion():
+    """Wire end positions read from a simulated PPMAC controller."""
+
+    def __init__(self, controller, axis='Y', scale=1e-6, motors=None):
+        """Create the motion source.
+
+        Args:
+            controller (simulation.ppmac.Controller): simulated controller;
+            axis (str): 'X' (motors 2 and 4) or 'Y' (motors 1 and 3);
+            scale (float): motor count size [m];
+            motors (list): (a, b) wire end motors, overrides axis.
+        """
+        self.controller = controller
+        self.scale = scale
+        if motors is None:
+            motors = [2, 4] if axis.upper() == 'X' else [1, 3]
+        self.motors = [controller.motors[m] for m in motors]
+
+    def __call__(self, t, t_trigger, trigger_count):
+        return tuple(
+            _np.array([m.position_at(_t) for _t in _np.atleast_1d(t)])*
+            self.scale for m in self.motors)
+
+
+class FieldModel():
+    """Stretched wire induced voltage.
+
+    The flux linked by a wire with ends at xa (z=0) and xb (z=length) is
+    xb*I1 - (xb - xa)*I2/length, so moving both ends gives I1 and moving
+    only the a end gives I2, as in integrals.integral_calculus_sw. The
+    reading is the integrator output averaged over each reading interval,
+    plus offset, drift and gaussian noise.
+    """
+
+    def __init__(self, I1=100e-6, I2=0, length=1, gain=100, turns=1,
+                 offset=0, drift=0, noise=1e-7, motion=None, seed=None):
+        """Create the model.
+
+        Args:
+            I1 (float): first field integral [T.m];
+            I2 (float): second field integral [T.m2];
+            length (float): wire length [m];
+            gain (float): integrator gain;
+            turns (float): number of wire turns;
+            offset (float): voltage offset [V];
+            drift (float): voltage drift [V/s];
+            noise (float): voltage noise standard deviation [V];
+            motion (function): wire end positions (xa, xb) [m] as a function
+                               of (time, trigger time, trigger count), a
+                               PulseMotion if None;
+            seed (int): noise random seed.
+        """
+        self.I1 = I1
+        self.I2 = I2
+        self.length = length
+        self.gain = gain
+        self.turns = turns
+        self.offset = offset
+        self.drift = drift
+        self.noise = noise
+        self.motion = motion or PulseMotion()
+        self.random = _np.random.default_rng(seed)
+
+    def flux(self, t, t_trigger, trigger_count):
+        _xa, _xb = self.motion(t, t_trigger, trigger_count)
+        return _xb*self.I1 - (_xb - _xa)*self.I2/self.length
+
+    def readings(self, t_start, dt, t_trigger, trigger_count):
+        """Returns the readings integrated in [t_start + k*dt,
+        t_start + (k + 1)*dt] for k = 0 ... len(t_start) - 1."""
+        _t = _np.append(t_start, t_start[-1] + dt) if len(t_start) else []
+        if len(_t) == 0:
+            return _np.array([])
+        _flux = _np.asarray(self.flux(_t, t_trigger, trigger_count), float)
+        _v = self.gain*self.turns*_np.diff(_flux)/dt
+        _v = _v + self.offset + self.drift*(t_start - t_trigger)
+        if self.noise:
+            _v = _v + self.random.normal(0, self.noise, len(_v))
+        return _v
+
+
+class Multimeter3458A():
+    """Agilent 3458A GPIB resource simulator."""
+
+    def __init__(self, field=None, resistance=1000, mains=60, trigger=None):
+        """Create the simulator.
+
+        Args:
+            field (FieldModel): voltage model, a FieldModel if None;
+            resistance (float): OHM readings [ohm];
+            mains (float): power line frequency [Hz];
+            trigger (function): external trigger, returns the first edge
+                                time at or after a time [s] or None (e.g.
+                                simulation.ppmac.Controller.trigger_time).
+        """
+        self.field = field or FieldModel()
+        self.resistance = resistance
+        self.mains = mains
+        self.trigger = trigger
+        self.timeout = 10000
+        self.nplc = 1
+        self.nrdgs = 1
+        self.function = 'DCV'
+        self.binary = False
+        self.commands = []
+        self.trigger_count = -1
+        self._t_trigger = None
+        self._t_armed = None  # TRIG EXT time
+        self._readings = _np.array([])
+        self._output = []
+        self._lock = _threading.Lock()
+
+    @property
+    def interval(self):
+        """Reading interval [s]."""
+        return self.nplc/self.mains
+
+    def _update(self):
+        _now = _time.monotonic()
+        if self._t_armed is not None and self.trigger is not None:
+            _edge = self.trigger(self._t_armed)
+            if _edge is not None and _edge <= _now:
+                self.trigger_count += 1
+                self._t_trigger = _edge
+                self._t_armed = None
+        if self._t_trigger is None:
+            return
+        _count = int((_now - self._t_trigger)//self.interval)
+        _count = min(_count, self.nrdgs)
+        _n = len(self._readings)
+        if _count <= _n:
+            return
+        _t = self._t_trigger + _np.arange(_n, _count)*self.interval
+        if self.function == 'OHM':
+            _new = self.resistance + self.field.random.normal(
+                0, self.resistance*1e-6, _count - _n)
+        else:
+            _new = self.field.readings(_t, self.interval, self._t_trigger,
+                                       self.trigger_count)
+        self._readings = _np.concatenate([self._readings, _new])
+
+    def write(self, command):
+        with self._lock:
+            for cmd in [c.strip() for c in command.split(';')]:
+                if cmd != '':
+                    self.commands.append(cmd)
+                    self._execute(cmd.upper())
+        return len(command)
+
+    def _execute(self, cmd):
+        _args = cmd.replace(',', ' ').split()
+        _name = _args[0]
+        if _name == 'NPLC':
+            self.nplc = float(_args[1])
+        elif _name == 'APER':
+            self.nplc = float(_args[1])*self.mains
+        elif _name == 'NRDGS':
+            self.nrdgs = int(float(_args[1]))
+        elif _name in ['DCV', 'OHM', 'OHMF']:
+            self.function = 'OHM' if _name.startswith('OHM') else 'DCV'
+        elif _name == 'FUNC':
+            self.function = 'OHM' if _args[1].startswith('OHM') else 'DCV'
+        elif _name in ['OFORMAT', 'DREAL', 'SREAL', 'ASCII']:
+            self.binary = 'REAL' in cmd
+        elif _name == 'TRIG':
+            if _args[1] == 'SGL':
+                self.trigger_count += 1
+                self._t_trigger = _time.monotonic()
+                self._t_armed = None
+                self._readings = _np.array([])
+            elif _args[1] == 'EXT':
+                self._t_trigger = None
+                self._t_armed = _time.monotonic()
+                self._readings = _np.array([])
+            elif _args[1] == 'HOLD':
+                self._update()
+                self._t_trigger = None
+                self._t_armed = None
+        elif _name in ['MCOUNT?', 'MCOUNT']:
+            self._update()
+            self._output.append('{0}\r\n'.format(len(self._readings)))
+        elif _name == 'RMEM':
+            self._update()
+            _first = int(_args[1]) if len(_args) > 1 else 1
+            _count = int(_args[2]) if len(_args) > 2 else 1
+            # most recent reading first
+            _values = self._readings[::-1][_first - 1:_first - 1 + _count]
+            if self.binary:
+                self._output.append(_values.astype('>f8').tobytes())
+            else:
+                self._output.append(
+                    ','.join('{0:.9E}'.format(v) for v in _values) + '\r\n')
+        elif _name in ['ERR?', 'ERRSTR?']:
+            self._output.append('0\r\n')
+        elif _name in ['ID?', '*IDN?']:
+            self._output.append('HP3458A\r\n')
+        elif _name == 'RESET':
+            self._t_trigger = None
+            self._t_armed = None
+            self._readings = _np.array([])
+
+    def _pop(self):
+        with self._lock:
+            if len(self._output) == 0:
+                raise TimeoutError('No 3458A output to read.')
+            return self._output.pop(0)
+
+    def read_bytes(self, nbytes):
+        _data = self._pop()
+        if isinstance(_data, str):
+            _data = _data.encode('ascii')
+        return _data[:nbytes]
+
+    def read_raw(self):
+        return self.read_bytes(-1)
+
+    def read(self, termination=None):
+        _data = self._pop()
+        if isinstance(_data, bytes):
+            _values = _np.frombuffer(_data, dtype='>f8')
+            _data = ','.join('{0:.9E}'.format(v) for v in _values) + '\r\n'
+        return _data
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def clear(self):
+        with self._lock:
+            self._output = []
+
+    def close(self):
+        pass
+
+
+class MultiChannel34970A():
+    """Agilent 34970A GPIB resource simulator (temperature and voltage
+    scans)."""
+
+    _channels = _re.compile(r'\(@([\d:,]+)\)')
+
+    def __init__(self, temperature=23.0, voltage=0.0, channel_time=0.02,
+                 noise=0.01, seed=None):
+        """Create the simulator.
+
+        Args:
+            temperature (float or function): RTD channel temperature [degC],
+                                             or a function of (channel,
+                                             time);
+            voltage (float or function): DC voltage channel value [V], or a
+                                         function of (channel, time);
+            channel_time (float): scan time per channel [s];
+            noise (float): temperature noise standard deviation [degC];
+            seed (int): noise random seed.
+        """
+        self.temperature = temperature
+        self.voltage = voltage
+        self.channel_time = channel_time
+        self.noise = noise
+        self.random = _np.random.default_rng(seed)
+        self.timeout = 10000
+        self.functions = {}
+        self.scan = []
+        self.commands = []
+        self._output = []
+        self._lock = _threading.Lock()
+
+    @classmethod
+    def channel_list(cls, text):
+        """Returns the channels of a '(@101:103,105)' list."""
+        _channels = []
+        for _match in cls._channels.finditer(text):
+            for item in _match.group(1).split(','):
+                if ':' in item:
+                    _first, _last = item.split(':')
+                    _channels.extend(range(int(_first), int(_last) + 1))
+                elif item != '':
+                    _channels.append(int(item))
+        return _channels
+
+    def _value(self, source, channel, t):
+        return source(channel, t) if callable(source) else source
+
+    def write(self, command):
+        with self._lock:
+            self.commands.append(command)
+            _cmd = command.strip().upper()
+            if _cmd in ['*RST', '*CLS']:
+                if _cmd == '*RST':
+                    self.functions = {}
+                    self.scan = []
+                self._output = []
+            elif _cmd.startswith(':CONF') or _cmd.startswith('CONF'):
+                for _part in _cmd.split(';'):
+                    _func = 'TEMP' if 'TEMP' in _part else 'VOLT'
+                    for _ch in self.channel_list(_part):
+                        self.functions[_ch] = _func
+            elif 'ROUT:SCAN' in _cmd:
+                self.scan = self.channel_list(_cmd)
+            elif _cmd in [':READ?', 'READ?']:
+                _channels = self.scan or sorted(self.functions)
+                _ready = (_time.monotonic() +
+                          self.channel_time*len(_channels))
+                self._output.append((_ready, _channels))
+            elif _cmd in ['*IDN?']:
+                self._output.append((0, 'HEWLETT-PACKARD,34970A'))
+        return len(command)
+
+    def read(self, termination=None):
+        with self._lock:
+            if len(self._output) == 0:
+                raise TimeoutError('No 34970A output to read.')
+            _ready, _data = self._output.pop(0)
+        _wait = _ready - _time.monotonic()
+        if _wait > 0:
+            _time.sleep(_wait)
+        if isinstance(_data, str):
+            return _data + '\n'
+        _t = _time.monotonic()
+        _values = []
+        for _ch in _data:
+            if self.functions.get(_ch, 'VOLT') == 'TEMP':
+                _values.append(self._value(self.temperature, _ch, _t) +
+                               self.random.normal(0, self.noise))
+            else:
+                _values.append(self._value(self.voltage, _ch, _t))
+        return ','.join('{0:+.8E}'.format(v) for v in _values) + '\n'
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def clear(self):
+        with self._lock:
+            self._output = []
+
+    def close(self):
+        pass
+
+
+def attach(device, backend):
+    """Replaces the GPIB resource of a device by a simulator.
+
+    Args:
+        device (devices.Multimeter or devices.MultiChannel): device, e.g.
+                                                             devices.volt;
+        backend (Multimeter3458A or MultiChannel34970A): simulator.
+    Returns:
+        backend.
+    """
+    device.inst = backend
+    return backend
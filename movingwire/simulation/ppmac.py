@@ -0,0 +1,684 @@
+"""Simulated Power PMAC controller.
+
+Serves the subset of the gpascii text protocol used by the application
+over TCP, so the motion code can run (and be benchmarked) without the
+bench:
+
+    #1,3p  #1..4k  #2,4j/  #5j=1000  #5j^-200  #1j=*  #1hmz  #1j+
+    Motor[1].JogSpeed  Motor[1].JogSpeed=10  Motor1Homed  motionFlag
+    &1Xp  enable plc HomeX  disable plc HomeX
+    PowerBrick[0].Chan[2].CompA=((Motor[3].HomePos+1000)%1048576)*4096
+
+Several commands may be sent in one line separated by semicolons. The
+reply of each line is the command echo and the output lines, terminated by
+an ACK (0x06) character, as read by devices.Ppmac.read_reply.
+
+Moves follow the jerk limited profile of the run estimates (see
+movingwire.kinematics) built from the motor JogSpeed [counts/ms], JogTa
+and JogTs parameters. Software limits, amplifier and following error
+faults can be set on each motor.
+
+The position compare registers of the PowerBrick channels (channel n - 1
+of motor n) record the times their EQU outputs toggle, which the simulated
+multimeter reads as external trigger edges (see Controller.trigger_time).
+
+Usage:
+    python -m movingwire.simulation.ppmac [--port 5050] [--latency 0.002]
+
+    from movingwire.devices import ppmac
+    from movingwire.simulation import ppmac as sim
+    server = sim.start_server(latency=0.002)
+    sim.attach(ppmac, server.address)
+"""
+
+import re as _re
+import sys as _sys
+import time as _time
+import queue as _queue
+import select as _select
+import socket as _socket
+import argparse as _argparse
+import threading as _threading
+import collections as _collections
+import socketserver as _socketserver
+import numpy as _np
+
+from movingwire import kinematics as _kinematics
+
+
+ACK = '\x06'
+
+# motor parameters and their initial values
+MOTOR_PARAMS = {
+    'AmpFault': 0, 'LimitStop': 0, 'PlusLimit': 0, 'MinusLimit': 0,
+    'DesVelZero': 1, 'InPos': 1, 'JogSpeed': 10.0, 'JogTa': 100.0,
+    'JogTs': 50.0, 'BlSize': 0, 'BlSlewRate': 0, 'HomeOffset': 0,
+    'AmpFaultLevel': 1, 'FeFatal': 0, 'ProgJogPos': 0, 'CompPos': 0,
+    'AmpEna': 0, 'MaxPos': 1e9, 'MinPos': -1e9, 'HomePos': 0,
+    }
+
+# position compare registers: counts modulo 2^20 with 12 fractional bits
+COMPARE_MODULUS = 1048576
+COMPARE_FRACTION = 4096
+
+# coordinate system axes: motors averaged by &<cs><axis>p
+AXES = {'X': [2, 4], 'Y': [1, 3], 'A': [5], 'B': [6]}
+
+# homing plcs: motors homed by enable plc <name>
+HOMING_PLCS = {'HomeX': [2, 4], 'HomeY': [1, 3], 'HomeA': [5, 6, 7, 8]}
+
+
+def jog_limits(speed, ta, ts):
+    """Returns the speed [counts/s], acceleration [counts/s^2] and jerk
+    [counts/s^3] of the motor jog parameters.
+
+    Negative JogTa and JogTs are the inverse acceleration [ms^2/count] and
+    inverse jerk [ms^3/count], as set by the application; positive values
+    are the acceleration and s-curve times [ms], zero is unlimited.
+    """
+    speed = max(abs(speed), 1e-9)
+    if ta < 0:
+        _accel = -1/ta
+    elif ta > 0:
+        _accel = speed/ta
+    else:
+        _accel = _np.inf
+    if ts < 0:
+        _jerk = -1/ts
+    elif ts > 0:
+        _jerk = _accel/ts if _np.isfinite(_accel) else speed/ts**2
+    else:
+        _jerk = _np.inf
+    return speed*1e3, _accel*1e6, _jerk*1e9
+
+
+class Profile():
+    """Jerk limited point to point move (see movingwire.kinematics).
+
+    The peak velocity is reduced on moves too short to reach JogSpeed.
+    """
+
+    def __init__(self, start, end, speed, ta, ts, t0):
+        """Create the profile.
+
+        Args:
+            start (float): start position [counts];
+            end (float): end position [counts];
+            speed (float): jog speed [counts/ms];
+            ta (float): acceleration time [ms] or inverse acceleration
+                        [ms^2/count] if negative;
+            ts (float): s-curve time [ms] or inverse jerk [ms^3/count] if
+                        negative;
+            t0 (float): start time [s] (time.monotonic).
+        """
+        self.start = start
+        self.end = end
+        self.t0 = t0
+        _dist = abs(end - start)
+        self.sign = 1 if end >= start else -1
+        _speed, self.accel, self.jerk = jog_limits(speed, ta, ts)
+        self.vmax = _kinematics.peak_speed(
+            _dist, _speed, self.accel, self.jerk)  # [counts/s]
+        self.ramp = _kinematics.ramp_time(
+            self.vmax, self.accel, self.jerk)  # [s]
+        self.duration = _kinematics.move_time(
+            _dist, _speed, self.accel, self.jerk)
+        self.cruise = max(self.duration - 2*self.ramp, 0)
+
+    def _ramp_distance(self, t):
+        return _kinematics.ramp_distance(
+            t, self.vmax, self.accel, self.jerk)
+
+    def position(self, t):
+        """Returns the position at time t [s] (time.monotonic)."""
+        _t = t - self.t0
+        if _t >= self.duration:
+            return self.end
+        _ramp_dist = self.vmax*self.ramp/2
+        if _t <= self.ramp:
+            _d = self._ramp_distance(_t)
+        elif _t <= self.ramp + self.cruise:
+            _d = _ramp_dist + self.vmax*(_t - self.ramp)
+        else:
+            _d = (_ramp_dist + self.vmax*self.cruise +
+                  _ramp_dist - self._ramp_distance(self.duration - _t))
+        return self.start + self.sign*_d
+
+    def done(self, t):
+        return t - self.t0 >= self.duration
+
+    def crossing(self, position):
+        """Returns the time the move passes position, None if it does
+        not."""
+        if any([position is None, self.duration == 0,
+                self.sign*(position - self.start) <= 0,
+                self.sign*(position - self.end) > 0]):
+            return None
+        _low, _high = self.t0, self.t0 + self.duration
+        for _ in range(50):
+            _t = (_low + _high)/2
+            if self.sign*(self.position(_t) - position) < 0:
+                _low = _t
+            else:
+                _high = _t
+        return _high
+
+
+class Motor():
+    """Simulated motor with the Motor[n] parameters used by the app."""
+
+    def __init__(self, number):
+        self.number = number
+        self.params = dict(MOTOR_PARAMS)
+        self.homed = 0
+        self._pos = 0.0
+        self._profile = None
+        self.last_duration = 0  # duration of the last jog profile [s]
+        self.compare = None  # CompareChannel of the motor
+        # (time, profile or None, position) of the last motion changes
+        self.history = _collections.deque(maxlen=64)
+
+    def update(self, t):
+        """Advances the motion to time t [s]."""
+        if self._profile is None:
+            return
+        _pos = self._profile.position(t)
+        _max, _min = self.params['MaxPos'], self.params['MinPos']
+        if _pos >= _max or _pos <= _min:
+            self._pos = min(max(_pos, _min), _max)
+            self.params['LimitStop'] = 1
+            self.params['PlusLimit' if _pos >= _max else 'MinusLimit'] = 1
+            self._stop()
+        elif self._profile.done(t):
+            self._pos = self._profile.end
+            self._stop()
+        else:
+            self._pos = _pos
+
+    def _stop(self):
+        if self._profile is not None:
+            self.history.append((_time.monotonic(), None, self._pos))
+        self._profile = None
+        self.params['DesVelZero'] = 1
+        self.params['InPos'] = 1
+
+    @property
+    def moving(self):
+        return self._profile is not None
+
+    def position(self, t):
+        self.update(t)
+        return self._pos
+
+    def position_at(self, t):
+        """Returns the position at time t [s], also in the recent past
+        (used by the instrument simulators)."""
+        for _t0, _profile, _pos in reversed(self.history):
+            if _t0 <= t:
+                if _profile is None:
+                    return _pos
+                return min(max(_profile.position(t), self.params['MinPos']),
+                           self.params['MaxPos'])
+        return self.history[0][2] if len(self.history) > 0 else self._pos
+
+    def set_position(self, position):
+        self._pos = float(position)
+        self.history.append((_time.monotonic(), None, self._pos))
+
+    def fault(self, kind='AmpFault'):
+        """Sets an amplifier ('AmpFault') or following error ('FeFatal')
+        fault, stopping and disabling the motor."""
+        self.params[kind] = 1
+        self._stop()
+        self.params['AmpEna'] = 0
+
+    def kill(self):
+        self._stop()
+        self.params['AmpEna'] = 0
+
+    def enable(self):
+        """Closes the loop (j/), clearing limit stops away from limits."""
+        if self.params['AmpFault'] or self.params['FeFatal']:
+            return False
+        self._stop()
+        self.params['AmpEna'] = 1
+        if self.params['MinPos'] < self._pos < self.params['MaxPos']:
+            self.params['LimitStop'] = 0
+            self.params['PlusLimit'] = 0
+            self.params['MinusLimit'] = 0
+        return True
+
+    def jog(self, target, t):
+        """Starts a jog to target [counts] at time t [s]."""
+        if self.params['AmpFault'] or self.params['FeFatal']:
+            return False
+        self.update(t)
+        _dir = 1 if target > self._pos else -1
+        if any([_dir > 0 and self.params['PlusLimit'],
+                _dir < 0 and self.params['MinusLimit']]):
+            return False
+        self.params['AmpEna'] = 1
+        self.params['LimitStop'] = 0
+        self.params['DesVelZero'] = 0
+        self.params['InPos'] = 0
+        self._profile = Profile(
+            self._pos, float(target), self.params['JogSpeed'],
+            self.params['JogTa'], self.params['JogTs'], t)
+        self.last_duration = self._profile.duration
+        self.history.append((t, self._profile, self._pos))
+        if self.compare is not None:
+            self.compare.move(self._profile)
+        if self._profile.duration == 0:
+            self._stop()
+        return True
+
+    def jog_to_limit(self, direction, t):
+        """Jogs until the software limit in direction (+1 or -1)."""
+        return self.jog(self.params['MaxPos'] if direction > 0
+                        else self.params['MinPos'], t)
+
+
+class CompareChannel():
+    """Position compare output of a PowerBrick encoder channel."""
+
+    def __init__(self, motor):
+        self.motor = motor
+        self.registers = {'CompA': None, 'CompB': None}
+        self.edges = _collections.deque(maxlen=64)  # EQU toggle times [s]
+
+    def position(self, register):
+        """Returns a compare register as the motor position [counts]
+        nearest to the current one."""
+        _value = self.registers[register]
+        if _value is None:
+            return None
+        _pos = _value/COMPARE_FRACTION - self.motor.params['HomePos']
+        _half = COMPARE_MODULUS/2
+        return self.motor._pos + (
+            (_pos - self.motor._pos + _half) % COMPARE_MODULUS - _half)
+
+    def move(self, profile):
+        """Records the edges of a starting move."""
+        _times = [profile.crossing(self.position(r))
+                  for r in self.registers if self.registers[r] is not None]
+        self.edges.extend(sorted(t for t in _times if t is not None))
+
+
+class Controller():
+    """Power PMAC command interpreter with simulated motors."""
+
+    _motor_cmd = _re.compile(r'^#([\d,.]+)\s*(.*)$')
+    _param = _re.compile(r'^Motor\[(\d+)\]\.(\w+)\s*(?:=\s*(.+))?$')
+    _homed = _re.compile(r'^Motor(\d+)Homed\s*(?:=\s*(.+))?$')
+    _axis = _re.compile(r'^&(\d+)([A-Za-z])p$')
+    _plc = _re.compile(r'^(enable|disable)\s+plc\s+(\w+)$', _re.I)
+    _assign = _re.compile(r'^([\w.\[\]]+)\s*=\s*(.+)$')
+    _compare = _re.compile(
+        r'^PowerBrick\[0\]\.Chan\[(\d+)\]\.(CompA|CompB|EquWrite)'
+        r'\s*=\s*(.+)$')
+    _motor_ref = _re.compile(r'Motor\[(\d+)\]\.(\w+)')
+    _arithmetic = _re.compile(r'^[\d\s.+\-*/%()eE]+$')
+
+    def __init__(self, nmotors=8, axes=None, homing_plcs=None):
+        """Create the controller.
+
+        Args:
+            nmotors (int): number of motors (numbered from 1);
+            axes (dict): coordinate system axes, see AXES;
+            homing_plcs (dict): homing plcs, see HOMING_PLCS.
+        """
+        self.motors = {n: Motor(n) for n in range(1, nmotors + 1)}
+        for _motor in self.motors.values():
+            _motor.compare = CompareChannel(_motor)
+        self.axes = axes or dict(AXES)
+        self.homing_plcs = homing_plcs or dict(HOMING_PLCS)
+        self.variables = {}
+        self.commands = 0
+        self.lock = _threading.RLock()
+        self._homing = {}
+
+    @staticmethod
+    def motor_list(text):
+        """Parses a motor list, e.g. '1,3', '1..4' or '2,4..6'."""
+        _motors = []
+        for item in text.split(','):
+            if '..' in item:
+                _first, _last = item.split('..')
+                _motors.extend(range(int(_first), int(_last) + 1))
+            elif item != '':
+                _motors.append(int(item))
+        return _motors
+
+    def execute(self, line):
+        """Executes a command line and returns its output lines."""
+        _output = []
+        with self.lock:
+            _t = _time.monotonic()
+            self._update_homing(_t)
+            for cmd in [c.strip() for c in line.split(';')]:
+                if cmd == '':
+                    continue
+                self.commands += 1
+                try:
+                    _output.extend(self._execute(cmd, _t))
+                except (KeyError, ValueError, IndexError):
+                    _output.append(
+                        'stdin:1:1: error #20: ILLEGAL CMD: ' + cmd)
+        return _output
+
+    def _motor(self, number):
+        return self.motors[int(number)]
+
+    def _execute(self, cmd, t):
+        _match = self._motor_cmd.match(cmd)
+        if _match is not None:
+            return self._motor_command(
+                self.motor_list(_match.group(1)), _match.group(2).strip(), t)
+
+        _match = self._param.match(cmd)
+        if _match is not None:
+            _motor = self._motor(_match.group(1))
+            _name, _value = _match.group(2), _match.group(3)
+            _motor.update(t)
+            if _name not in _motor.params:
+                raise KeyError(_name)
+            if _value is None:
+                return ['Motor[{0}].{1}={2}'.format(
+                    _motor.number, _name, _format(_motor.params[_name]))]
+            _motor.params[_name] = float(_value)
+            if _name == 'AmpFaultLevel':
+                # writing the fault level clears the amplifier fault
+                _motor.params['AmpFault'] = 0
+            return []
+
+        _match = self._homed.match(cmd)
+        if _match is not None:
+            _motor = self._motor(_match.group(1))
+            if _match.group(2) is None:
+                return ['Motor{0}Homed={1}'.format(
+                    _motor.number, _motor.homed)]
+            _motor.homed = int(float(_match.group(2)))
+            return []
+
+        if cmd == 'motionFlag':
+            for m in self.motors.values():
+                m.update(t)
+            _moving = any(m.moving for m in self.motors.values())
+            return ['motionFlag={0}'.format(int(_moving))]
+
+        _match = self._axis.match(cmd)
+        if _match is not None:
+            _motors = self.axes[_match.group(2).upper()]
+            _pos = sum(self.motors[m].position(t) for m in _motors)
+            return [_format(_pos/len(_motors))]
+
+        _match = self._plc.match(cmd)
+        if _match is not None:
+            if _match.group(1).lower() == 'enable':
+                self._start_homing(_match.group(2), t)
+            else:
+                self._homing.pop(_match.group(2), None)
+            return []
+
+        _match = self._compare.match(cmd)
+        if _match is not None:
+            _channel = self.motors[int(_match.group(1)) + 1].compare
+            if _match.group(2) == 'EquWrite':
+                _channel.edges.clear()
+            else:
+                _channel.registers[_match.group(2)] = self.evaluate(
+                    _match.group(3))
+            return []
+
+        _match = self._assign.match(cmd)
+        if _match is not None:
+            self.variables[_match.group(1)] = _match.group(2)
+            return []
+        if cmd in self.variables:
+            return ['{0}={1}'.format(cmd, self.variables[cmd])]
+        raise KeyError(cmd)
+
+    def _motor_command(self, motors, cmd, t):
+        cmd = cmd.replace(' ', '')
+        _motors = [self._motor(m) for m in motors]
+        if cmd == 'p':
+            return [' '.join(_format(m.position(t)) for m in _motors)]
+        if cmd == 'k':
+            for m in _motors:
+                m.update(t)
+                m.kill()
+            return []
+        if cmd == 'j/':
+            for m in _motors:
+                m.update(t)
+                m.enable()
+            return []
+        if cmd in ['j+', 'j-']:
+            for m in _motors:
+                m.jog_to_limit(1 if cmd == 'j+' else -1, t)
+            return []
+        if cmd == 'hmz':
+            for m in _motors:
+                m.update(t)
+                m.set_position(-m.params['HomeOffset'])
+                m.homed = 1
+            return []
+        if cmd.startswith('j=') or cmd.startswith('j^'):
+            _value = cmd[2:]
+            for m in _motors:
+                _pos = m.position(t)
+                _target = (m.params['ProgJogPos'] if _value == '*'
+                           else float(_value))
+                if cmd[1] == '^':
+                    _target = _pos + _target
+                m.jog(_target, t)
+            return []
+        raise ValueError(cmd)
+
+    def _start_homing(self, plc, t):
+        _motors = self.homing_plcs[plc]
+        for n in _motors:
+            _motor = self.motors[n]
+            _motor.homed = 0
+            _motor.enable()
+            _motor.jog(0, t)
+        self._homing[plc] = _motors
+
+    def _update_homing(self, t):
+        for plc, motors in list(self._homing.items()):
+            for n in motors:
+                self.motors[n].update(t)
+            if not any(self.motors[n].moving for n in motors):
+                for n in motors:
+                    self.motors[n].set_position(
+                        -self.motors[n].params['HomeOffset'])
+                    self.motors[n].homed = 1
+                del self._homing[plc]
+
+    def evaluate(self, expression):
+        """Evaluates an arithmetic expression of Motor[n] parameters."""
+        _expr = self._motor_ref.sub(
+            lambda m: repr(float(self.motors[int(m.group(1))].params[
+                m.group(2)])), expression)
+        if self._arithmetic.match(_expr) is None:
+            raise ValueError(expression)
+        return float(eval(_expr, {'__builtins__': {}}))
+
+    def trigger_time(self, after):
+        """Returns the first compare output edge of any channel at or
+        after a time [s], None if there is none."""
+        with self.lock:
+            _edges = [t for m in self.motors.values()
+                      for t in m.compare.edges if t >= after]
+        return min(_edges) if len(_edges) > 0 else None
+
+    def set_limits(self, motor, minimum, maximum):
+        """Sets the software limits of a motor [counts]."""
+        with self.lock:
+            self.motors[motor].params['MinPos'] = minimum
+            self.motors[motor].params['MaxPos'] = maximum
+
+    def fault(self, motor, kind='AmpFault'):
+        """Faults a motor ('AmpFault' or 'FeFatal')."""
+        with self.lock:
+            self.motors[motor].update(_time.monotonic())
+            self.motors[motor].fault(kind)
+
+
+def _format(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _Handler(_socketserver.StreamRequestHandler):
+
+    def _send(self, replies):
+        # writes each reply when its latency expires, in command order
+        while True:
+            _due, _reply = replies.get()
+            if _reply is None:
+                break
+            _delay = _due - _time.monotonic()
+            if _delay > 0:
+                _time.sleep(_delay)
+            try:
+                self.wfile.write(_reply)
+            except OSError:
+                break
+
+    def handle(self):
+        _server = self.server
+        _replies = _queue.Queue()
+        _sender = _threading.Thread(target=self._send, args=(_replies,),
+                                    daemon=True)
+        _sender.start()
+        try:
+            while True:
+                _line = self.rfile.readline()
+                if not _line:
+                    break
+                _line = _line.decode('utf-8', errors='ignore').strip('\r\n')
+                _output = _server.controller.execute(_line)
+                _reply = '\r\n'.join([_line] + _output) + '\r\n' + ACK
+                _replies.put((_time.monotonic() + _server.latency,
+                              _reply.encode('utf-8')))
+        finally:
+            _replies.put((0, None))
+            _sender.join(1)
+
+
+class Server(_socketserver.ThreadingTCPServer):
+    """TCP server of a simulated controller."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0), controller=None,
+                 latency=0):
+        """Create the server.
+
+        Args:
+            address (tuple): (host, port), port 0 picks a free port;
+            controller (Controller): simulated controller, a new one with 8
+                                     motors if None;
+            latency (float): delay added to every reply [s]; the next
+                             commands are processed meanwhile, as over a
+                             network link.
+        """
+        super().__init__(address, _Handler)
+        self.controller = controller or Controller()
+        self.latency = latency
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server_address
+
+    def start(self):
+        """Serves in a daemon thread."""
+        self.thread = _threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_server(address=('127.0.0.1', 0), controller=None, latency=0):
+    """Starts a simulated controller server in a daemon thread."""
+    return Server(address, controller, latency).start()
+
+
+class Channel():
+    """TCP connection to a simulated controller with the channel methods
+    used by devices.Ppmac (send, recv, recv_ready)."""
+
+    def __init__(self, address, timeout=5):
+        self.sock = _socket.create_connection(address, timeout=timeout)
+        self.sock.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+        self.closed = False
+
+    def recv_ready(self):
+        return len(_select.select([self.sock], [], [], 0)[0]) > 0
+
+    def recv(self, nbytes):
+        return self.sock.recv(nbytes)
+
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data.endswith(b'\n'):
+            data = data + b'\n'
+        self.sock.sendall(data)
+        return len(data)
+
+    sendall = send
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        self.sock.close()
+        self.closed = True
+
+
+def attach(device, address):
+    """Connects a Ppmac device to a simulated controller.
+
+    Args:
+        device (devices.Ppmac): ppmac device (e.g. devices.ppmac);
+        address (tuple): (host, port) of the simulator server.
+    Returns:
+        the Channel set as device.ppmac.
+    """
+    device.ppmac = Channel(address)
+    return device.ppmac
+
+
+def main(argv=None):
+    parser = _argparse.ArgumentParser(
+        prog='python -m movingwire.simulation.ppmac',
+        description='Simulated Power PMAC controller.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='reply latency [s].')
+    parser.add_argument('--motors', type=int, default=8)
+    args = parser.parse_args(argv)
+    _server = Server((args.host, args.port), Controller(args.motors),
+                     args.latency)
+    print('Simulated PPMAC listening on {0}:{1}.'.format(*_server.address))
+    try:
+        _server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
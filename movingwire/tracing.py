@@ -0,0 +1,206 @@
+"""Timing of the measurement hot paths.
+
+Spans are recorded around motion, controller commands, acquisition,
+analysis, database saves and GUI updates. Tracing is disabled by default,
+when a traced function costs a single flag check; it is enabled by
+tracer.enable() or by setting the MOVINGWIRE_TRACE environment variable.
+
+Each span stores its total and self time (total minus nested spans), so the
+phase breakdown adds up to the traced wall time of each thread.
+
+Example:
+    from movingwire.tracing import tracer
+    tracer.enable()
+    ...
+    print(tracer.format_summary())
+    tracer.export('trace.json')  # chrome://tracing or ui.perfetto.dev
+"""
+
+import os as _os
+import csv as _csv
+import json as _json
+import time as _time
+import threading as _threading
+import functools as _functools
+import collections as _collections
+
+
+Span = _collections.namedtuple(
+    'Span', ['name', 'phase', 'start', 'duration', 'self_time', 'thread'])
+Span.__doc__ = """Traced interval (times in [s], start from the tracer
+    origin)."""
+
+
+class _NullSpan():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _ActiveSpan():
+
+    __slots__ = ['tracer', 'name', 'phase', 't0', 'children']
+
+    def __init__(self, tracer, name, phase):
+        self.tracer = tracer
+        self.name = name
+        self.phase = phase
+
+    def __enter__(self):
+        self.children = 0
+        self.tracer._stack().append(self)
+        self.t0 = _time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        _t1 = _time.perf_counter()
+        _duration = _t1 - self.t0
+        _stack = self.tracer._stack()
+        _stack.pop()
+        if len(_stack) > 0:
+            _stack[-1].children += _duration
+        self.tracer._record(Span(
+            self.name, self.phase, self.t0 - self.tracer.origin, _duration,
+            _duration - self.children, _threading.get_ident()))
+        return False
+
+
+class Tracer():
+    """Collects spans in memory (the most recent max_spans)."""
+
+    def __init__(self, enabled=False, max_spans=1000000):
+        self.enabled = enabled
+        self.origin = _time.perf_counter()
+        self._spans = _collections.deque(maxlen=max_spans)
+        self._local = _threading.local()
+        self._lock = _threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def now(self):
+        """Returns the time from the tracer origin [s]."""
+        return _time.perf_counter() - self.origin
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def span(self, name, phase='other'):
+        """Returns a context manager timing its block.
+
+        Args:
+            name (str): span name, e.g. 'move_x';
+            phase (str): breakdown group, e.g. 'move', 'acquire', 'read',
+                         'integrate', 'save', 'gui'.
+        """
+        if not self.enabled:
+            return _null_span
+        return _ActiveSpan(self, name, phase)
+
+    def spans(self, since=None):
+        """Returns the recorded spans, started after since [s] if given."""
+        with self._lock:
+            _spans = list(self._spans)
+        if since is not None:
+            _spans = [s for s in _spans if s.start >= since]
+        return _spans
+
+    def summary(self, since=None):
+        """Returns the per phase breakdown.
+
+        Returns:
+            dict phase: (calls, self time [s], total time [s]), in
+            decreasing self time order.
+        """
+        _phases = {}
+        for _span in self.spans(since):
+            _calls, _self, _total = _phases.get(_span.phase, (0, 0, 0))
+            _phases[_span.phase] = (_calls + 1, _self + _span.self_time,
+                                    _total + _span.duration)
+        return dict(sorted(_phases.items(), key=lambda item: -item[1][1]))
+
+    def format_summary(self, since=None):
+        """Returns the per phase breakdown as a text table."""
+        _summary = self.summary(since)
+        _total = sum(v[1] for v in _summary.values())
+        _lines = ['{0:<12}{1:>8}{2:>12}{3:>8}'.format(
+            'phase', 'calls', 'time [s]', '%')]
+        for _phase, (_calls, _self, _) in _summary.items():
+            _lines.append('{0:<12}{1:>8}{2:>12.3f}{3:>8.1f}'.format(
+                _phase, _calls, _self,
+                100*_self/_total if _total > 0 else 0))
+        return '\n'.join(_lines)
+
+    def export_chrome(self, filename, since=None):
+        """Writes the spans in the Chrome trace event format."""
+        _pid = _os.getpid()
+        _events = [{
+            'name': s.name, 'cat': s.phase, 'ph': 'X', 'pid': _pid,
+            'tid': s.thread, 'ts': s.start*1e6, 'dur': s.duration*1e6}
+            for s in self.spans(since)]
+        with open(filename, 'w') as _f:
+            _json.dump({'traceEvents': _events,
+                        'displayTimeUnit': 'ms'}, _f)
+
+    def export_csv(self, filename, since=None):
+        """Writes the spans as CSV (times in [s])."""
+        with open(filename, 'w', newline='') as _f:
+            _writer = _csv.writer(_f)
+            _writer.writerow(Span._fields)
+            _writer.writerows(self.spans(since))
+
+    def export(self, filename, since=None):
+        """Writes CSV if filename ends with .csv, Chrome trace otherwise."""
+        if filename.lower().endswith('.csv'):
+            self.export_csv(filename, since)
+        else:
+            self.export_chrome(filename, since)
+
+
+tracer = Tracer(enabled=bool(_os.environ.get('MOVINGWIRE_TRACE')))
+
+
+def span(name, phase='other'):
+    """Times a block with the module tracer (see Tracer.span)."""
+    return tracer.span(name, phase)
+
+
+def traced(phase='other', name=None):
+    """Decorator timing every call of a function with the module tracer.
+
+    Args:
+        phase (str): breakdown group;
+        name (str): span name, the function name if None.
+    """
+    def decorator(func):
+        _name = name or func.__name__
+
+        @_functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with _ActiveSpan(tracer, _name, phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator